@@ -1,5 +1,82 @@
 # run.py
-from src.ui import criar_interface
+"""
+Ponto de entrada da interface gráfica e do executável gerado pelo PyInstaller (run.spec).
+
+Com --perfil-inicializacao ARQUIVO, grava em ARQUIVO (JSON) o tempo de importação de
+cada módulo e o tempo até a janela aparecer; com --encerrar, a janela é fechada logo
+em seguida, para acompanhar a abertura do programa em scripts.
+
+Se o primeiro argumento for um subcomando da linha de comando (processar, fragmentar,
+...), ele é executado como em 'python -m src', sem abrir a janela: é assim que o
+executável, que não tem um interpretador para 'python -m src', processa os
+fragmentos.
+"""
+import time
+
+INICIO = time.perf_counter()
+
+import argparse
+import multiprocessing
+import sys
+
+# Os subcomandos de 'python -m src' (src/cli.py) aceitos também pelo executável.
+SUBCOMANDOS = (
+    "processar",
+    "fragmentar",
+    "juntar-fragmentos",
+    "importar-receita",
+    "reclassificar",
+)
+
+
+def main(argv=None):
+    # No executável, os processos do reclassificar (ProcessPoolExecutor) rodam este
+    # mesmo arquivo: freeze_support() os desvia para o trabalho, sem abrir a janela.
+    multiprocessing.freeze_support()
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in SUBCOMANDOS:
+        if sys.stderr is None:
+            # Executável sem console (--noconsole): o log vai para o stderr herdado.
+            try:
+                sys.stderr = open(2, "w", encoding="utf-8", errors="replace")
+            except OSError:
+                pass
+        from src.cli import main as main_cli
+
+        return main_cli(argv)
+
+    parser = argparse.ArgumentParser(
+        description="Consultor de CNPJs (interface gráfica)."
+    )
+    parser.add_argument(
+        "--perfil-inicializacao",
+        metavar="ARQUIVO",
+        help="Grava no JSON ARQUIVO os tempos de importação e de abertura da janela.",
+    )
+    parser.add_argument(
+        "--encerrar",
+        action="store_true",
+        help="Com --perfil-inicializacao, fecha a janela assim que ela aparece.",
+    )
+    # Argumentos desconhecidos (como os que o sistema passa a um executável) são ignorados.
+    args, _ = parser.parse_known_args(argv)
+
+    perfil = None
+    if args.perfil_inicializacao:
+        from src.perfil import PerfilInicializacao
+
+        perfil = PerfilInicializacao(
+            args.perfil_inicializacao, inicio=INICIO, encerrar=args.encerrar
+        )
+        perfil.iniciar()
+
+    from src.ui import criar_interface
+
+    if perfil is not None:
+        perfil.marcar("interface_importada")
+    criar_interface(perfil)
+    return 0
+
 
 if __name__ == "__main__":
-    criar_interface()
\ No newline at end of file
+    sys.exit(main())
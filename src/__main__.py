@@ -0,0 +1,9 @@
+# src/__main__.py
+"""
+Permite rodar o processamento em lote com 'python -m src', sem interface gráfica.
+"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -2,37 +2,311 @@
 """
 Módulo responsável pela comunicação com a API externa CNPJá.
 """
+import logging
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, JSONDecodeError
+from .cache import AUSENTE
+from .limitador import interpretar_retry_after
+from .metricas import DESATIVADAS
 
+URL_BASE = "https://open.cnpja.com"
 
-def consulta_cnpj(cnpj: str):
+# Quantas vezes a mesma consulta é repetida após um HTTP 429 antes de desistir.
+MAX_TENTATIVAS_429 = 5
+
+# Respostas que dizem que o CNPJ não existe (ou não é um CNPJ); ficam no cache como
+# "não encontrado".
+STATUS_NAO_ENCONTRADO = (400, 404, 422)
+
+# Respostas que dizem respeito à conta, não ao CNPJ: chave inválida ou expirada (401,
+# 403) e cota esgotada (402).
+STATUS_ACESSO_NEGADO = (401, 402, 403)
+
+logger = logging.getLogger(__name__)
+
+
+class FalhaTransitoria(Exception):
+    """
+    A consulta falhou por um motivo passageiro (rede, timeout, HTTP 5xx ou 429, ou
+    outra resposta inesperada) mesmo após as novas tentativas. O CNPJ não deve ser
+    marcado como consultado.
+
+    Os atributos 'status' (o HTTP da última tentativa, ou None para erros de conexão)
+    e 'retry_after' (os segundos pedidos num HTTP 429) permitem a quem chamou decidir
+    como reagir, por exemplo trocando de provedor.
     """
-    Consulta um CNPJ na API CNPJá Office e retorna os dados em formato JSON.
+
+    def __init__(self, mensagem: str, status: int = None, retry_after: float = None):
+        super().__init__(mensagem)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AcessoNegado(Exception):
+    """
+    A API recusou a consulta por um problema da conta (chave inválida ou expirada,
+    cota esgotada), e não do CNPJ. Repetir não adianta e todos os CNPJs seguintes
+    teriam a mesma resposta, então quem chamou deve interromper o processamento.
+
+    O atributo 'status' é o HTTP recebido.
+    """
+
+    def __init__(self, mensagem: str, status: int):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ClienteCNPJa:
+    """
+    Cliente reutilizável da API CNPJá, com um pool de conexões keep-alive e novas
+    tentativas com recuo exponencial para falhas transitórias.
+
+    Outras APIs com o mesmo modelo de consulta (GET com o CNPJ no caminho) são
+    atendidas por subclasses que mudam 'caminho' e 'converter' (ver src/provedores.py).
+
+    Uma mesma instância pode ser usada por várias threads ao mesmo tempo.
+    """
+
+    # Nome do provedor, usado nas métricas e na linha de comando.
+    nome = "cnpja"
+    # Caminho da consulta, relativo à url_base.
+    caminho = "/office/{cnpj}"
+
+    def __init__(
+        self,
+        limitador=None,
+        tamanho_pool: int = 10,
+        timeout_conexao: float = 5.0,
+        timeout_leitura: float = 15.0,
+        max_tentativas: int = 4,
+        espera_base: float = 1.0,
+        espera_maxima: float = 30.0,
+        url_base: str = URL_BASE,
+        cache=None,
+        metricas=None,
+    ):
+        """
+        Args:
+            limitador (LimitadorTaxa, optional): Limitador de taxa. Cada requisição
+                                                 consome um token.
+            tamanho_pool (int): Máximo de conexões abertas com a API. Deve acompanhar
+                                o número de consultas simultâneas.
+            timeout_conexao (float): Segundos para estabelecer a conexão.
+            timeout_leitura (float): Segundos para aguardar a resposta.
+            max_tentativas (int): Total de tentativas por CNPJ em falhas transitórias.
+            espera_base (float): Espera, em segundos, antes da segunda tentativa.
+                                 Dobra a cada nova tentativa.
+            espera_maxima (float): Teto da espera entre tentativas.
+            url_base (str): Endereço da API, sem a barra final.
+            cache (CacheRespostas, optional): Cache em disco consultado antes da API.
+                                              Respostas do cache não consomem tokens.
+            metricas (Metricas, optional): Recebe a duração das requisições, da espera
+                                           do limitador e da decodificação do JSON,
+                                           as respostas por status HTTP, as novas
+                                           tentativas e os bytes recebidos.
+        """
+        self.limitador = limitador
+        self.cache = cache
+        self.metricas = metricas or DESATIVADAS
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self.max_tentativas = max(1, max_tentativas)
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.url_base = url_base.rstrip("/")
+
+        self.sessao = requests.Session()
+        # As tentativas são feitas por este cliente, não pelo urllib3, para que
+        # cada uma passe pelo limitador de taxa.
+        adaptador = HTTPAdapter(
+            pool_connections=1, pool_maxsize=tamanho_pool, max_retries=0
+        )
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        """Encerra as conexões abertas do pool."""
+        self.sessao.close()
+
+    def converter(self, dados: dict):
+        """
+        Converte a resposta da API para o formato do JSON da CNPJá, o que o
+        classificar_empresa espera. Na CNPJá, a resposta já está nesse formato.
+
+        Returns:
+            dict or None: Os dados convertidos, ou None se a resposta indicar que o
+                          CNPJ não existe.
+        """
+        return dados
+
+    def _espera(self, tentativa: int) -> float:
+        """Recuo exponencial com jitter completo para a tentativa informada."""
+        teto = min(self.espera_maxima, self.espera_base * (2 ** (tentativa - 1)))
+        return random.uniform(0, teto)
+
+    def consultar(self, cnpj: str, limitador=None, ignorar_cache: bool = False):
+        """
+        Consulta um CNPJ na API CNPJá Office e retorna os dados em formato JSON.
+
+        Args:
+            cnpj (str): O número do CNPJ a ser consultado, apenas dígitos.
+            limitador (LimitadorTaxa, optional): Substitui o limitador do cliente nesta consulta.
+            ignorar_cache (bool): Consulta a API mesmo com uma resposta válida no
+                                  cache, que é substituída pela nova.
+
+        Returns:
+            dict or None: Os dados da empresa, ou None se a API informar que o CNPJ
+                          não existe (HTTP 404, ou 400 e 422 para um CNPJ malformado).
+
+        Raises:
+            FalhaTransitoria: Se todas as tentativas falharem por motivos passageiros.
+            AcessoNegado: Se a API recusar a chave ou a cota estiver esgotada (HTTP
+                          401, 402 ou 403).
+        """
+        if self.cache is not None and not ignorar_cache:
+            with self.metricas.medir("cache_leitura"):
+                dados = self.cache.obter(cnpj)
+            if dados is not AUSENTE:
+                self.metricas.incrementar("cache", resultado="acerto")
+                return dados
+            self.metricas.incrementar("cache", resultado="falta")
+
+        dados = self._consultar_api(cnpj, limitador or self.limitador)
+        if self.cache is not None:
+            with self.metricas.medir("cache_gravacao"):
+                self.cache.gravar(cnpj, dados)
+        return dados
+
+    def _consultar_api(self, cnpj: str, limitador):
+        """Faz a requisição à API, com as novas tentativas. Ver consultar()."""
+        url = self.url_base + self.caminho.format(cnpj=cnpj)
+        tentativas = 0
+        tentativas_429 = 0
+        metricas = self.metricas
+
+        while True:
+            if limitador:
+                with metricas.medir("espera_limitador"):
+                    limitador.adquirir()
+
+            espera = None
+            status = retry_after = None
+            try:
+                with metricas.medir("requisicao_http"):
+                    r = self.sessao.get(url, timeout=self.timeout)
+            except RequestException as e:
+                # Erros de conexão, timeout, etc.
+                motivo = f"erro de conexão ({e})"
+                metricas.incrementar("erros_conexao", tipo=type(e).__name__)
+            else:
+                status = r.status_code
+                metricas.incrementar("respostas_http", status=r.status_code)
+                metricas.incrementar("bytes_recebidos", len(r.content))
+                if r.status_code == 429:
+                    motivo = "HTTP 429"
+                    tentativas_429 += 1
+                    retry_after = interpretar_retry_after(r.headers.get("Retry-After"))
+                    if limitador and tentativas_429 < MAX_TENTATIVAS_429:
+                        # A espera fica a cargo do limitador, que suspende todas as
+                        # threads, e não conta como uma das tentativas.
+                        limitador.registrar_limite(retry_after)
+                        metricas.incrementar("repeticoes_429")
+                        continue
+                    espera = retry_after
+                elif r.status_code in STATUS_ACESSO_NEGADO:
+                    raise AcessoNegado(
+                        f"A API recusou a consulta (HTTP {r.status_code}): chave de "
+                        "acesso inválida ou expirada, ou cota de consultas esgotada.",
+                        r.status_code,
+                    )
+                elif (
+                    r.status_code != 200 and r.status_code not in STATUS_NAO_ENCONTRADO
+                ):
+                    # 5xx e demais respostas inesperadas: não se sabe se o CNPJ existe.
+                    motivo = f"HTTP {r.status_code}"
+                else:
+                    if limitador:
+                        limitador.registrar_sucesso()
+                    if r.status_code != 200:
+                        logger.warning(
+                            "API retornou status %s para o CNPJ %s", r.status_code, cnpj
+                        )
+                        return None
+                    try:
+                        with metricas.medir("decodificacao_json"):
+                            dados = r.json()
+                        return self.converter(dados)
+                    except JSONDecodeError:
+                        # Normalmente uma página de erro em HTML de algum intermediário.
+                        motivo = "resposta não é um JSON válido"
+
+            tentativas += 1
+            if tentativas >= self.max_tentativas:
+                metricas.incrementar("falhas_transitorias")
+                raise FalhaTransitoria(
+                    f"Falha ao consultar o CNPJ {cnpj} após {tentativas} tentativas: {motivo}",
+                    status,
+                    retry_after,
+                )
+            logger.warning(
+                "Falha transitória no CNPJ %s (%s). Nova tentativa %d de %d.",
+                cnpj,
+                motivo,
+                tentativas + 1,
+                self.max_tentativas,
+            )
+            metricas.incrementar("novas_tentativas")
+            with metricas.medir("espera_nova_tentativa"):
+                time.sleep(espera if espera is not None else self._espera(tentativas))
+
+
+_cliente_padrao = None
+_lock_cliente_padrao = threading.Lock()
+
+
+def consulta_cnpj(cnpj: str, limitador=None):
+    """
+    Consulta um CNPJ usando um ClienteCNPJa compartilhado pelo módulo.
 
     Args:
         cnpj (str): O número do CNPJ a ser consultado, apenas dígitos.
+        limitador (LimitadorTaxa, optional): Limitador de taxa da consulta.
 
     Returns:
-        dict or None: Um dicionário com os dados da empresa se a consulta for bem-sucedida,
-                      caso contrário, retorna None.
-    """
-    url = f"https://open.cnpja.com/office/{cnpj}"
-    try:
-        r = requests.get(url, timeout=15)
-        if r.status_code == 200:
-            # Tenta decodificar o JSON. Se a resposta não for um JSON válido, falha graciosamente.
-            return r.json()
-        else:
-            print(f"AVISO: API retornou status {r.status_code} para o CNPJ {cnpj}")
-            return None
-    except JSONDecodeError:
-        # Captura o erro caso a resposta da API não seja um JSON válido (ex: um erro em HTML).
-        print(
-            f"ERRO CRÍTICO: A resposta da API para o CNPJ {cnpj} não foi um JSON válido."
-        )
-        return None
-    except RequestException as e:
-        # Captura erros de conexão, timeout, etc.
-        print(f"ERRO DE CONEXÃO: Falha ao consultar o CNPJ {cnpj}. Erro: {e}")
-        return None
+        dict or None: Os dados da empresa, ou None se o CNPJ não for encontrado.
+
+    Raises:
+        FalhaTransitoria: Se a API não puder ser consultada no momento.
+        AcessoNegado: Se a API recusar a chave ou a cota estiver esgotada.
+    """
+    global _cliente_padrao
+    with _lock_cliente_padrao:
+        if _cliente_padrao is None:
+            _cliente_padrao = ClienteCNPJa()
+    return _cliente_padrao.consultar(cnpj, limitador)
+
+
+def configurar_cliente_padrao(cliente: ClienteCNPJa = None):
+    """
+    Substitui o ClienteCNPJa compartilhado usado por consulta_cnpj, por exemplo para
+    apontar para outro servidor ou ajustar as tentativas. O cliente anterior é
+    fechado.
+
+    Args:
+        cliente (ClienteCNPJa, optional): O novo cliente. Com None, um cliente padrão
+                                          é criado na próxima consulta.
+    """
+    global _cliente_padrao
+    with _lock_cliente_padrao:
+        anterior, _cliente_padrao = _cliente_padrao, cliente
+    if anterior is not None and anterior is not cliente:
+        anterior.fechar()
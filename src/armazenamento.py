@@ -0,0 +1,205 @@
+# src/armazenamento.py
+"""
+Módulo com a base indexada dos CNPJs já consultados e dos dados extraídos de cada um.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from .validacao import PARAMETROS_POR_CONSULTA, normalizar_cnpj
+
+CAMINHO_PADRAO = "data/consultados.sqlite3"
+TAMANHO_LOTE_PADRAO = 100
+
+CAMPOS = ("cnpj", "status", "nome", "telefone", "email", "consultado_em")
+
+
+class BaseConsultados:
+    """
+    Base SQLite dos CNPJs já consultados, com o CNPJ como chave primária.
+
+    Guarda o status, os dados extraídos (nome, telefone, e-mail) e o momento da
+    consulta. As gravações ficam em memória e são confirmadas em lote, numa única
+    transação, a cada 'tamanho_lote' registros ou ao chamar confirmar().
+    """
+
+    def __init__(
+        self, caminho: str = CAMINHO_PADRAO, tamanho_lote: int = TAMANHO_LOTE_PADRAO
+    ):
+        """
+        Args:
+            caminho (str): O arquivo SQLite da base.
+            tamanho_lote (int): Quantos registros acumular antes de gravar no disco.
+        """
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        with self._conexao:
+            self._conexao.execute(
+                """
+                CREATE TABLE IF NOT EXISTS consultados (
+                    cnpj TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    nome TEXT NOT NULL DEFAULT '',
+                    telefone TEXT NOT NULL DEFAULT '',
+                    email TEXT NOT NULL DEFAULT '',
+                    consultado_em REAL NOT NULL
+                )
+                """
+            )
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS importacoes "
+                "(arquivo TEXT PRIMARY KEY, importado_em REAL NOT NULL)"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        """Confirma os registros pendentes e fecha a base."""
+        self.confirmar()
+        with self._lock:
+            self._conexao.close()
+
+    def obter(self, cnpj: str):
+        """
+        Busca o registro de um CNPJ, inclusive entre os ainda não confirmados.
+
+        Args:
+            cnpj (str): O CNPJ, apenas dígitos.
+
+        Returns:
+            dict or None: O registro com os campos de CAMPOS, ou None se o CNPJ nunca
+                          foi consultado.
+        """
+        with self._lock:
+            registro = self._pendentes.get(cnpj)
+            if registro is not None:
+                return dict(registro)
+            linha = self._conexao.execute(
+                "SELECT cnpj, status, nome, telefone, email, consultado_em "
+                "FROM consultados WHERE cnpj = ?",
+                (cnpj,),
+            ).fetchone()
+        return dict(zip(CAMPOS, linha)) if linha else None
+
+    def obter_varios(self, cnpjs) -> dict:
+        """
+        Busca os registros de vários CNPJs de uma vez, com uma consulta à base a cada
+        PARAMETROS_POR_CONSULTA CNPJs em vez de uma por CNPJ.
+
+        Args:
+            cnpjs (iterable): Os CNPJs, apenas dígitos.
+
+        Returns:
+            dict: O registro (como em obter) de cada CNPJ já consultado, pelo CNPJ. Os
+                  que nunca foram consultados ficam de fora.
+        """
+        registros = {}
+        with self._lock:
+            faltam = []
+            for cnpj in cnpjs:
+                registro = self._pendentes.get(cnpj)
+                if registro is not None:
+                    registros[cnpj] = dict(registro)
+                else:
+                    faltam.append(cnpj)
+            for inicio in range(0, len(faltam), PARAMETROS_POR_CONSULTA):
+                parte = faltam[inicio : inicio + PARAMETROS_POR_CONSULTA]
+                for linha in self._conexao.execute(
+                    "SELECT cnpj, status, nome, telefone, email, consultado_em "
+                    f"FROM consultados WHERE cnpj IN ({','.join('?' * len(parte))})",
+                    parte,
+                ):
+                    registros[linha[0]] = dict(zip(CAMPOS, linha))
+        return registros
+
+    def contem(self, cnpj: str) -> bool:
+        """Indica se o CNPJ já foi consultado."""
+        return self.obter(cnpj) is not None
+
+    def registrar(self, registro: dict):
+        """
+        Adiciona ou substitui o registro de um CNPJ consultado.
+
+        Args:
+            registro (dict): Um dicionário com 'cnpj', 'status' e, opcionalmente,
+                             'nome', 'telefone' e 'email'.
+        """
+        completo = {
+            "cnpj": registro["cnpj"],
+            "status": registro["status"],
+            "nome": registro.get("nome") or "",
+            "telefone": registro.get("telefone") or "",
+            "email": registro.get("email") or "",
+            "consultado_em": registro.get("consultado_em") or time.time(),
+        }
+        with self._lock:
+            self._pendentes[completo["cnpj"]] = completo
+            cheio = len(self._pendentes) >= self.tamanho_lote
+        if cheio:
+            self.confirmar()
+
+    def confirmar(self):
+        """Grava todos os registros pendentes numa única transação."""
+        with self._lock:
+            if not self._pendentes:
+                return
+            with self._conexao:
+                self._conexao.executemany(
+                    "INSERT OR REPLACE INTO consultados "
+                    "VALUES (:cnpj, :status, :nome, :telefone, :email, :consultado_em)",
+                    self._pendentes.values(),
+                )
+            self._pendentes.clear()
+
+    def importar_ja_consultados(self, caminho_txt: str) -> int:
+        """
+        Importa um arquivo ja_consultados.txt antigo (um CNPJ por linha).
+
+        Os CNPJs entram com status vazio, pois o arquivo antigo não guardava os dados,
+        e nunca substituem registros que a base já tenha. São normalizados como os da
+        entrada (sem pontuação e com os zeros à esquerda que a planilha tirou), para
+        que sejam encontrados nas próximas listas. Cada arquivo só é importado uma vez.
+
+        Args:
+            caminho_txt (str): O caminho do arquivo de texto.
+
+        Returns:
+            int: Quantos CNPJs novos foram importados.
+        """
+        chave = os.path.abspath(caminho_txt)
+        consultado_em = os.path.getmtime(caminho_txt)
+        self.confirmar()
+        with self._lock:
+            if self._conexao.execute(
+                "SELECT 1 FROM importacoes WHERE arquivo = ?", (chave,)
+            ).fetchone():
+                return 0
+            with open(caminho_txt, "r", encoding="utf-8") as f, self._conexao:
+                antes = self._conexao.total_changes
+                self._conexao.executemany(
+                    "INSERT OR IGNORE INTO consultados (cnpj, status, consultado_em) "
+                    "VALUES (?, '', ?)",
+                    (
+                        (cnpj, consultado_em)
+                        for cnpj, _ in map(normalizar_cnpj, f)
+                        if cnpj
+                    ),
+                )
+                importados = self._conexao.total_changes - antes
+                self._conexao.execute(
+                    "INSERT INTO importacoes VALUES (?, ?)", (chave, time.time())
+                )
+        return importados
@@ -0,0 +1,137 @@
+# src/atualizacao.py
+"""
+Módulo do modo de atualização: escolhe quais CNPJs já consultados devem ser consultados
+de novo e registra o que mudou em cada um.
+"""
+import heapq
+import json
+import os
+import time
+
+from .validacao import normalizar_cnpj
+
+# Campos comparados entre a consulta anterior e a nova.
+CAMPOS_COMPARADOS = ("nome", "telefone", "email", "status")
+
+# Categorias atualizadas primeiro quando o orçamento não dá para todos os CNPJs.
+PRIORIDADE_PADRAO = ("Desenvolvedor",)
+
+
+def desatualizado(registro: dict, idade_maxima: float, agora: float = None) -> bool:
+    """Indica se um registro da base foi consultado há mais de 'idade_maxima' segundos."""
+    return (agora or time.time()) - registro["consultado_em"] > idade_maxima
+
+
+def selecionar_para_atualizar(
+    path: str,
+    base,
+    idade_maxima: float,
+    orcamento: int,
+    prioridade=PRIORIDADE_PADRAO,
+) -> set:
+    """
+    Percorre o arquivo de entrada e escolhe, dentro do orçamento, os CNPJs desatualizados
+    a consultar de novo.
+
+    Vêm primeiro os das categorias em 'prioridade', na ordem informada, e, dentro de
+    cada uma, os consultados há mais tempo. Só os 'orcamento' escolhidos ficam na
+    memória, então o arquivo pode ter qualquer tamanho.
+
+    Args:
+        path (str): O arquivo de texto com os CNPJs.
+        base (BaseConsultados): A base dos CNPJs já consultados.
+        idade_maxima (float): Segundos a partir dos quais um registro está desatualizado.
+        orcamento (int): Quantas consultas, no máximo, usar nas atualizações.
+        prioridade (tuple): As categorias a atualizar primeiro.
+
+    Returns:
+        set: Os CNPJs escolhidos, apenas dígitos.
+    """
+    if orcamento <= 0:
+        return set()
+    posicao = {categoria: i for i, categoria in enumerate(prioridade)}
+    agora = time.time()
+    # Heap com os piores escolhidos no topo: a chave é negada para que o
+    # heappushpop descarte o de menor prioridade e, nela, o mais recente.
+    escolhidos = []
+    no_heap = set()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for linha in f:
+            cnpj, valido = normalizar_cnpj(linha.strip())
+            if not valido or cnpj in no_heap:
+                continue
+            registro = base.obter(cnpj)
+            if registro is None or not desatualizado(registro, idade_maxima, agora):
+                continue
+            chave = (
+                -posicao.get(registro["status"], len(prioridade)),
+                -registro["consultado_em"],
+                cnpj,
+            )
+            if len(escolhidos) < orcamento:
+                heapq.heappush(escolhidos, chave)
+                no_heap.add(cnpj)
+            elif chave > escolhidos[0]:
+                no_heap.discard(heapq.heappushpop(escolhidos, chave)[2])
+                no_heap.add(cnpj)
+    return no_heap
+
+
+def comparar_registros(anterior: dict, novo: dict) -> dict:
+    """
+    Os campos que mudaram entre duas consultas de um CNPJ.
+
+    Returns:
+        dict: Para cada campo de CAMPOS_COMPARADOS que mudou, a lista [antes, depois].
+    """
+    return {
+        campo: [anterior.get(campo) or "", novo.get(campo) or ""]
+        for campo in CAMPOS_COMPARADOS
+        if (anterior.get(campo) or "") != (novo.get(campo) or "")
+    }
+
+
+class RegistroMudancas:
+    """
+    Arquivo NDJSON com uma linha por CNPJ atualizado que mudou, no formato
+    {"cnpj": ..., "consultado_antes": ..., "mudancas": {"telefone": [antes, depois]}},
+    para os sistemas seguintes importarem só o que mudou.
+    """
+
+    def __init__(self, caminho: str, continuar: bool = False):
+        """
+        Args:
+            caminho (str): O arquivo de mudanças.
+            continuar (bool): Se deve acrescentar ao arquivo existente (ao retomar uma
+                              execução) em vez de começar um novo.
+        """
+        self.caminho = caminho
+        self.atualizados = 0
+        self.alterados = 0
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._arquivo = open(caminho, "a" if continuar else "w", encoding="utf-8")
+
+    def registrar(self, anterior: dict, novo: dict):
+        """Compara a consulta anterior de um CNPJ com a nova e grava as diferenças."""
+        self.atualizados += 1
+        mudancas = comparar_registros(anterior, novo)
+        if not mudancas:
+            return
+        self.alterados += 1
+        self._arquivo.write(
+            json.dumps(
+                {
+                    "cnpj": anterior["cnpj"],
+                    "consultado_antes": anterior["consultado_em"],
+                    "mudancas": mudancas,
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            + "\n"
+        )
+
+    def fechar(self):
+        self._arquivo.close()
@@ -0,0 +1,234 @@
+# src/cache.py
+"""
+Módulo com o cache em disco das respostas brutas da API, com validade e limite de tamanho.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from .validacao import PARAMETROS_POR_CONSULTA
+
+CAMINHO_PADRAO = "data/cache_respostas.sqlite3"
+
+DIA = 24 * 60 * 60
+VALIDADE_PADRAO = 30 * DIA
+VALIDADE_NEGATIVA_PADRAO = 1 * DIA
+TAMANHO_MAXIMO_PADRAO = 512 * 1024 * 1024
+
+# Indica que o CNPJ não está no cache (ou expirou). Diferente de None, que é
+# uma resposta negativa guardada: a API informou que o CNPJ não existe.
+AUSENTE = object()
+
+
+def decodificar_corpo(corpo: bytes) -> dict:
+    """Converte uma resposta guardada (JSON comprimido com zlib) de volta em dicionário."""
+    return json.loads(zlib.decompress(corpo))
+
+
+class CacheRespostas:
+    """
+    Cache SQLite das respostas da API, indexado pelo CNPJ normalizado (só dígitos).
+
+    O JSON bruto é guardado comprimido com zlib. Respostas negativas (HTTP 404) têm
+    uma validade própria, mais curta. Quando o total de bytes guardados passa do
+    limite, as respostas mais antigas são removidas.
+
+    Uma mesma instância pode ser usada por várias threads ao mesmo tempo.
+    """
+
+    def __init__(
+        self,
+        caminho: str = CAMINHO_PADRAO,
+        validade: float = VALIDADE_PADRAO,
+        validade_negativa: float = VALIDADE_NEGATIVA_PADRAO,
+        tamanho_maximo: int = TAMANHO_MAXIMO_PADRAO,
+    ):
+        """
+        Args:
+            caminho (str): O arquivo SQLite do cache.
+            validade (float): Segundos em que uma resposta encontrada continua válida.
+            validade_negativa (float): Segundos em que um "não encontrado" continua válido.
+            tamanho_maximo (int): Bytes comprimidos que o cache pode ocupar.
+        """
+        self.caminho = caminho
+        self.validade = validade
+        self.validade_negativa = validade_negativa
+        self.tamanho_maximo = tamanho_maximo
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        with self._conexao:
+            self._conexao.execute(
+                """
+                CREATE TABLE IF NOT EXISTS respostas (
+                    cnpj TEXT PRIMARY KEY,
+                    encontrado INTEGER NOT NULL,
+                    corpo BLOB,
+                    tamanho INTEGER NOT NULL,
+                    gravado_em REAL NOT NULL
+                )
+                """
+            )
+            self._conexao.execute(
+                "CREATE INDEX IF NOT EXISTS idx_respostas_gravado_em ON respostas (gravado_em)"
+            )
+        self._tamanho_total = self._conexao.execute(
+            "SELECT COALESCE(SUM(tamanho), 0) FROM respostas"
+        ).fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        """Fecha a conexão com o arquivo do cache."""
+        with self._lock:
+            self._conexao.close()
+
+    def obter(self, cnpj: str, ignorar_validade: bool = False):
+        """
+        Busca a resposta guardada de um CNPJ.
+
+        Args:
+            cnpj (str): O CNPJ, apenas dígitos.
+            ignorar_validade (bool): Devolve a resposta mesmo se já tiver expirado.
+
+        Returns:
+            dict, None or AUSENTE: Os dados da empresa, None para um "não encontrado"
+                                   guardado, ou AUSENTE se não houver resposta válida.
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT encontrado, corpo, gravado_em FROM respostas WHERE cnpj = ?",
+                (cnpj,),
+            ).fetchone()
+        if linha is None:
+            return AUSENTE
+
+        encontrado, corpo, gravado_em = linha
+        if not ignorar_validade:
+            validade = self.validade if encontrado else self.validade_negativa
+            if time.time() - gravado_em > validade:
+                return AUSENTE
+        if not encontrado:
+            return None
+        return decodificar_corpo(corpo)
+
+    def obter_varios(self, cnpjs, decodificar: bool = True) -> dict:
+        """
+        Busca as respostas guardadas de vários CNPJs de uma vez, com uma consulta ao
+        cache a cada PARAMETROS_POR_CONSULTA CNPJs em vez de uma por CNPJ.
+
+        Args:
+            cnpjs (iterable): Os CNPJs, apenas dígitos.
+            decodificar (bool): Se False, devolve o JSON ainda comprimido (bytes), como
+                                no iterar().
+
+        Returns:
+            dict: Os dados da empresa (ou None, para "não encontrado") de cada CNPJ com
+                  resposta válida, pelo CNPJ. Os ausentes e os expirados ficam de fora.
+        """
+        cnpjs = list(dict.fromkeys(cnpjs))
+        agora = time.time()
+        respostas = {}
+        for inicio in range(0, len(cnpjs), PARAMETROS_POR_CONSULTA):
+            parte = cnpjs[inicio : inicio + PARAMETROS_POR_CONSULTA]
+            with self._lock:
+                linhas = self._conexao.execute(
+                    "SELECT cnpj, encontrado, corpo, gravado_em FROM respostas "
+                    f"WHERE cnpj IN ({','.join('?' * len(parte))})",
+                    parte,
+                ).fetchall()
+            for cnpj, encontrado, corpo, gravado_em in linhas:
+                validade = self.validade if encontrado else self.validade_negativa
+                if agora - gravado_em > validade:
+                    continue
+                if not encontrado:
+                    respostas[cnpj] = None
+                else:
+                    respostas[cnpj] = decodificar_corpo(corpo) if decodificar else corpo
+        return respostas
+
+    def gravar(self, cnpj: str, dados):
+        """
+        Guarda a resposta da API para um CNPJ.
+
+        Args:
+            cnpj (str): O CNPJ, apenas dígitos.
+            dados (dict or None): O JSON retornado pela API, ou None se não encontrado.
+        """
+        corpo = None
+        if dados is not None:
+            corpo = zlib.compress(
+                json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode(
+                    "utf-8"
+                )
+            )
+        tamanho = len(corpo) if corpo else 0
+
+        with self._lock:
+            with self._conexao:
+                anterior = self._conexao.execute(
+                    "SELECT tamanho FROM respostas WHERE cnpj = ?", (cnpj,)
+                ).fetchone()
+                self._conexao.execute(
+                    "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?)",
+                    (cnpj, dados is not None, corpo, tamanho, time.time()),
+                )
+            self._tamanho_total += tamanho - (anterior[0] if anterior else 0)
+            if self._tamanho_total > self.tamanho_maximo:
+                self._remover_mais_antigos()
+
+    def _remover_mais_antigos(self):
+        """Remove as respostas mais antigas até ocupar 90% do limite (chamar com o lock)."""
+        alvo = self.tamanho_maximo * 0.9
+        removidos = []
+        for cnpj, tamanho in self._conexao.execute(
+            "SELECT cnpj, tamanho FROM respostas ORDER BY gravado_em"
+        ):
+            if self._tamanho_total <= alvo:
+                break
+            removidos.append((cnpj,))
+            self._tamanho_total -= tamanho
+        with self._conexao:
+            self._conexao.executemany("DELETE FROM respostas WHERE cnpj = ?", removidos)
+
+    def iterar(self, decodificar: bool = True):
+        """
+        Percorre todas as respostas guardadas, inclusive as expiradas, sem carregá-las
+        todas na memória.
+
+        Args:
+            decodificar (bool): Se False, devolve o JSON ainda comprimido (bytes), para
+                                ser decodificado por quem o consumir, com
+                                decodificar_corpo().
+
+        Yields:
+            tuple: O CNPJ e os dados da empresa (ou None, para "não encontrado").
+        """
+        ultimo = ""
+        while True:
+            with self._lock:
+                lote = self._conexao.execute(
+                    "SELECT cnpj, encontrado, corpo FROM respostas "
+                    "WHERE cnpj > ? ORDER BY cnpj LIMIT 1000",
+                    (ultimo,),
+                ).fetchall()
+            if not lote:
+                return
+            for cnpj, encontrado, corpo in lote:
+                if not encontrado:
+                    yield cnpj, None
+                else:
+                    yield cnpj, decodificar_corpo(corpo) if decodificar else corpo
+            ultimo = lote[-1][0]
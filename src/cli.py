@@ -0,0 +1,637 @@
+# src/cli.py
+"""
+Módulo da interface de linha de comando, para rodar o processamento sem interface gráfica
+(servidores, cron, containers). Não importa tkinter nem ttkbootstrap.
+"""
+import argparse
+import logging
+import os
+import shlex
+import sys
+import time
+
+from . import fragmentos
+from .atualizacao import PRIORIDADE_PADRAO
+from .cache import CacheRespostas
+from .limitador import LimitadorTaxa
+from .main import PASTA_DADOS, ErroProcessamento, processar_arquivo
+from .metricas import Metricas
+from .provedores import PROVEDORES, criar_roteador
+from .receita import BaseReceita
+from .reclassificacao import reclassificar
+
+logger = logging.getLogger("consultor_cnpj")
+
+
+def formatar_campos(**campos) -> str:
+    """Monta uma linha de log estruturada no formato chave=valor."""
+    partes = []
+    for chave, valor in campos.items():
+        texto = "" if valor is None else " ".join(str(valor).split())
+        if not texto or any(c in texto for c in ' ="'):
+            texto = '"' + texto.replace('"', '\\"') + '"'
+        partes.append(f"{chave}={texto}")
+    return " ".join(partes)
+
+
+def criar_relatorio_progresso(intervalo: float):
+    """
+    Cria um progress_callback que registra o progresso em log, no máximo uma vez a
+    cada 'intervalo' segundos, com vazão e contadores parciais.
+    """
+    inicio = time.monotonic()
+    ultimo = -intervalo
+
+    def relatar(atual, total, status_msg, totais_parciais):
+        nonlocal ultimo
+        agora = time.monotonic()
+        if agora - ultimo < intervalo and atual != total:
+            return
+        ultimo = agora
+        decorrido = agora - inicio
+        logger.info(
+            formatar_campos(
+                evento="progresso",
+                atual=atual,
+                total=total,
+                por_segundo=f"{atual / decorrido:.2f}" if decorrido > 0 else "",
+                **totais_parciais,
+            )
+        )
+
+    return relatar
+
+
+def inteiro_positivo(texto: str) -> int:
+    """Tipo do argparse para opções que só aceitam inteiros maiores que zero."""
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inteiro inválido: {texto!r}")
+    if valor <= 0:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {texto!r}")
+    return valor
+
+
+def numero_positivo(texto: str) -> float:
+    """Tipo do argparse para opções que só aceitam números maiores que zero."""
+    try:
+        valor = float(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inválido: {texto!r}")
+    if not valor > 0 or valor == float("inf"):
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {texto!r}")
+    return valor
+
+
+def numero_nao_negativo(texto: str) -> float:
+    """Tipo do argparse para opções que aceitam zero ou números positivos."""
+    try:
+        valor = float(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inválido: {texto!r}")
+    if not valor >= 0 or valor == float("inf"):
+        raise argparse.ArgumentTypeError(f"não pode ser negativo: {texto!r}")
+    return valor
+
+
+def caminho_receita(args) -> str:
+    """O caminho da base da Receita: o informado ou o padrão na pasta de dados."""
+    return args.receita or os.path.join(args.pasta_dados, "receita.sqlite3")
+
+
+def comando_processar(args) -> int:
+    """Executa o subcomando 'processar'."""
+    limitador = LimitadorTaxa(
+        taxa=args.consultas_por_minuto / 60, rajada=args.rajada or args.simultaneas
+    )
+    cliente = None
+    metricas = None
+    if args.receita is not None:
+        caminho = caminho_receita(args)
+        if not os.path.exists(caminho):
+            raise ErroProcessamento(
+                "Base da Receita Ausente",
+                f"{caminho} não existe. Importe os dados com 'importar-receita'.",
+            )
+        cliente = BaseReceita(caminho)
+        fonte = caminho
+    elif args.provedores:
+        # As métricas são criadas aqui para o roteador e o processamento as dividirem.
+        metricas = Metricas() if args.metricas or args.resumo_metricas else None
+        cache = None
+        if not args.sem_cache:
+            cache = CacheRespostas(
+                os.path.join(args.pasta_dados, "cache_respostas.sqlite3")
+            )
+        try:
+            cliente = criar_roteador(
+                args.provedores.split(","),
+                tamanho_pool=args.simultaneas,
+                cache=cache,
+                metricas=metricas,
+            )
+        except ValueError as e:
+            if cache is not None:
+                cache.fechar()
+            raise ErroProcessamento("Provedores Inválidos", str(e)) from e
+        fonte = args.provedores
+    else:
+        fonte = "api"
+    logger.info(
+        formatar_campos(
+            evento="inicio",
+            entrada=args.entrada,
+            fonte=fonte,
+            simultaneas=args.simultaneas,
+            consultas_por_minuto=args.consultas_por_minuto,
+        )
+    )
+    inicio = time.monotonic()
+    try:
+        contadores = processar_arquivo(
+            args.entrada,
+            criar_relatorio_progresso(args.intervalo_progresso),
+            limitador=limitador,
+            max_simultaneas=args.simultaneas,
+            cliente=cliente,
+            usar_cache=not args.sem_cache,
+            contar_total=not args.sem_total,
+            retomar=args.retomar,
+            pasta_dados=args.pasta_dados,
+            saida=args.saida,
+            arquivo_regras=args.regras,
+            arquivo_metricas=args.metricas,
+            intervalo_metricas=args.intervalo_metricas,
+            metricas=metricas,
+            resumo_metricas=args.resumo_metricas,
+            idade_maxima=(
+                None if args.atualizar_apos is None else args.atualizar_apos * 86400
+            ),
+            orcamento_atualizacao=args.orcamento_atualizacao,
+            prioridade_atualizacao=tuple(
+                c.strip() for c in args.prioridade_atualizacao.split(",") if c.strip()
+            ),
+            arquivo_mudancas=args.mudancas,
+            coordenar=args.coordenar,
+            id_execucao=args.execucao,
+            formatos=args.exportar.split(",") if args.exportar else (),
+        )
+    finally:
+        if cliente is not None:
+            cliente.fechar()
+            if getattr(cliente, "cache", None) is not None:
+                cliente.cache.fechar()
+    if args.contadores:
+        fragmentos.gravar_json(args.contadores, contadores)
+    logger.info(
+        formatar_campos(
+            evento="concluido",
+            segundos=f"{time.monotonic() - inicio:.1f}",
+            consultas_evitadas=contadores["Invalido"] + contadores["Duplicado"],
+            **contadores,
+        )
+    )
+    return 0
+
+
+def interpretar_indices(texto: str) -> list:
+    """Converte uma lista como "0,2,4-7" nos índices correspondentes."""
+    indices = []
+    for parte in texto.split(","):
+        inicio, _, fim = parte.strip().partition("-")
+        indices.extend(range(int(inicio), int(fim or inicio) + 1))
+    return indices
+
+
+def comando_fragmentar(args) -> int:
+    """Executa o subcomando 'fragmentar'."""
+    opcoes = shlex.split(args.opcoes_processar)
+    try:
+        indices = interpretar_indices(args.somente) if args.somente else None
+    except ValueError:
+        raise ErroProcessamento(
+            "Fragmentos Inválidos", f"Lista de fragmentos inválida: {args.somente!r}"
+        ) from None
+    manifesto = fragmentos.dividir(
+        args.entrada, args.pasta_trabalho, args.fragmentos, args.pasta_dados
+    )
+    logger.info(
+        formatar_campos(
+            evento="dividido",
+            pasta_trabalho=args.pasta_trabalho,
+            fragmentos=manifesto["fragmentos"],
+            linhas=",".join(map(str, manifesto["linhas"])),
+        )
+    )
+    if args.apenas_dividir:
+        return 0
+
+    inicio = time.monotonic()
+    falharam = fragmentos.executar(args.pasta_trabalho, indices, args.processos, opcoes)
+    if falharam:
+        logger.error(
+            formatar_campos(
+                evento="fragmentos_com_falha",
+                fragmentos=",".join(map(str, falharam)),
+                mensagem="Rode o mesmo comando de novo para refazer só estes.",
+            )
+        )
+        return 1
+    if indices is not None:
+        logger.info(
+            formatar_campos(
+                evento="fragmentos_concluidos",
+                fragmentos=args.somente,
+                segundos=f"{time.monotonic() - inicio:.1f}",
+                mensagem="Com todos os fragmentos concluídos, rode juntar-fragmentos.",
+            )
+        )
+        return 0
+    return juntar_fragmentos(args, inicio)
+
+
+def juntar_fragmentos(args, inicio: float) -> int:
+    contadores = fragmentos.juntar(args.pasta_trabalho, args.pasta_dados, args.saida)
+    logger.info(
+        formatar_campos(
+            evento="concluido",
+            segundos=f"{time.monotonic() - inicio:.1f}",
+            **contadores,
+        )
+    )
+    return 0
+
+
+def comando_juntar_fragmentos(args) -> int:
+    """Executa o subcomando 'juntar-fragmentos'."""
+    return juntar_fragmentos(args, time.monotonic())
+
+
+def comando_importar_receita(args) -> int:
+    """Executa o subcomando 'importar-receita'."""
+    caminho = caminho_receita(args)
+    with BaseReceita(caminho) as base:
+        for arquivo in args.arquivos:
+            inicio = time.monotonic()
+            try:
+                importadas = base.importar(arquivo)
+            except Exception as e:
+                raise ErroProcessamento(
+                    "Erro na Importação",
+                    f"Não foi possível importar {arquivo}.\n\nErro: {e}",
+                ) from e
+            logger.info(
+                formatar_campos(
+                    evento="importado",
+                    arquivo=arquivo,
+                    base=caminho,
+                    segundos=f"{time.monotonic() - inicio:.1f}",
+                    **importadas,
+                )
+            )
+    return 0
+
+
+def comando_reclassificar(args) -> int:
+    """Executa o subcomando 'reclassificar'."""
+    logger.info(
+        formatar_campos(
+            evento="inicio",
+            pasta_dados=args.pasta_dados,
+            processos=args.processos or os.cpu_count(),
+        )
+    )
+    inicio = time.monotonic()
+    resultado = reclassificar(
+        pasta_dados=args.pasta_dados,
+        saida=args.saida,
+        arquivo_regras=args.regras,
+        processos=args.processos,
+        progress_callback=criar_relatorio_progresso(args.intervalo_progresso),
+        entrada=args.arquivo,
+    )
+    for categoria, dados in resultado["por_categoria"].items():
+        logger.info(formatar_campos(evento="categoria", categoria=categoria, **dados))
+    for mudanca, quantidade in resultado["mudancas"].items():
+        anterior, nova = mudanca.split("->")
+        logger.info(
+            formatar_campos(
+                evento="mudanca", anterior=anterior, nova=nova, quantidade=quantidade
+            )
+        )
+    logger.info(
+        formatar_campos(
+            evento="concluido",
+            segundos=f"{time.monotonic() - inicio:.1f}",
+            mudaram=sum(resultado["mudancas"].values()),
+            sem_classificacao_anterior=resultado["sem_classificacao_anterior"],
+            desatualizados=resultado["desatualizados"],
+            sem_resposta=resultado["sem_resposta"],
+            **resultado["contadores"],
+        )
+    )
+    return 0
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    """Define os subcomandos e opções da linha de comando."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description="Consulta e classificação de CNPJs em lote, sem interface gráfica.",
+    )
+    parser.add_argument(
+        "--log-nivel",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Nível mínimo das mensagens de log (padrão: INFO).",
+    )
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    processar = subparsers.add_parser(
+        "processar", help="Consulta e classifica os CNPJs de um arquivo de texto."
+    )
+    processar.add_argument("entrada", help="Arquivo .txt com um CNPJ por linha.")
+    processar.add_argument(
+        "--saida",
+        help="CSV de resultado (padrão: resultado_final.csv na pasta de dados).",
+    )
+    processar.add_argument(
+        "--pasta-dados",
+        default=PASTA_DADOS,
+        help="Pasta da base de consultados, do cache e do diário (padrão: data).",
+    )
+    processar.add_argument(
+        "--regras",
+        help="JSON com as regras de classificação por CNAE "
+        "(padrão: regras_classificacao.json na pasta de dados, se existir).",
+    )
+    processar.add_argument(
+        "--receita",
+        nargs="?",
+        const="",
+        metavar="BASE",
+        help="Consulta a base local dos dados abertos da Receita em vez da API "
+        "(padrão: receita.sqlite3 na pasta de dados).",
+    )
+    processar.add_argument(
+        "--provedores",
+        metavar="LISTA",
+        help="Distribui as consultas entre vários provedores, separados por vírgula, "
+        "cada um com a sua cota opcional em consultas por minuto "
+        f"(por exemplo, cnpja:5,brasilapi:60). Provedores: {', '.join(PROVEDORES)}. "
+        "Substitui --consultas-por-minuto.",
+    )
+    processar.add_argument(
+        "--simultaneas",
+        type=inteiro_positivo,
+        default=1,
+        help="Máximo de consultas à API em andamento (padrão: 1).",
+    )
+    processar.add_argument(
+        "--consultas-por-minuto",
+        type=numero_positivo,
+        default=5,
+        help="Taxa de consultas à API (padrão: 5).",
+    )
+    processar.add_argument(
+        "--rajada",
+        type=inteiro_positivo,
+        help="Consultas liberadas de uma só vez (padrão: o número de simultâneas).",
+    )
+    processar.add_argument(
+        "--retomar",
+        action="store_true",
+        help="Retoma a execução interrompida deste arquivo a partir do diário.",
+    )
+    processar.add_argument(
+        "--sem-cache", action="store_true", help="Não usa o cache de respostas."
+    )
+    processar.add_argument(
+        "--sem-total",
+        action="store_true",
+        help="Não conta as linhas antes de começar (total desconhecido no progresso).",
+    )
+    processar.add_argument(
+        "--intervalo-progresso",
+        type=numero_positivo,
+        default=5.0,
+        help="Segundos entre duas linhas de progresso no log (padrão: 5).",
+    )
+    processar.add_argument(
+        "--metricas",
+        metavar="ARQUIVO",
+        help="Grava periodicamente as métricas por etapa neste arquivo "
+        "(formato Prometheus se terminar em .prom, JSON nos demais casos).",
+    )
+    processar.add_argument(
+        "--intervalo-metricas",
+        type=numero_positivo,
+        default=10.0,
+        help="Segundos entre duas gravações das métricas (padrão: 10).",
+    )
+    processar.add_argument(
+        "--resumo-metricas",
+        action="store_true",
+        help="Registra no log um resumo das métricas por etapa ao final.",
+    )
+    processar.add_argument(
+        "--contadores",
+        metavar="ARQUIVO",
+        help="Grava os contadores finais neste arquivo JSON ao terminar.",
+    )
+    processar.add_argument(
+        "--atualizar-apos",
+        type=numero_nao_negativo,
+        metavar="DIAS",
+        help="Modo de atualização: consulta de novo os CNPJs já consultados há mais "
+        "de DIAS dias, em vez de marcá-los como JaConsultado.",
+    )
+    processar.add_argument(
+        "--orcamento-atualizacao",
+        type=inteiro_positivo,
+        metavar="N",
+        help="Máximo de CNPJs atualizados nesta execução (padrão: todos os "
+        "desatualizados).",
+    )
+    processar.add_argument(
+        "--prioridade-atualizacao",
+        default=",".join(PRIORIDADE_PADRAO),
+        metavar="LISTA",
+        help="Categorias atualizadas primeiro quando o orçamento não dá para todos, "
+        f"separadas por vírgula (padrão: {','.join(PRIORIDADE_PADRAO)}).",
+    )
+    processar.add_argument(
+        "--mudancas",
+        metavar="ARQUIVO",
+        help="NDJSON com os CNPJs atualizados que mudaram de nome, telefone, e-mail "
+        "ou categoria (padrão: mudancas.ndjson na pasta de dados).",
+    )
+    processar.add_argument(
+        "--exportar",
+        metavar="FORMATOS",
+        help="Gera também o resultado nestes formatos, separados por vírgula, ao lado "
+        "do CSV: ndjson, parquet (precisa do pyarrow) ou xlsx.",
+    )
+    processar.add_argument(
+        "--coordenar",
+        action="store_true",
+        help="Coordena com outras instâncias que usam a mesma pasta de dados: um CNPJ "
+        "em consulta por outra instância é esperado em vez de consultado de novo, e "
+        "o CSV, o diário e as mudanças ganham nomes próprios desta execução.",
+    )
+    processar.add_argument(
+        "--execucao",
+        metavar="ID",
+        help="Identificador da execução coordenada, usado nos nomes dos arquivos e "
+        "para retomá-la (padrão: usuário, máquina e nome do arquivo de entrada).",
+    )
+    processar.set_defaults(funcao=comando_processar)
+
+    fragmentar = subparsers.add_parser(
+        "fragmentar",
+        help="Divide a lista em fragmentos e processa cada um num processo próprio.",
+    )
+    fragmentar.add_argument("entrada", help="Arquivo .txt com um CNPJ por linha.")
+    fragmentar.add_argument(
+        "--fragmentos",
+        type=inteiro_positivo,
+        required=True,
+        help="Em quantos fragmentos dividir a lista.",
+    )
+    fragmentar.add_argument(
+        "--pasta-trabalho",
+        required=True,
+        help="Pasta dos fragmentos (compartilhada, para usar várias máquinas).",
+    )
+    fragmentar.add_argument(
+        "--pasta-dados",
+        default=PASTA_DADOS,
+        help="Pasta de dados principal, de onde vêm os CNPJs já consultados e para "
+        "onde vão os resultados (padrão: data).",
+    )
+    fragmentar.add_argument(
+        "--saida",
+        help="CSV de resultado (padrão: resultado_final.csv na pasta de dados).",
+    )
+    fragmentar.add_argument(
+        "--somente",
+        metavar="LISTA",
+        help="Processa só estes fragmentos (por exemplo, 0-3 ou 0,2), sem juntar "
+        "os resultados: para dividir o trabalho entre máquinas.",
+    )
+    fragmentar.add_argument(
+        "--processos",
+        type=inteiro_positivo,
+        help="Fragmentos processados ao mesmo tempo (padrão: todos).",
+    )
+    fragmentar.add_argument(
+        "--apenas-dividir",
+        action="store_true",
+        help="Só divide a lista, sem processar.",
+    )
+    fragmentar.add_argument(
+        "--opcoes-processar",
+        default="",
+        metavar="OPCOES",
+        help="Opções passadas ao 'processar' de cada fragmento, entre aspas (por "
+        'exemplo, --opcoes-processar="--simultaneas 4 --provedores brasilapi:60").',
+    )
+    fragmentar.set_defaults(funcao=comando_fragmentar)
+
+    juntar = subparsers.add_parser(
+        "juntar-fragmentos",
+        help="Junta os resultados dos fragmentos concluídos na pasta de dados.",
+    )
+    juntar.add_argument("--pasta-trabalho", required=True, help="Pasta dos fragmentos.")
+    juntar.add_argument(
+        "--pasta-dados", default=PASTA_DADOS, help="Pasta de dados (padrão: data)."
+    )
+    juntar.add_argument(
+        "--saida",
+        help="CSV de resultado (padrão: resultado_final.csv na pasta de dados).",
+    )
+    juntar.set_defaults(funcao=comando_juntar_fragmentos)
+
+    importar = subparsers.add_parser(
+        "importar-receita",
+        help="Importa os .zip dos dados abertos do CNPJ para a base local.",
+    )
+    importar.add_argument(
+        "arquivos",
+        nargs="+",
+        help="Arquivos .zip da Receita (Empresas, Estabelecimentos, Simples, Cnaes).",
+    )
+    importar.add_argument(
+        "--receita",
+        default="",
+        metavar="BASE",
+        help="Base SQLite de destino (padrão: receita.sqlite3 na pasta de dados).",
+    )
+    importar.add_argument(
+        "--pasta-dados",
+        default=PASTA_DADOS,
+        help="Pasta de dados (padrão: data).",
+    )
+    importar.set_defaults(funcao=comando_importar_receita)
+
+    reclassificar_parser = subparsers.add_parser(
+        "reclassificar",
+        help="Reclassifica as respostas do cache com as regras atuais, sem usar a API.",
+    )
+    reclassificar_parser.add_argument(
+        "arquivo",
+        nargs="?",
+        help="Arquivo de texto com os CNPJs a reclassificar (padrão: os do resultado "
+        "da última execução).",
+    )
+    reclassificar_parser.add_argument(
+        "--pasta-dados",
+        default=PASTA_DADOS,
+        help="Pasta do cache e da base de consultados (padrão: data).",
+    )
+    reclassificar_parser.add_argument(
+        "--saida",
+        help="CSV de resultado (padrão: resultado_final.csv na pasta de dados).",
+    )
+    reclassificar_parser.add_argument(
+        "--regras",
+        help="JSON com as regras de classificação por CNAE "
+        "(padrão: regras_classificacao.json na pasta de dados, se existir).",
+    )
+    reclassificar_parser.add_argument(
+        "--processos",
+        type=inteiro_positivo,
+        help="Processos classificando ao mesmo tempo (padrão: um por núcleo).",
+    )
+    reclassificar_parser.add_argument(
+        "--intervalo-progresso",
+        type=numero_positivo,
+        default=5.0,
+        help="Segundos entre duas linhas de progresso no log (padrão: 5).",
+    )
+    reclassificar_parser.set_defaults(funcao=comando_reclassificar)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Ponto de entrada da linha de comando. Retorna o código de saída."""
+    args = criar_parser().parse_args(argv)
+    logging.basicConfig(
+        level=args.log_nivel,
+        format="%(asctime)s nivel=%(levelname)s origem=%(name)s %(message)s",
+        stream=sys.stderr,
+    )
+    try:
+        return args.funcao(args)
+    except ErroProcessamento as e:
+        logger.error(formatar_campos(evento="erro", titulo=e.titulo, mensagem=str(e)))
+        return 1
+    except KeyboardInterrupt:
+        logger.warning(
+            formatar_campos(
+                evento="interrompido",
+                mensagem="Use --retomar para continuar de onde parou.",
+            )
+        )
+        return 130
@@ -0,0 +1,70 @@
+# src/concorrencia.py
+"""
+Módulo com o executor de consultas simultâneas, limitado em requisições em andamento.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def _mapear_na_thread(funcao, itens, filtro):
+    for item in itens:
+        futuro = Future()
+        if filtro is None or filtro(item):
+            try:
+                futuro.set_result(funcao(item))
+            except Exception as e:
+                futuro.set_exception(e)
+        else:
+            futuro.set_result(None)
+        yield item, futuro
+
+
+def mapear_em_ordem(funcao, itens, max_simultaneas: int = 1, filtro=None):
+    """
+    Aplica 'funcao' a cada item usando um pool de threads e devolve os resultados
+    na mesma ordem da entrada.
+
+    No máximo 'max_simultaneas' chamadas ficam em execução ao mesmo tempo, e a
+    entrada é lida sob demanda: apenas uma janela de 2 * max_simultaneas itens
+    fica agendada, então iteráveis longos não são carregados de uma vez.
+
+    Args:
+        funcao (function): A função a ser aplicada a cada item.
+        itens (iterable): Os itens de entrada.
+        max_simultaneas (int): O número máximo de chamadas em andamento. Com 0, as
+                               chamadas são feitas na própria thread, uma a uma,
+                               para funções rápidas que não compensam o pool.
+        filtro (function, optional): Indica se 'funcao' deve ser chamada para o item.
+                                     Os itens recusados recebem um Future já resolvido
+                                     com None, sem passar pelo pool de threads.
+
+    Yields:
+        tuple: O item e o Future com o seu resultado. Chamar .result() devolve o
+               valor ou relança a exceção ocorrida na thread de trabalho.
+    """
+    if max_simultaneas < 0:
+        raise ValueError("O número de consultas simultâneas não pode ser negativo.")
+    if max_simultaneas == 0:
+        yield from _mapear_na_thread(funcao, itens, filtro)
+        return
+
+    tamanho_janela = 2 * max_simultaneas
+    janela = deque()
+    executor = ThreadPoolExecutor(
+        max_workers=max_simultaneas, thread_name_prefix="consulta"
+    )
+    try:
+        for item in itens:
+            if filtro is None or filtro(item):
+                futuro = executor.submit(funcao, item)
+            else:
+                futuro = Future()
+                futuro.set_result(None)
+            janela.append((item, futuro))
+            if len(janela) >= tamanho_janela:
+                yield janela.popleft()
+        while janela:
+            yield janela.popleft()
+    finally:
+        # Se o consumo for interrompido, descarta o que ainda não começou.
+        executor.shutdown(wait=True, cancel_futures=True)
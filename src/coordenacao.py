@@ -0,0 +1,230 @@
+# src/coordenacao.py
+"""
+Módulo de coordenação entre várias instâncias que usam a mesma pasta de dados: reservas
+dos CNPJs em consulta, para que cada um seja consultado por uma só instância, e os
+nomes dos arquivos de cada execução.
+"""
+import getpass
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+
+# Segundos entre dois sinais de vida de uma execução.
+INTERVALO_SINAL = 10.0
+
+# Sem sinal de vida por este tempo, a execução é dada como encerrada (fechada à força,
+# máquina desligada) e as suas reservas passam a valer para as outras.
+TEMPO_ABANDONO = 60.0
+
+# Segundos entre duas verificações de um CNPJ reservado por outra instância.
+INTERVALO_ESPERA = 0.5
+
+# Resultados de Coordenador.reservar().
+CONSULTADO = "consultado"
+RESERVADO = "reservado"
+OCUPADO = "ocupado"
+
+
+def id_execucao_padrao(path: str) -> str:
+    """
+    O identificador da execução de um arquivo por este usuário nesta máquina. É sempre
+    o mesmo para o mesmo arquivo, para que a execução possa ser retomada, e diferente
+    entre operadores, para que os arquivos de um não sobrescrevam os do outro.
+    """
+    nome = os.path.splitext(os.path.basename(path))[0]
+    try:
+        usuario = getpass.getuser()
+    except Exception:
+        usuario = "usuario"
+    return re.sub(r"[^\w.-]+", "_", f"{usuario}-{socket.gethostname()}-{nome}")
+
+
+def arquivos_execucao(pasta_dados: str, id_execucao: str) -> dict:
+    """
+    Os caminhos dos arquivos próprios de uma execução coordenada.
+
+    Returns:
+        dict: 'saida' (o CSV), 'parciais' (a pasta dos parciais), 'diario' e 'mudancas'.
+    """
+    return {
+        "saida": os.path.join(pasta_dados, f"resultado_{id_execucao}.csv"),
+        "parciais": os.path.join(pasta_dados, "parciais", id_execucao),
+        "diario": os.path.join(pasta_dados, f"diario_{id_execucao}.ndjson"),
+        "mudancas": os.path.join(pasta_dados, f"mudancas_{id_execucao}.ndjson"),
+    }
+
+
+def arquivos_padrao(pasta_dados: str) -> dict:
+    """
+    Os caminhos dos arquivos de uma execução não coordenada, com as mesmas chaves de
+    arquivos_execucao().
+    """
+    return {
+        "saida": os.path.join(pasta_dados, "resultado_final.csv"),
+        "parciais": os.path.join(pasta_dados, "parciais"),
+        "diario": os.path.join(pasta_dados, "diario_execucao.ndjson"),
+        "mudancas": os.path.join(pasta_dados, "mudancas.ndjson"),
+    }
+
+
+class Coordenador:
+    """
+    Reservas dos CNPJs em consulta, guardadas na própria base de consultados e
+    compartilhadas por todas as instâncias que a usam.
+
+    Antes de consultar um CNPJ, a instância o reserva. A verificação na base e a
+    reserva acontecem numa única transação do SQLite, então dois processos nunca
+    reservam o mesmo CNPJ. Quem encontra o CNPJ reservado por outra instância espera
+    pela consulta dela em vez de gastar a própria cota. Cada execução dá sinal de vida
+    periodicamente; as reservas de uma execução sem sinal há TEMPO_ABANDONO segundos
+    deixam de valer.
+
+    Uma mesma instância pode ser usada por várias threads ao mesmo tempo.
+    """
+
+    def __init__(
+        self,
+        caminho_base: str,
+        id_execucao: str,
+        tempo_abandono: float = TEMPO_ABANDONO,
+        intervalo_sinal: float = INTERVALO_SINAL,
+        intervalo_espera: float = INTERVALO_ESPERA,
+    ):
+        """
+        Args:
+            caminho_base (str): O arquivo SQLite da BaseConsultados, já criado.
+            id_execucao (str): O identificador desta execução.
+            tempo_abandono (float): Segundos sem sinal de vida para uma execução ser
+                                    dada como encerrada.
+            intervalo_sinal (float): Segundos entre dois sinais de vida desta execução.
+            intervalo_espera (float): Segundos entre duas verificações de um CNPJ
+                                      reservado por outra instância.
+        """
+        self.id_execucao = id_execucao
+        self.tempo_abandono = tempo_abandono
+        self.intervalo_espera = intervalo_espera
+        self.aguardados = 0
+        self._lock = threading.Lock()
+        # Sem transações implícitas: cada reserva abre a sua com BEGIN IMMEDIATE.
+        self._conexao = sqlite3.connect(
+            caminho_base, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS reservas (cnpj TEXT PRIMARY KEY, "
+            "execucao TEXT NOT NULL, reservado_em REAL NOT NULL)"
+        )
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS execucoes "
+            "(id TEXT PRIMARY KEY, sinal_em REAL NOT NULL)"
+        )
+        self._sinalizar()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sinalizar_periodicamente, args=(intervalo_sinal,), daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _sinalizar(self):
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO execucoes VALUES (?, ?)",
+                (self.id_execucao, time.time()),
+            )
+
+    def _sinalizar_periodicamente(self, intervalo: float):
+        while not self._parar.wait(intervalo):
+            try:
+                self._sinalizar()
+            except sqlite3.Error:
+                # Base ocupada por muito tempo; o próximo sinal tenta de novo.
+                pass
+
+    def reservar(self, cnpj: str, ignorar_base: bool = False) -> str:
+        """
+        Reserva um CNPJ para esta execução consultar.
+
+        Args:
+            cnpj (str): O CNPJ, apenas dígitos.
+            ignorar_base (bool): Reserva mesmo que o CNPJ já esteja na base (para
+                                 consultá-lo de novo, no modo de atualização).
+
+        Returns:
+            str: CONSULTADO, se o CNPJ já está na base; RESERVADO, se a reserva é desta
+                 execução; OCUPADO, se outra execução em andamento o reservou.
+        """
+        agora = time.time()
+        with self._lock:
+            conexao = self._conexao
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                if (
+                    not ignorar_base
+                    and conexao.execute(
+                        "SELECT 1 FROM consultados WHERE cnpj = ?", (cnpj,)
+                    ).fetchone()
+                ):
+                    return CONSULTADO
+                dono = conexao.execute(
+                    "SELECT r.execucao, e.sinal_em FROM reservas r "
+                    "LEFT JOIN execucoes e ON e.id = r.execucao WHERE r.cnpj = ?",
+                    (cnpj,),
+                ).fetchone()
+                if (
+                    dono is not None
+                    and dono[0] != self.id_execucao
+                    and dono[1] is not None
+                    and agora - dono[1] < self.tempo_abandono
+                ):
+                    return OCUPADO
+                conexao.execute(
+                    "INSERT OR REPLACE INTO reservas VALUES (?, ?, ?)",
+                    (cnpj, self.id_execucao, agora),
+                )
+                return RESERVADO
+            finally:
+                conexao.execute("COMMIT")
+
+    def aguardar(self, cnpj: str) -> str:
+        """
+        Espera a outra execução terminar a consulta de um CNPJ reservado por ela.
+
+        Returns:
+            str: CONSULTADO, se ela gravou o CNPJ na base; RESERVADO, se ela desistiu
+                 (falha transitória, execução encerrada) e a reserva passou a esta.
+        """
+        with self._lock:
+            self.aguardados += 1
+        while (resultado := self.reservar(cnpj)) == OCUPADO:
+            time.sleep(self.intervalo_espera)
+        return resultado
+
+    def liberar(self, cnpj: str):
+        """Desfaz a reserva de um CNPJ, depois de gravado na base ou se a consulta falhou."""
+        with self._lock:
+            self._conexao.execute(
+                "DELETE FROM reservas WHERE cnpj = ? AND execucao = ?",
+                (cnpj, self.id_execucao),
+            )
+
+    def fechar(self):
+        """Desfaz as reservas que restarem e encerra os sinais de vida desta execução."""
+        self._parar.set()
+        self._thread.join()
+        with self._lock:
+            self._conexao.execute(
+                "DELETE FROM reservas WHERE execucao = ?", (self.id_execucao,)
+            )
+            self._conexao.execute(
+                "DELETE FROM execucoes WHERE id = ?", (self.id_execucao,)
+            )
+            self._conexao.close()
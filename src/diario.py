@@ -0,0 +1,149 @@
+# src/diario.py
+"""
+Módulo com o diário de execução (write-ahead journal), que permite retomar uma execução
+interrompida sem repetir consultas já pagas.
+"""
+import json
+import os
+
+CAMINHO_PADRAO = "data/diario_execucao.ndjson"
+TAMANHO_LOTE_PADRAO = 50
+
+
+def _identificar(path: str) -> dict:
+    """Dados que identificam o arquivo de entrada de uma execução."""
+    return {"arquivo": os.path.abspath(path), "tamanho": os.path.getsize(path)}
+
+
+class Diario:
+    """
+    Diário append-only em NDJSON, com uma linha por CNPJ concluído.
+
+    A primeira linha identifica o arquivo de entrada. As demais trazem a linha do
+    arquivo de entrada ("linha") e uma destas chaves:
+
+    - "registro": o CNPJ foi concluído e esta é a linha gravada no resultado;
+    - "pendente": a consulta falhou por motivo passageiro e ainda será repetida;
+    - "duplicado": o CNPJ já tinha aparecido antes no arquivo e foi descartado;
+    - "falha": a consulta continuou falhando e o CNPJ saiu como NaoEncontrado;
+    - "erro": ocorreu um erro inesperado e o CNPJ foi pulado.
+
+    As gravações são sincronizadas com o disco (fsync) a cada 'tamanho_lote' linhas,
+    então uma queda perde no máximo esse número de linhas.
+    """
+
+    def __init__(
+        self, caminho: str = CAMINHO_PADRAO, tamanho_lote: int = TAMANHO_LOTE_PADRAO
+    ):
+        """
+        Args:
+            caminho (str): O arquivo do diário.
+            tamanho_lote (int): Quantas linhas gravar entre duas sincronizações.
+        """
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self._arquivo = None
+        self._nao_sincronizadas = 0
+        self._tamanho_valido = None
+
+    def existe_para(self, path: str) -> bool:
+        """Indica se há um diário interrompido do mesmo arquivo de entrada."""
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                cabecalho = json.loads(f.readline())
+        except (OSError, ValueError):
+            return False
+        return cabecalho == _identificar(path)
+
+    def ler(self, path: str):
+        """
+        Percorre as entradas de um diário existente.
+
+        Args:
+            path (str): O arquivo de entrada que está sendo retomado.
+
+        Yields:
+            dict: As entradas do diário, na ordem em que foram gravadas.
+
+        Raises:
+            ValueError: Se o diário não existir ou pertencer a outro arquivo de entrada.
+        """
+        if not self.existe_para(path):
+            raise ValueError(
+                "Não há uma execução interrompida deste arquivo para retomar."
+            )
+        with open(self.caminho, "rb") as f:
+            self._tamanho_valido = len(f.readline())
+            for linha in f:
+                try:
+                    entrada = json.loads(linha)
+                except ValueError:
+                    # A última linha pode ter ficado pela metade na queda.
+                    break
+                if not linha.endswith(b"\n"):
+                    break
+                self._tamanho_valido += len(linha)
+                yield entrada
+
+    def iniciar(self, path: str):
+        """Começa um diário novo para o arquivo de entrada, descartando o anterior."""
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._arquivo = open(self.caminho, "w", encoding="utf-8")
+        self._escrever(_identificar(path))
+        self.sincronizar()
+
+    def continuar(self):
+        """
+        Reabre o diário existente para acrescentar novas entradas, descartando uma
+        eventual linha incompleta deixada pela queda. Chamar depois de ler().
+        """
+        self._arquivo = open(self.caminho, "a", encoding="utf-8")
+        if self._tamanho_valido is not None:
+            self._arquivo.truncate(self._tamanho_valido)
+
+    def registrar(self, linha: int, cnpj: str, registro):
+        """Grava um CNPJ concluído e a linha do arquivo de entrada em que ele estava."""
+        self._escrever({"linha": linha, "cnpj": cnpj, "registro": dict(registro)})
+
+    def registrar_pendente(self, linha: int, cnpj: str):
+        """Grava um CNPJ cuja consulta falhou e ainda será repetida."""
+        self._escrever({"linha": linha, "pendente": cnpj})
+
+    def registrar_duplicado(self, linha: int, cnpj: str):
+        """Grava uma repetição de um CNPJ que já apareceu antes no arquivo."""
+        self._escrever({"linha": linha, "duplicado": cnpj})
+
+    def registrar_falha(self, linha: int, cnpj: str):
+        """Grava um CNPJ que esgotou as repetições sem uma resposta da API."""
+        self._escrever({"linha": linha, "falha": cnpj})
+
+    def registrar_erro(self, linha: int, cnpj: str):
+        """Grava um CNPJ pulado por um erro inesperado."""
+        self._escrever({"linha": linha, "erro": cnpj})
+
+    def _escrever(self, entrada: dict):
+        self._arquivo.write(
+            json.dumps(entrada, ensure_ascii=False, separators=(",", ":")) + "\n"
+        )
+        self._nao_sincronizadas += 1
+        if self._nao_sincronizadas >= self.tamanho_lote:
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Força a gravação das entradas pendentes no disco."""
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        self._nao_sincronizadas = 0
+
+    def fechar(self):
+        """Sincroniza e fecha o diário, mantendo-o para uma futura retomada."""
+        if self._arquivo and not self._arquivo.closed:
+            self.sincronizar()
+            self._arquivo.close()
+
+    def remover(self):
+        """Fecha e apaga o diário, ao final de uma execução concluída."""
+        self.fechar()
+        os.remove(self.caminho)
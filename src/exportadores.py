@@ -0,0 +1,371 @@
+# src/exportadores.py
+"""
+Módulo com os formatos do arquivo de resultado (CSV, NDJSON, Parquet e XLSX).
+
+Cada exportador grava as linhas em arquivos parciais, um por status, à medida que elas
+chegam, e depois junta os parciais, na ordem dos status, no arquivo final. Assim
+nenhum formato precisa manter o resultado na memória.
+"""
+import csv
+import json
+import re
+import shutil
+import zipfile
+from xml.sax.saxutils import escape
+
+from .registro import CAMPOS
+
+CABECALHO = list(CAMPOS)
+
+# Separador dos telefones e e-mails nas colunas de texto (ver classificar_empresa).
+SEPARADOR_CONTATOS = " / "
+
+# Linhas acumuladas antes de gravar um grupo de linhas (row group) no Parquet.
+TAMANHO_LOTE_PARQUET = 50_000
+
+# Limite de linhas de uma planilha do Excel; o que passar vai para outra aba.
+LIMITE_LINHAS_XLSX = 1_048_576
+
+# Caracteres de controle que o XML não aceita.
+_INVALIDOS_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def separar_contatos(texto: str) -> list:
+    """Separa os telefones ou e-mails de uma coluna de texto em uma lista."""
+    return texto.split(SEPARADOR_CONTATOS) if texto else []
+
+
+class _ParcialTexto:
+    """Arquivo parcial de texto, com uma linha do resultado por linha do arquivo."""
+
+    def __init__(self, caminho: str, formatar, encoding: str = "utf-8"):
+        self.arquivo = open(caminho, "w", newline="", encoding=encoding)
+        self._formatar = formatar
+
+    def escrever(self, linha: tuple):
+        self.arquivo.write(self._formatar(linha))
+
+    def descarregar(self):
+        self.arquivo.flush()
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class _ParcialCSV(_ParcialTexto):
+    """Parcial CSV completo, com BOM e cabeçalho, que já pode ser aberto no Excel."""
+
+    def __init__(self, caminho: str):
+        super().__init__(caminho, None, encoding="utf-8-sig")
+        escritor = csv.writer(self.arquivo)
+        escritor.writerow(CABECALHO)
+        self.escrever = escritor.writerow
+
+
+def _concatenar(parciais: list, f_out, pular_primeira: bool = False):
+    """Copia os bytes dos parciais, em ordem, para um arquivo binário já aberto."""
+    for caminho in parciais:
+        with open(caminho, "rb") as f_in:
+            if pular_primeira:
+                f_in.readline()
+            shutil.copyfileobj(f_in, f_out)
+
+
+class ExportadorCSV:
+    """O CSV em UTF-8 com BOM, para abrir direto no Excel. É sempre gerado."""
+
+    nome = "csv"
+    extensao = ".csv"
+    extensao_parcial = ".csv"
+
+    def abrir_parcial(self, caminho: str):
+        return _ParcialCSV(caminho)
+
+    def juntar(self, parciais: list, destino: str):
+        with open(destino, "w", newline="", encoding="utf-8-sig") as f_out:
+            csv.writer(f_out).writerow(CABECALHO)
+            f_out.flush()
+            # Pula o BOM e o cabeçalho de cada parcial.
+            _concatenar(parciais, f_out.buffer, pular_primeira=True)
+
+
+class ExportadorNDJSON:
+    """
+    Um objeto JSON por linha, com os telefones e e-mails em listas:
+    {"cnpj": ..., "nome": ..., "telefones": [...], "emails": [...], "status": ...}.
+    """
+
+    nome = "ndjson"
+    extensao = ".ndjson"
+    extensao_parcial = ".ndjson"
+
+    @staticmethod
+    def formatar(linha: tuple) -> str:
+        cnpj, nome, telefone, email, status = linha
+        return (
+            json.dumps(
+                {
+                    "cnpj": cnpj,
+                    "nome": nome,
+                    "telefones": separar_contatos(telefone),
+                    "emails": separar_contatos(email),
+                    "status": status,
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            + "\n"
+        )
+
+    def abrir_parcial(self, caminho: str):
+        return _ParcialTexto(caminho, self.formatar)
+
+    def juntar(self, parciais: list, destino: str):
+        with open(destino, "wb") as f_out:
+            _concatenar(parciais, f_out)
+
+
+class ExportadorXLSX:
+    """
+    Planilha do Excel gravada em fluxo, sem dependências: cada parcial guarda as linhas
+    já em XML (uma por linha do arquivo), e o arquivo final é montado copiando-as para
+    dentro do ZIP, só acrescentando o número de cada linha. Resultados maiores que uma
+    planilha continuam em novas abas.
+    """
+
+    nome = "xlsx"
+    extensao = ".xlsx"
+
+    # Os parciais são só as linhas em XML, não planilhas.
+    extensao_parcial = ".xlsx.xml"
+
+    @staticmethod
+    def _celula(valor: str) -> str:
+        texto = escape(_INVALIDOS_XML.sub("", valor))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+    @classmethod
+    def formatar(cls, linha: tuple) -> str:
+        return "<row>" + "".join(map(cls._celula, linha)) + "</row>\n"
+
+    @staticmethod
+    def _numerar(linha: bytes, numero: int) -> bytes:
+        """Acrescenta o número da linha a um <row> gravado por formatar()."""
+        return b'<row r="%d">' % numero + linha[5:]
+
+    def abrir_parcial(self, caminho: str):
+        return _ParcialTexto(caminho, self.formatar)
+
+    def juntar(self, parciais: list, destino: str):
+        inicio_planilha = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            "<sheetData>"
+        ).encode("utf-8") + self._numerar(self.formatar(CABECALHO).encode("utf-8"), 1)
+        fim_planilha = b"</sheetData></worksheet>"
+
+        with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zf:
+            abas = 0
+            planilha = None
+            linhas = LIMITE_LINHAS_XLSX
+            for caminho in parciais:
+                with open(caminho, "rb") as f_in:
+                    for linha in f_in:
+                        if linhas >= LIMITE_LINHAS_XLSX:
+                            if planilha is not None:
+                                planilha.write(fim_planilha)
+                                planilha.close()
+                            abas += 1
+                            planilha = zf.open(
+                                f"xl/worksheets/sheet{abas}.xml", "w", force_zip64=True
+                            )
+                            planilha.write(inicio_planilha)
+                            linhas = 1
+                        linhas += 1
+                        planilha.write(self._numerar(linha, linhas))
+            if planilha is None:
+                # Sem nenhuma linha: uma aba só com o cabeçalho.
+                abas = 1
+                planilha = zf.open("xl/worksheets/sheet1.xml", "w")
+                planilha.write(inicio_planilha)
+            planilha.write(fim_planilha)
+            planilha.close()
+            self._gravar_estrutura(zf, abas)
+
+    @staticmethod
+    def _gravar_estrutura(zf: zipfile.ZipFile, abas: int):
+        """Grava os arquivos que descrevem a pasta de trabalho e as suas abas."""
+        numeros = range(1, abas + 1)
+        zf.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" '
+            'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="'
+                "application/vnd.openxmlformats-officedocument.spreadsheetml."
+                'worksheet+xml"/>'
+                for n in numeros
+            )
+            + "</Types>",
+        )
+        zf.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'relationships"><Relationship Id="rId1" Type="http://schemas.'
+            "openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+            '" Target="xl/workbook.xml"/></Relationships>',
+        )
+        zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships"><sheets>'
+            + "".join(
+                f'<sheet name="Resultado{"" if n == 1 else f" {n}"}" sheetId="{n}" '
+                f'r:id="rId{n}"/>'
+                for n in numeros
+            )
+            + "</sheets></workbook>",
+        )
+        zf.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'relationships">'
+            + "".join(
+                f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/'
+                'officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{n}.xml"/>'
+                for n in numeros
+            )
+            + "</Relationships>",
+        )
+
+
+class _ParcialParquet:
+    """Parcial Parquet, gravado em grupos de TAMANHO_LOTE_PARQUET linhas."""
+
+    def __init__(self, caminho: str, esquema, pyarrow):
+        self._pyarrow = pyarrow
+        self._esquema = esquema
+        self._escritor = pyarrow.parquet.ParquetWriter(caminho, esquema)
+        self._colunas = {campo: [] for campo in esquema.names}
+
+    def escrever(self, linha: tuple):
+        cnpj, nome, telefone, email, status = linha
+        colunas = self._colunas
+        colunas["cnpj"].append(cnpj)
+        colunas["nome"].append(nome)
+        colunas["telefones"].append(separar_contatos(telefone))
+        colunas["emails"].append(separar_contatos(email))
+        colunas["status"].append(status)
+        if len(colunas["cnpj"]) >= TAMANHO_LOTE_PARQUET:
+            self.descarregar()
+
+    def descarregar(self):
+        if self._colunas["cnpj"]:
+            self._escritor.write_table(
+                self._pyarrow.Table.from_pydict(self._colunas, schema=self._esquema)
+            )
+            for valores in self._colunas.values():
+                valores.clear()
+
+    def fechar(self):
+        self.descarregar()
+        self._escritor.close()
+
+
+class ExportadorParquet:
+    """
+    Arquivo Parquet, com os telefones e e-mails em colunas de listas, para carregar
+    o resultado direto em ferramentas de análise. Precisa do pyarrow instalado.
+    """
+
+    nome = "parquet"
+    extensao = ".parquet"
+    extensao_parcial = ".parquet"
+
+    def __init__(self):
+        """
+        Raises:
+            ValueError: Se o pyarrow não estiver instalado.
+        """
+        # O pyarrow é opcional e demora a importar: só é carregado quando o formato
+        # Parquet é pedido, e não ao abrir o programa.
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ValueError(
+                "O formato Parquet precisa do pyarrow. Instale com 'pip install pyarrow'."
+            ) from e
+        self._pyarrow = pyarrow
+        self.esquema = pyarrow.schema(
+            [
+                ("cnpj", pyarrow.string()),
+                ("nome", pyarrow.string()),
+                ("telefones", pyarrow.list_(pyarrow.string())),
+                ("emails", pyarrow.list_(pyarrow.string())),
+                ("status", pyarrow.string()),
+            ]
+        )
+
+    def abrir_parcial(self, caminho: str):
+        return _ParcialParquet(caminho, self.esquema, self._pyarrow)
+
+    def juntar(self, parciais: list, destino: str):
+        pyarrow = self._pyarrow
+        escritor = pyarrow.parquet.ParquetWriter(destino, self.esquema)
+        try:
+            for caminho in parciais:
+                for lote in pyarrow.parquet.ParquetFile(caminho).iter_batches():
+                    escritor.write_table(pyarrow.Table.from_batches([lote]))
+        finally:
+            escritor.close()
+
+
+EXPORTADORES = {
+    exportador.nome: exportador
+    for exportador in (
+        ExportadorCSV,
+        ExportadorNDJSON,
+        ExportadorParquet,
+        ExportadorXLSX,
+    )
+}
+
+
+def criar_exportadores(formatos) -> list:
+    """
+    Cria os exportadores dos formatos gerados além do CSV.
+
+    Args:
+        formatos (iterable): Nomes de EXPORTADORES (por exemplo, "ndjson", "parquet").
+                             "csv" é ignorado, pois o CSV é sempre gerado.
+
+    Returns:
+        list: Os exportadores, sem repetições, na ordem informada.
+
+    Raises:
+        ValueError: Se um formato não existir ou a sua dependência não estiver instalada.
+    """
+    exportadores = []
+    vistos = {"csv"}
+    for formato in formatos:
+        formato = formato.strip().lower()
+        if not formato or formato in vistos:
+            continue
+        if formato not in EXPORTADORES:
+            raise ValueError(
+                f"Formato desconhecido: {formato}. Formatos: {', '.join(EXPORTADORES)}."
+            )
+        vistos.add(formato)
+        exportadores.append(EXPORTADORES[formato]())
+    return exportadores
@@ -0,0 +1,531 @@
+# src/fragmentos.py
+"""
+Módulo que divide uma lista de CNPJs em fragmentos, processa cada um num processo
+(ou máquina) independente e junta os resultados.
+"""
+import csv
+import glob
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import zlib
+
+from .armazenamento import BaseConsultados
+from .cache import CacheRespostas
+from .exportadores import EXPORTADORES, criar_exportadores
+from .main import PASTA_DADOS, ErroProcessamento
+from .registro import CAMPOS, criar_registro
+from .saida import EscritorResultados
+from .validacao import normalizar_cnpj
+
+# Arquivo, na pasta de trabalho, com a divisão feita (entrada e número de fragmentos).
+MANIFESTO = "fragmentos.json"
+
+# Arquivo gravado na pasta de um fragmento quando ele termina, com os contadores.
+MARCADOR = "concluido.json"
+
+# O CSV de resultado de cada fragmento, na sua pasta. É passado com --saida, então
+# não muda com as opções do 'processar' (como --coordenar, que daria outro nome).
+SAIDA_FRAGMENTO = "resultado_final.csv"
+
+# Arquivo, na pasta de cada fragmento, com a linha do arquivo de entrada original de
+# cada linha do entrada.txt do fragmento, para juntar os resultados na ordem original.
+LINHAS_ORIGINAIS = "linhas_originais.txt"
+
+# A pasta do projeto, de onde 'python -m src' é executado nos fragmentos.
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+
+def fragmento_do_cnpj(cnpj: str, total: int) -> int:
+    """
+    O fragmento de um CNPJ, pelo crc32 da forma normalizada.
+
+    As repetições de um CNPJ, mesmo com pontuação diferente, caem no mesmo fragmento,
+    então a remoção de duplicados continua valendo para a lista inteira.
+    """
+    return zlib.crc32(cnpj.encode("utf-8")) % total
+
+
+def pasta_fragmento(pasta: str, indice: int) -> str:
+    """A pasta de dados de um fragmento dentro da pasta de trabalho."""
+    return os.path.join(pasta, f"fragmento_{indice:03d}")
+
+
+def gravar_json(caminho: str, dados: dict):
+    """Grava um JSON substituindo o arquivo de forma atômica."""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+def ler_manifesto(pasta: str):
+    """O manifesto da divisão feita na pasta de trabalho, ou None se não houver."""
+    try:
+        with open(os.path.join(pasta, MANIFESTO), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def concluido(pasta: str, indice: int):
+    """Os contadores de um fragmento já concluído, ou None se ele não terminou."""
+    try:
+        with open(
+            os.path.join(pasta_fragmento(pasta, indice), MARCADOR), encoding="utf-8"
+        ) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _copiar_linhas(destino: str, origem: str, tabela: str, indice: int, total: int):
+    """Copia para 'destino' as linhas de 'tabela' em 'origem' que são do fragmento."""
+    conexao = sqlite3.connect(destino)
+    try:
+        conexao.create_function(
+            "fragmento",
+            1,
+            lambda cnpj: fragmento_do_cnpj(cnpj, total),
+            deterministic=True,
+        )
+        conexao.execute("ATTACH DATABASE ? AS origem", (origem,))
+        with conexao:
+            conexao.execute(
+                f"INSERT OR IGNORE INTO {tabela} "
+                f"SELECT * FROM origem.{tabela} WHERE fragmento(cnpj) = ?",
+                (indice,),
+            )
+        conexao.execute("DETACH DATABASE origem")
+    finally:
+        conexao.close()
+
+
+def dividir(entrada: str, pasta: str, total: int, pasta_dados: str = PASTA_DADOS):
+    """
+    Divide o arquivo de entrada em 'total' fragmentos, cada um com a sua pasta de dados.
+
+    Cada fragmento recebe, da pasta de dados principal, os CNPJs já consultados e as
+    respostas em cache que lhe pertencem, para não repetir consultas, e o arquivo de
+    regras de classificação, se houver. Fragmentos sem nenhum CNPJ já nascem
+    concluídos.
+
+    Args:
+        entrada (str): O arquivo de texto com os CNPJs.
+        pasta (str): A pasta de trabalho, onde ficam os fragmentos.
+        total (int): O número de fragmentos.
+        pasta_dados (str): A pasta de dados principal.
+
+    Returns:
+        dict: O manifesto gravado na pasta de trabalho.
+
+    Raises:
+        ErroProcessamento: Se a pasta já tiver outra divisão ou a entrada não puder
+                           ser lida.
+    """
+    if total < 1:
+        raise ErroProcessamento(
+            "Fragmentos Inválidos", "O número de fragmentos deve ser pelo menos 1."
+        )
+    manifesto = ler_manifesto(pasta)
+    if manifesto is not None:
+        if manifesto["fragmentos"] != total or manifesto["entrada"] != os.path.abspath(
+            entrada
+        ):
+            raise ErroProcessamento(
+                "Divisão Diferente",
+                f"{pasta} já tem a divisão de {manifesto['entrada']} em "
+                f"{manifesto['fragmentos']} fragmentos. Use outra pasta de trabalho.",
+            )
+        return manifesto
+
+    pastas = [pasta_fragmento(pasta, i) for i in range(total)]
+    for p in pastas:
+        os.makedirs(p, exist_ok=True)
+    arquivos = [
+        open(os.path.join(p, "entrada.txt"), "w", encoding="utf-8") for p in pastas
+    ]
+    originais = [
+        open(os.path.join(p, LINHAS_ORIGINAIS), "w", encoding="utf-8") for p in pastas
+    ]
+    linhas = [0] * total
+    try:
+        with open(entrada, "r", encoding="utf-8", errors="replace") as f_in:
+            for numero, linha in enumerate(f_in):
+                texto = linha.strip()
+                if not texto:
+                    continue
+                cnpj, _ = normalizar_cnpj(texto)
+                indice = fragmento_do_cnpj(cnpj or texto, total)
+                arquivos[indice].write(texto + "\n")
+                originais[indice].write(f"{numero}\n")
+                linhas[indice] += 1
+    except OSError as e:
+        raise ErroProcessamento(
+            "Erro de Leitura", f"Não foi possível ler o arquivo.\n\nErro: {e}"
+        ) from e
+    finally:
+        for arquivo in arquivos + originais:
+            arquivo.close()
+
+    base_principal = os.path.join(pasta_dados, "consultados.sqlite3")
+    cache_principal = os.path.join(pasta_dados, "cache_respostas.sqlite3")
+    regras = os.path.join(pasta_dados, "regras_classificacao.json")
+    for indice, p in enumerate(pastas):
+        if not linhas[indice]:
+            gravar_json(os.path.join(p, MARCADOR), {})
+            continue
+        if os.path.exists(base_principal):
+            destino = os.path.join(p, "consultados.sqlite3")
+            BaseConsultados(destino).fechar()
+            _copiar_linhas(destino, base_principal, "consultados", indice, total)
+        if os.path.exists(cache_principal):
+            destino = os.path.join(p, "cache_respostas.sqlite3")
+            CacheRespostas(destino).fechar()
+            _copiar_linhas(destino, cache_principal, "respostas", indice, total)
+        if os.path.exists(regras):
+            with open(regras, "rb") as f_in, open(
+                os.path.join(p, "regras_classificacao.json"), "wb"
+            ) as f_out:
+                f_out.write(f_in.read())
+
+    manifesto = {
+        "entrada": os.path.abspath(entrada),
+        "fragmentos": total,
+        "linhas": linhas,
+        "dividido_em": time.time(),
+    }
+    gravar_json(os.path.join(pasta, MANIFESTO), manifesto)
+    return manifesto
+
+
+def comando_programa() -> list:
+    """
+    O início da linha de comando que roda os subcomandos de 'python -m src'.
+
+    No executável do PyInstaller (sys.frozen) não há um interpretador para rodar
+    'python -m': o próprio executável recebe o subcomando (ver run.py).
+    """
+    if getattr(sys, "frozen", False):
+        return [sys.executable]
+    return [sys.executable, "-m", "src"]
+
+
+def comando_fragmento(pasta: str, indice: int, opcoes=()) -> list:
+    """
+    A linha de comando que processa um fragmento, retomando-o se já tiver começado.
+
+    Args:
+        pasta (str): A pasta de trabalho.
+        indice (int): O fragmento.
+        opcoes (list): Opções extras para 'python -m src processar', como
+                       ["--simultaneas", "4"]. Um --saida nelas é ignorado: o CSV
+                       fica sempre em SAIDA_FRAGMENTO, onde juntar() o procura.
+    """
+    pasta_dados = os.path.abspath(pasta_fragmento(pasta, indice))
+    comando = comando_programa() + [
+        "processar",
+        os.path.join(pasta_dados, "entrada.txt"),
+        "--pasta-dados",
+        pasta_dados,
+        "--contadores",
+        os.path.join(pasta_dados, MARCADOR),
+    ]
+    # diario_execucao.ndjson, ou diario_<id>.ndjson com --coordenar.
+    if glob.glob(os.path.join(glob.escape(pasta_dados), "diario_*.ndjson")):
+        # O fragmento foi interrompido: continua de onde parou.
+        comando.append("--retomar")
+    return (
+        comando
+        + list(opcoes)
+        + [
+            "--saida",
+            os.path.join(pasta_dados, SAIDA_FRAGMENTO),
+        ]
+    )
+
+
+def executar(pasta: str, indices=None, processos: int = None, opcoes=()) -> list:
+    """
+    Processa os fragmentos ainda não concluídos, cada um num processo independente.
+
+    Cada fragmento roda 'python -m src processar' na sua pasta, com o log em
+    execucao.log, e grava o marcador concluido.json ao terminar. Fragmentos
+    interrompidos são retomados, e os concluídos, pulados: basta rodar de novo
+    para refazer só os que falharam. Em várias máquinas com a pasta de trabalho
+    compartilhada, cada uma executa os seus 'indices'.
+
+    Args:
+        pasta (str): A pasta de trabalho, já dividida com dividir().
+        indices (list, optional): Os fragmentos a processar. Por padrão, todos.
+        processos (int, optional): Quantos fragmentos rodar ao mesmo tempo. Por
+                                   padrão, todos os pendentes.
+        opcoes (list): Opções extras para 'python -m src processar'.
+
+    Returns:
+        list: Os fragmentos que falharam.
+
+    Raises:
+        ErroProcessamento: Se a pasta não tiver sido dividida.
+    """
+    manifesto = ler_manifesto(pasta)
+    if manifesto is None:
+        raise ErroProcessamento(
+            "Divisão Ausente", f"{pasta} não tem fragmentos. Divida a entrada antes."
+        )
+    if indices is None:
+        indices = range(manifesto["fragmentos"])
+    pendentes = [i for i in indices if concluido(pasta, i) is None]
+    processos = processos or len(pendentes)
+
+    em_execucao = {}
+    falharam = []
+    while pendentes or em_execucao:
+        while pendentes and len(em_execucao) < processos:
+            indice = pendentes.pop(0)
+            log = open(
+                os.path.join(pasta_fragmento(pasta, indice), "execucao.log"),
+                "a",
+                encoding="utf-8",
+            )
+            em_execucao[indice] = (
+                subprocess.Popen(
+                    comando_fragmento(pasta, indice, opcoes),
+                    cwd=None if getattr(sys, "frozen", False) else RAIZ_PROJETO,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                ),
+                log,
+            )
+            logger.info("Fragmento %d iniciado.", indice)
+        time.sleep(0.2)
+        for indice, (processo, log) in list(em_execucao.items()):
+            if processo.poll() is None:
+                continue
+            log.close()
+            del em_execucao[indice]
+            if processo.returncode == 0 and concluido(pasta, indice) is not None:
+                logger.info("Fragmento %d concluído.", indice)
+            else:
+                falharam.append(indice)
+                logger.error(
+                    "Fragmento %d falhou (código %d); veja %s.",
+                    indice,
+                    processo.returncode,
+                    os.path.join(pasta_fragmento(pasta, indice), "execucao.log"),
+                )
+    return sorted(falharam)
+
+
+def _juntar_tabela(destino: str, origem: str, tabela: str, coluna_data: str):
+    """Copia as linhas de 'origem' para 'destino', ficando com a mais recente de cada CNPJ."""
+    conexao = sqlite3.connect(destino)
+    try:
+        colunas = [c[1] for c in conexao.execute(f"PRAGMA table_info({tabela})")]
+        atualizar = ", ".join(f"{c} = excluded.{c}" for c in colunas if c != "cnpj")
+        conexao.execute("ATTACH DATABASE ? AS origem", (origem,))
+        with conexao:
+            # O "WHERE true" evita a ambiguidade entre o SELECT e o ON CONFLICT.
+            conexao.execute(
+                f"INSERT INTO {tabela} SELECT * FROM origem.{tabela} WHERE true "
+                f"ON CONFLICT (cnpj) DO UPDATE SET {atualizar} "
+                f"WHERE excluded.{coluna_data} > {tabela}.{coluna_data}"
+            )
+        conexao.execute("DETACH DATABASE origem")
+    finally:
+        conexao.close()
+
+
+def saida_fragmento(pasta: str, indice: int):
+    """
+    O CSV de resultado de um fragmento, ou None se ele não gerou nenhum.
+
+    É SAIDA_FRAGMENTO; nos fragmentos processados sem o --saida fixo (de uma versão
+    anterior) com --coordenar, é o resultado_<id>.csv mais recente da pasta.
+    """
+    p = pasta_fragmento(pasta, indice)
+    caminho = os.path.join(p, SAIDA_FRAGMENTO)
+    if os.path.exists(caminho):
+        return caminho
+    coordenados = glob.glob(os.path.join(glob.escape(p), "resultado_*.csv"))
+    return max(coordenados, key=os.path.getmtime, default=None)
+
+
+def formatos_dos_fragmentos(pasta: str, total: int) -> list:
+    """Os formatos exportados além do CSV (--exportar) por algum dos fragmentos."""
+    bases = []
+    for indice in range(total):
+        caminho = saida_fragmento(pasta, indice)
+        if caminho is not None:
+            bases.append(os.path.splitext(caminho)[0])
+    return [
+        nome
+        for nome, exportador in EXPORTADORES.items()
+        if nome != "csv"
+        and any(os.path.exists(base + exportador.extensao) for base in bases)
+    ]
+
+
+def _chave_da_linha(texto: str) -> str:
+    """O CNPJ como aparece no resultado: normalizado se válido, senão como veio."""
+    cnpj, valido = normalizar_cnpj(texto)
+    return cnpj if valido else texto.strip()
+
+
+def _linhas_em_ordem(pasta: str, total: int):
+    """
+    As linhas dos CSVs de todos os fragmentos, na ordem do arquivo de entrada original.
+
+    As linhas passam por um banco SQLite temporário e são ordenadas pela linha
+    original de cada CNPJ (de LINHAS_ORIGINAIS), então a memória usada não cresce com
+    o tamanho da lista. As de fragmentos sem esse arquivo vêm no fim, na ordem dos
+    fragmentos.
+    """
+    # Sem commits: o banco é temporário e some ao ser fechado.
+    conexao = sqlite3.connect("", isolation_level=None)
+    try:
+        conexao.execute(
+            "CREATE TABLE originais (fragmento INTEGER, chave TEXT, linha INTEGER, "
+            "PRIMARY KEY (fragmento, chave)) WITHOUT ROWID"
+        )
+        conexao.execute(
+            "CREATE TABLE resultado (fragmento INTEGER, sequencia INTEGER, cnpj TEXT, "
+            "nome TEXT, telefone TEXT, email TEXT, status TEXT)"
+        )
+        conexao.execute("BEGIN")
+        for indice in range(total):
+            p = pasta_fragmento(pasta, indice)
+            csv_fragmento = saida_fragmento(pasta, indice)
+            if csv_fragmento is None:
+                continue
+            caminho_originais = os.path.join(p, LINHAS_ORIGINAIS)
+            if os.path.exists(caminho_originais):
+                with open(
+                    os.path.join(p, "entrada.txt"), encoding="utf-8"
+                ) as f_entrada, open(caminho_originais, encoding="utf-8") as f_linhas:
+                    # Só a primeira ocorrência de cada CNPJ gera uma linha.
+                    conexao.executemany(
+                        "INSERT OR IGNORE INTO originais VALUES (?, ?, ?)",
+                        (
+                            (indice, _chave_da_linha(texto), int(numero))
+                            for texto, numero in zip(f_entrada, f_linhas)
+                        ),
+                    )
+            with open(csv_fragmento, newline="", encoding="utf-8-sig") as f:
+                conexao.executemany(
+                    "INSERT INTO resultado VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (indice, sequencia, *(linha[campo] for campo in CAMPOS))
+                        for sequencia, linha in enumerate(csv.DictReader(f))
+                    ),
+                )
+        cursor = conexao.execute(
+            "SELECT r.cnpj, r.nome, r.telefone, r.email, r.status FROM resultado r "
+            "LEFT JOIN originais o ON o.fragmento = r.fragmento AND o.chave = r.cnpj "
+            "ORDER BY o.linha IS NULL, o.linha, r.fragmento, r.sequencia"
+        )
+        for linha in cursor:
+            yield criar_registro(*linha)
+    finally:
+        conexao.close()
+
+
+def juntar(
+    pasta: str, pasta_dados: str = PASTA_DADOS, saida: str = None, formatos=None
+) -> dict:
+    """
+    Junta os resultados de todos os fragmentos na pasta de dados principal.
+
+    O CSV final é o mesmo de um único processar_arquivo com a lista inteira: na
+    ordem dos status e, dentro de cada status, na ordem do arquivo de entrada. Os CNPJs
+    consultados e as respostas em cache de cada fragmento entram na base e no cache
+    principais (com o registro mais recente, se o CNPJ já estiver lá).
+
+    Os formatos exportados pelos fragmentos (NDJSON, Parquet, XLSX) são gerados de
+    novo a partir das linhas juntadas, ao lado do CSV final.
+
+    Args:
+        pasta (str): A pasta de trabalho.
+        pasta_dados (str): A pasta de dados principal.
+        saida (str, optional): O caminho do CSV final. Por padrão,
+                               resultado_final.csv na pasta de dados.
+        formatos (iterable, optional): Os formatos gerados além do CSV, como no
+                                       processar_arquivo. Por padrão, os que os
+                                       fragmentos exportaram.
+
+    Returns:
+        dict: A soma dos contadores dos fragmentos.
+
+    Raises:
+        ErroProcessamento: Se algum fragmento não tiver terminado ou um dos formatos
+                           não estiver disponível.
+    """
+    manifesto = ler_manifesto(pasta)
+    if manifesto is None:
+        raise ErroProcessamento(
+            "Divisão Ausente", f"{pasta} não tem fragmentos. Divida a entrada antes."
+        )
+    total = manifesto["fragmentos"]
+    faltam = [i for i in range(total) if concluido(pasta, i) is None]
+    if faltam:
+        raise ErroProcessamento(
+            "Fragmentos Pendentes",
+            f"Os fragmentos {', '.join(map(str, faltam))} ainda não terminaram.",
+        )
+
+    os.makedirs(pasta_dados, exist_ok=True)
+    base = os.path.join(pasta_dados, "consultados.sqlite3")
+    cache = os.path.join(pasta_dados, "cache_respostas.sqlite3")
+    BaseConsultados(base).fechar()
+    CacheRespostas(cache).fechar()
+
+    if formatos is None:
+        formatos = formatos_dos_fragmentos(pasta, total)
+    try:
+        exportadores = criar_exportadores(formatos)
+    except ValueError as e:
+        raise ErroProcessamento("Formato Indisponível", str(e)) from e
+    escritor = EscritorResultados(
+        saida or os.path.join(pasta_dados, "resultado_final.csv"),
+        os.path.join(pasta, "parciais"),
+        exportadores,
+    )
+    contadores = {}
+    try:
+        for registro in _linhas_em_ordem(pasta, total):
+            escritor.escrever(registro)
+        for indice in range(total):
+            p = pasta_fragmento(pasta, indice)
+            for status, quantidade in concluido(pasta, indice).items():
+                contadores[status] = contadores.get(status, 0) + quantidade
+            if os.path.exists(os.path.join(p, "consultados.sqlite3")):
+                _juntar_tabela(
+                    base,
+                    os.path.join(p, "consultados.sqlite3"),
+                    "consultados",
+                    "consultado_em",
+                )
+            if os.path.exists(os.path.join(p, "cache_respostas.sqlite3")):
+                _juntar_tabela(
+                    cache,
+                    os.path.join(p, "cache_respostas.sqlite3"),
+                    "respostas",
+                    "gravado_em",
+                )
+        if escritor.linhas:
+            escritor.finalizar()
+        else:
+            escritor.descartar()
+    except Exception as e:
+        escritor.descartar()
+        raise ErroProcessamento(
+            "Erro ao Juntar",
+            f"Não foi possível juntar os resultados dos fragmentos.\n\nErro: {e}",
+        ) from e
+    return contadores
@@ -0,0 +1,141 @@
+# src/limitador.py
+"""
+Módulo com o limitador de taxa (token bucket) usado entre o processamento e a API.
+"""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+# A API pública da CNPJá permite 5 consultas por minuto.
+TAXA_PADRAO = 5 / 60
+RAJADA_PADRAO = 1
+
+
+def interpretar_retry_after(valor):
+    """
+    Converte o cabeçalho HTTP Retry-After em uma quantidade de segundos.
+
+    Args:
+        valor (str or None): O valor do cabeçalho, em segundos ou como data HTTP.
+
+    Returns:
+        float or None: Os segundos de espera, ou None se o valor for ausente ou inválido.
+    """
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, data.timestamp() - time.time())
+
+
+class LimitadorTaxa:
+    """
+    Token bucket adaptativo e seguro para uso entre threads.
+
+    Cada chamada à API consome um token. Os tokens são repostos continuamente na
+    taxa atual, até o limite da rajada. Ao receber um HTTP 429 a taxa é reduzida e
+    as consultas ficam suspensas pelo tempo indicado no Retry-After; a cada resposta
+    saudável a taxa volta a subir gradualmente até a taxa configurada.
+    """
+
+    def __init__(
+        self,
+        taxa: float = TAXA_PADRAO,
+        rajada: int = RAJADA_PADRAO,
+        taxa_minima: float = None,
+        fator_recuo: float = 0.5,
+        fator_recuperacao: float = 1.1,
+        espera_padrao_429: float = 60.0,
+        relogio=time.monotonic,
+    ):
+        """
+        Args:
+            taxa (float): Consultas por segundo permitidas em regime normal.
+            rajada (int): Quantidade máxima de consultas liberadas de uma só vez.
+            taxa_minima (float, optional): Piso da taxa após sucessivos 429.
+                                           Por padrão, um décimo da taxa configurada.
+            fator_recuo (float): Multiplicador aplicado à taxa a cada 429.
+            fator_recuperacao (float): Multiplicador aplicado à taxa a cada sucesso.
+            espera_padrao_429 (float): Segundos de espera quando o 429 não traz Retry-After.
+            relogio (function): Devolve o tempo atual em segundos, usado na reposição
+                                dos tokens e nas suspensões. Por padrão,
+                                time.monotonic.
+        """
+        if taxa <= 0:
+            raise ValueError("A taxa deve ser maior que zero.")
+        if rajada < 1:
+            raise ValueError("A rajada deve ser de pelo menos 1 consulta.")
+
+        self.taxa_maxima = float(taxa)
+        self.taxa_minima = float(taxa_minima or taxa / 10)
+        self.rajada = rajada
+        self.fator_recuo = fator_recuo
+        self.fator_recuperacao = fator_recuperacao
+        self.espera_padrao_429 = espera_padrao_429
+        self._relogio = relogio
+
+        self.taxa_atual = self.taxa_maxima
+        self._tokens = float(rajada)
+        self._ultima_reposicao = relogio()
+        self._suspenso_ate = 0.0
+        self._lock = threading.Lock()
+
+    def _repor(self, agora):
+        """Repõe os tokens acumulados desde a última reposição (chamar com o lock)."""
+        decorrido = agora - self._ultima_reposicao
+        if decorrido > 0:
+            self._tokens = min(self.rajada, self._tokens + decorrido * self.taxa_atual)
+            self._ultima_reposicao = agora
+
+    def tentar_adquirir(self) -> float:
+        """
+        Consome um token se houver um disponível, sem bloquear.
+
+        Returns:
+            float: 0 se o token foi consumido; senão, os segundos até haver um.
+        """
+        with self._lock:
+            agora = self._relogio()
+            if agora < self._suspenso_ate:
+                return self._suspenso_ate - agora
+            self._repor(agora)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.taxa_atual
+
+    def adquirir(self):
+        """Bloqueia até que um token esteja disponível e o consome."""
+        while espera := self.tentar_adquirir():
+            time.sleep(espera)
+
+    def registrar_sucesso(self):
+        """Informa uma resposta saudável da API, recuperando a taxa aos poucos."""
+        with self._lock:
+            if self.taxa_atual < self.taxa_maxima:
+                self._repor(self._relogio())
+                self.taxa_atual = min(
+                    self.taxa_maxima, self.taxa_atual * self.fator_recuperacao
+                )
+
+    def registrar_limite(self, retry_after: float = None):
+        """
+        Informa um HTTP 429: reduz a taxa e suspende as consultas.
+
+        Args:
+            retry_after (float, optional): Segundos indicados pela API no Retry-After.
+        """
+        espera = self.espera_padrao_429 if retry_after is None else retry_after
+        with self._lock:
+            agora = self._relogio()
+            self._repor(agora)
+            self.taxa_atual = max(self.taxa_minima, self.taxa_atual * self.fator_recuo)
+            self._tokens = 0.0
+            self._suspenso_ate = max(self._suspenso_ate, agora + espera)
+            self._ultima_reposicao = self._suspenso_ate
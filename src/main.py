@@ -2,151 +2,733 @@
 """
 Módulo principal da lógica de negócio. Orquestra o processamento do arquivo de CNPJs.
 """
+import logging
 import os
+import tempfile
 import time
-import csv
-from tkinter import messagebox
-from .api import consulta_cnpj
-from .parser import classificar_empresa
+from collections import Counter
+from contextlib import closing
+from itertools import islice
+from .api import AcessoNegado, ClienteCNPJa, FalhaTransitoria
+from .armazenamento import BaseConsultados
+from .atualizacao import (
+    PRIORIDADE_PADRAO,
+    RegistroMudancas,
+    desatualizado,
+    selecionar_para_atualizar,
+)
+from .cache import CacheRespostas
+from .coordenacao import (
+    CONSULTADO,
+    OCUPADO,
+    RESERVADO,
+    Coordenador,
+    arquivos_execucao,
+    arquivos_padrao,
+    id_execucao_padrao,
+)
+from .concorrencia import mapear_em_ordem
+from .diario import Diario
+from .exportadores import criar_exportadores
+from .limitador import LimitadorTaxa
+from .metricas import DESATIVADAS, Metricas
+from .parser import RegrasClassificacao, classificar_empresa
+from .registro import RegistroVazio, criar_registro, registro_de_dict
+from .saida import EscritorResultados
+from .validacao import FiltroDuplicados, normalizar_cnpj
 
+# Quantas vezes os CNPJs com falha transitória são repetidos ao final do arquivo.
+RODADAS_DE_REPETICAO = 2
 
-def processar_arquivo(path: str, progress_callback=None):
+PASTA_DADOS = "data"
+
+# Arquivo de regras de classificação carregado da pasta de dados, se existir.
+ARQUIVO_REGRAS = "regras_classificacao.json"
+
+# Status que não vêm de uma consulta e, por isso, não são gravados na base.
+STATUS_SEM_CONSULTA = ("JaConsultado", "Invalido")
+
+# Status prévios dos CNPJs que passam pelo pool de consultas: os nunca consultados, os
+# a atualizar e, com coordenação, os que outra instância está consultando.
+STATUS_A_CONSULTAR = (None, "Atualizar", "Aguardar")
+
+# Resultado da consulta de um CNPJ que outra instância consultou enquanto esta esperava.
+_CONSULTADO_POR_OUTRA = object()
+
+# Status prévio provisório dos CNPJs válidos e inéditos no arquivo, até a busca na base.
+_BUSCAR_NA_BASE = object()
+
+# Linhas lidas, validadas e procuradas na base e no filtro de duplicados de uma vez.
+TAMANHO_LOTE_LEITURA = 500
+
+logger = logging.getLogger(__name__)
+
+
+class ErroProcessamento(Exception):
+    """
+    Erro que impede o processamento do arquivo (entrada ilegível ou vazia, falha ao
+    gravar o resultado, diário inválido). O atributo 'titulo' resume o problema.
+    """
+
+    def __init__(self, titulo: str, mensagem: str):
+        super().__init__(mensagem)
+        self.titulo = titulo
+
+
+def contar_linhas(path: str) -> int:
+    """
+    Conta as linhas de um arquivo lendo blocos binários, sem decodificar o texto.
+
+    É barato o bastante para ser feito antes do processamento e dar o total da
+    barra de progresso, mesmo em arquivos com milhões de linhas.
+    """
+    linhas = 0
+    ultimo = b"\n"
+    with open(path, "rb") as f:
+        while bloco := f.read(1024 * 1024):
+            linhas += bloco.count(b"\n")
+            ultimo = bloco[-1:]
+    # A última linha pode não terminar com quebra de linha.
+    return linhas + (ultimo != b"\n")
+
+
+def registro_vazio(cnpj: str, status: str) -> RegistroVazio:
+    """Linha de resultado sem dados de contato, para CNPJs sem consulta válida."""
+    return RegistroVazio(cnpj, status)
+
+
+def montar_registro(cnpj: str, data, regras: RegrasClassificacao = None):
+    """
+    Classifica a resposta da API de um CNPJ e monta a sua linha de resultado.
+
+    Args:
+        cnpj (str): O CNPJ consultado, apenas dígitos.
+        data (dict or None): O JSON retornado pela API, ou None se não encontrado.
+        regras (RegrasClassificacao, optional): As regras de classificação.
+
+    Returns:
+        Registro or RegistroVazio: A linha com 'cnpj', 'nome', 'telefone', 'email' e
+                                   'status'. Empresas sem CNPJ ou sem nenhum contato
+                                   saem como NaoEncontrado.
+    """
+    _, registro = classificar_empresa(data, regras)
+    # Valida se os dados essenciais (CNPJ e um contato) foram encontrados.
+    if registro is not None and registro.cnpj and (registro.telefone or registro.email):
+        return registro
+    return registro_vazio(cnpj, "NaoEncontrado")
+
+
+def carregar_regras(pasta_dados: str, arquivo_regras: str = None):
+    """
+    Carrega as regras de classificação informadas ou, se houver, as da pasta de dados.
+
+    Returns:
+        RegrasClassificacao or None: As regras carregadas, ou None para as padrão.
+
+    Raises:
+        ErroProcessamento: Se o arquivo de regras não puder ser carregado.
+    """
+    if arquivo_regras is None and os.path.exists(
+        os.path.join(pasta_dados, ARQUIVO_REGRAS)
+    ):
+        arquivo_regras = os.path.join(pasta_dados, ARQUIVO_REGRAS)
+    if not arquivo_regras:
+        return None
+    try:
+        return RegrasClassificacao.de_arquivo(arquivo_regras)
+    except Exception as e:
+        raise ErroProcessamento(
+            "Erro nas Regras",
+            f"Não foi possível carregar as regras de classificação.\n\nErro: {e}",
+        ) from e
+
+
+def processar_arquivo(
+    path: str,
+    progress_callback=None,
+    limitador=None,
+    max_simultaneas: int = 1,
+    cliente=None,
+    usar_cache: bool = True,
+    contar_total: bool = True,
+    retomar: bool = False,
+    pasta_dados: str = PASTA_DADOS,
+    saida: str = None,
+    arquivo_regras: str = None,
+    metricas=None,
+    arquivo_metricas: str = None,
+    intervalo_metricas: float = 10.0,
+    resumo_metricas: bool = False,
+    idade_maxima: float = None,
+    orcamento_atualizacao: int = None,
+    prioridade_atualizacao=PRIORIDADE_PADRAO,
+    arquivo_mudancas: str = None,
+    coordenar: bool = False,
+    id_execucao: str = None,
+    formatos=(),
+):
     """
     Lê um arquivo de CNPJs, processa cada um, e salva os resultados em um CSV.
 
+    O arquivo é processado em fluxo (ler, normalizar, consultar, classificar e gravar),
+    com filas limitadas em cada etapa, então a memória usada não cresce com o tamanho
+    da entrada.
+
+    Antes de qualquer consulta, cada CNPJ é normalizado (zeros à esquerda perdidos são
+    recolocados) e tem os dígitos verificadores conferidos: os inválidos saem com o
+    status Invalido, e as repetições dentro do arquivo são descartadas e contadas em
+    'Duplicado', sem gerar linhas no CSV.
+
     Args:
         path (str): O caminho para o arquivo de texto contendo os CNPJs.
         progress_callback (function, optional): Uma função para reportar o progresso para a UI.
+        limitador (LimitadorTaxa, optional): Limitador de taxa das consultas à API.
+                                             Por padrão, 5 consultas por minuto.
+        max_simultaneas (int): Número máximo de consultas à API em andamento ao mesmo
+                               tempo. Útil para chaves com cota maior.
+        cliente (ClienteCNPJa, optional): Cliente da API. Por padrão, um ClienteCNPJa
+                                          com o limitador informado. Também aceita
+                                          uma BaseReceita, para consultar os dados
+                                          abertos da Receita sem usar a API.
+        usar_cache (bool): Se o cliente padrão deve guardar e reaproveitar as respostas
+                           da API em cache_respostas.sqlite3, na pasta de dados.
+        contar_total (bool): Se deve contar as linhas do arquivo antes de começar, para
+                             informar o total ao progress_callback. Se False, o total
+                             é informado como None (desconhecido).
+        retomar (bool): Se deve retomar uma execução interrompida do mesmo arquivo,
+                        reaproveitando o diário diario_execucao.ndjson e continuando
+                        da primeira linha ainda não processada.
+        pasta_dados (str): A pasta da base de já consultados, do cache, do diário e
+                           dos resultados. Por padrão, 'data'.
+        saida (str, optional): O caminho do CSV final. Por padrão,
+                               resultado_final.csv na pasta de dados.
+        arquivo_regras (str, optional): Um JSON com as regras de classificação por
+                                        CNAE. Por padrão, regras_classificacao.json
+                                        na pasta de dados, se existir, ou as regras
+                                        padrão (Desenvolvedor/NaoDesenvolvedor).
+        metricas (Metricas, optional): Coletor da duração de cada etapa (leitura e
+                                       validação, espera pela consulta,
+                                       classificação, gravações) e, no cliente
+                                       padrão, das requisições HTTP. Por padrão, só
+                                       é criado se 'arquivo_metricas' ou
+                                       'resumo_metricas' forem informados.
+        arquivo_metricas (str, optional): Onde gravar as métricas a cada
+                                          'intervalo_metricas' segundos e ao final:
+                                          formato Prometheus se terminar em .prom,
+                                          JSON nos demais casos.
+        intervalo_metricas (float): Segundos entre duas gravações das métricas.
+        resumo_metricas (bool): Se deve registrar no log um resumo das métricas ao
+                                final da execução.
+        idade_maxima (float, optional): Ativa o modo de atualização: os CNPJs já
+                                        consultados há mais de 'idade_maxima'
+                                        segundos são consultados de novo, sem passar
+                                        pelo cache, em vez de sair como JaConsultado.
+        orcamento_atualizacao (int, optional): Máximo de CNPJs atualizados nesta
+                                               execução. Os demais desatualizados
+                                               saem como JaConsultado. Por padrão,
+                                               todos são atualizados.
+        prioridade_atualizacao (tuple): Categorias atualizadas primeiro quando o
+                                        orçamento não dá para todos; dentro de cada
+                                        uma, vêm os consultados há mais tempo.
+        arquivo_mudancas (str, optional): Onde gravar, em NDJSON, os CNPJs atualizados
+                                          cujo nome, telefone, e-mail ou categoria
+                                          mudaram. Por padrão, mudancas.ndjson na
+                                          pasta de dados.
+        coordenar (bool): Se deve se coordenar com outras instâncias que usam a mesma
+                          pasta de dados: cada CNPJ é reservado antes da consulta, e
+                          os reservados por outra instância são esperados em vez de
+                          consultados de novo. O CSV, os parciais, o diário e o
+                          arquivo de mudanças ganham nomes próprios da execução
+                          (ver coordenacao.arquivos_execucao).
+        id_execucao (str, optional): O identificador da execução coordenada, usado
+                                     nos nomes dos arquivos e para retomá-la. Por
+                                     padrão, um por usuário, máquina e arquivo de
+                                     entrada.
+        formatos (iterable): Formatos gerados além do CSV, com o mesmo nome e a
+                             extensão de cada um: "ndjson", "parquet" (precisa do
+                             pyarrow) e "xlsx". Ver src/exportadores.py.
 
     Returns:
-        dict or None: Um dicionário com os contadores finais do processo,
-                      ou None se ocorrer um erro que impeça o processamento.
-    """
-    os.makedirs("data", exist_ok=True)
-    JA_CONSULTADOS_FILE = "data/ja_consultados.txt"
+        dict: Um dicionário com os contadores finais do processo.
 
+    Raises:
+        ErroProcessamento: Se um erro impedir o processamento do arquivo.
+    """
+    os.makedirs(pasta_dados, exist_ok=True)
+    regras = carregar_regras(pasta_dados, arquivo_regras)
     try:
-        with open(JA_CONSULTADOS_FILE, "r", encoding="utf-8") as f:
-            ja_consultados = {line.strip() for line in f}
-    except FileNotFoundError:
-        ja_consultados = set()
+        exportadores = criar_exportadores(formatos)
+    except ValueError as e:
+        raise ErroProcessamento("Formato Indisponível", str(e)) from e
 
     try:
-        with open(path, "r", encoding="utf-8") as f_in:
-            cnpjs_a_processar = [line.strip() for line in f_in if line.strip()]
+        total_linhas = contar_linhas(path) if contar_total else None
+        f_in = open(path, "r", encoding="utf-8", errors="replace")
     except Exception as e:
-        messagebox.showerror(
+        raise ErroProcessamento(
             "Erro de Leitura", f"Não foi possível ler o arquivo.\n\nErro: {e}"
+        ) from e
+
+    if metricas is None:
+        metricas = Metricas() if arquivo_metricas or resumo_metricas else DESATIVADAS
+
+    cliente_proprio = cliente is None
+    if getattr(cliente, "consulta_local", False):
+        # Bases locais respondem mais rápido do que a troca entre threads.
+        max_simultaneas = 0
+    if cliente_proprio:
+        cache = None
+        if usar_cache:
+            cache = CacheRespostas(os.path.join(pasta_dados, "cache_respostas.sqlite3"))
+        cliente = ClienteCNPJa(
+            limitador=limitador or LimitadorTaxa(),
+            tamanho_pool=max_simultaneas,
+            cache=cache,
+            metricas=metricas,
         )
-        return None
+    base = BaseConsultados(os.path.join(pasta_dados, "consultados.sqlite3"))
+    # Migra, uma única vez, o histórico do formato antigo em texto.
+    ja_consultados_antigo = os.path.join(pasta_dados, "ja_consultados.txt")
+    if os.path.exists(ja_consultados_antigo):
+        base.importar_ja_consultados(ja_consultados_antigo)
 
-    if not cnpjs_a_processar:
-        messagebox.showerror(
-            "Erro", "O arquivo selecionado está vazio ou não contém CNPJs válidos."
+    if coordenar:
+        id_execucao = id_execucao or id_execucao_padrao(path)
+        arquivos = arquivos_execucao(pasta_dados, id_execucao)
+        coordenador = Coordenador(base.caminho, id_execucao)
+    else:
+        arquivos = arquivos_padrao(pasta_dados)
+        coordenador = None
+
+    escritor = EscritorResultados(
+        saida or arquivos["saida"], arquivos["parciais"], exportadores
+    )
+    diario = Diario(arquivos["diario"])
+    linhas_lidas = 0
+
+    # No modo de atualização, com orçamento, os CNPJs a atualizar são escolhidos antes
+    # de começar; sem orçamento, todos os desatualizados são atualizados.
+    mudancas = selecionados = None
+    if idade_maxima is not None:
+        if orcamento_atualizacao is not None:
+            selecionados = selecionar_para_atualizar(
+                path,
+                base,
+                idade_maxima,
+                orcamento_atualizacao,
+                prioridade_atualizacao,
+            )
+        mudancas = RegistroMudancas(
+            arquivo_mudancas or arquivos["mudancas"],
+            continuar=retomar,
         )
-        return None
 
-    todos_os_resultados = []
-    total_cnpjs = len(cnpjs_a_processar)
+    # CNPJs cuja consulta falhou por motivo passageiro; são repetidos no final.
+    # Ficam num arquivo temporário para não crescer na memória se a API cair.
+    pendentes = tempfile.TemporaryFile("w+", encoding="utf-8")
+    # Com coordenação, os CNPJs que outra instância está consultando ficam para depois
+    # da primeira passada, para esta instância seguir com os que ninguém reservou.
+    adiados = tempfile.TemporaryFile("w+", encoding="utf-8")
+    vistos = FiltroDuplicados()
+
+    def encerrar():
+        """Fecha a entrada, a base e o cliente próprio."""
+        f_in.close()
+        pendentes.close()
+        adiados.close()
+        vistos.fechar()
+        if coordenador is not None:
+            coordenador.fechar()
+        base.fechar()
+        if mudancas is not None:
+            mudancas.fechar()
+        if cliente_proprio:
+            cliente.fechar()
+            if cliente.cache is not None:
+                cliente.cache.fechar()
 
-    contadores = {
-        "Desenvolvedor": 0,
-        "NaoDesenvolvedor": 0,
-        "JaConsultado": 0,
-        "NaoEncontrado": 0,
-    }
+    # As categorias das regras de classificação entram nos contadores ao aparecer.
+    contadores = Counter(
+        {
+            "Desenvolvedor": 0,
+            "NaoDesenvolvedor": 0,
+            "JaConsultado": 0,
+            "NaoEncontrado": 0,
+            "Invalido": 0,
+            "Duplicado": 0,
+        }
+    )
 
-    for i, cnpj_original in enumerate(cnpjs_a_processar):
-        # Envolve a lógica de cada CNPJ em um try/except para garantir que,
-        # se um der erro, o processo continue com os próximos.
+    # Ao retomar, refaz o resultado a partir do diário e continua da linha seguinte
+    # à última concluída, sem repetir nenhuma consulta.
+    ultima_linha = -1
+    if retomar:
         try:
-            cnpj = "".join(filter(str.isdigit, cnpj_original))
-            if not cnpj:
-                continue
+            pendentes_retomados = {}
+            for entrada in diario.ler(path):
+                linha = entrada["linha"]
+                ultima_linha = max(ultima_linha, linha)
+                linhas_lidas += 1
+                pendentes_retomados.pop(linha, None)
+                if "pendente" in entrada:
+                    pendentes_retomados[linha] = entrada["pendente"]
+                    vistos.marcar(entrada["pendente"])
+                elif "registro" in entrada:
+                    registro = registro_de_dict(entrada["registro"])
+                    if registro.status not in STATUS_SEM_CONSULTA:
+                        # A base grava em lote; o diário pode estar à frente dela.
+                        base.registrar(dict(registro, cnpj=entrada["cnpj"]))
+                    vistos.marcar(entrada["cnpj"])
+                    escritor.escrever(registro)
+                    contadores[registro.status] += 1
+                elif "duplicado" in entrada:
+                    contadores["Duplicado"] += 1
+                elif "falha" in entrada:
+                    vistos.marcar(entrada["falha"])
+                    escritor.escrever(registro_vazio(entrada["falha"], "NaoEncontrado"))
+                    contadores["NaoEncontrado"] += 1
+                else:
+                    vistos.marcar(entrada["erro"])
+                    contadores["NaoEncontrado"] += 1
+            for linha, cnpj in pendentes_retomados.items():
+                pendentes.write(f"{linha}\t{cnpj}\n")
+        except Exception as e:
+            escritor.descartar()
+            encerrar()
+            raise ErroProcessamento(
+                "Erro ao Retomar",
+                f"Não foi possível retomar a execução anterior.\n\nErro: {e}",
+            ) from e
+        diario.continuar()
+    else:
+        diario.iniciar(path)
 
-            # Reporta o progresso para a interface antes de iniciar o trabalho.
-            if progress_callback:
-                progress_callback(
-                    i + 1, total_cnpjs, f"Consultando {cnpj}...", contadores
-                )
+    # Os registros da base dos CNPJs que vão sair como JaConsultado, buscados junto com
+    # os do seu lote, para que registro_da_base não precise buscá-los de novo.
+    anteriores = {}
 
-            status_atual = ""
-            if cnpj in ja_consultados:
-                status_atual = "JaConsultado"
-                todos_os_resultados.append(
-                    {
-                        "cnpj": cnpj,
-                        "nome": "",
-                        "telefone": "",
-                        "email": "",
-                        "status": status_atual,
-                    }
+    def status_na_base(cnpj, registro):
+        """
+        Status prévio de um CNPJ válido e ainda não visto, a partir do seu registro na
+        base (None se nunca foi consultado): JaConsultado, Atualizar (no modo de
+        atualização, se estiver desatualizado) ou None, se nunca foi consultado.
+        """
+        if registro is None:
+            return None
+        if mudancas is not None and (
+            cnpj in selecionados
+            if selecionados is not None
+            else desatualizado(registro, idade_maxima)
+        ):
+            return "Atualizar"
+        return "JaConsultado"
+
+    def status_previo_consulta(cnpj, registro):
+        """
+        O status_na_base de um CNPJ e, com coordenação, a sua reserva: Aguardar se
+        outra instância o está consultando, JaConsultado se ela acabou de consultá-lo.
+        """
+        status = status_na_base(cnpj, registro)
+        if coordenador is None or status == "JaConsultado":
+            return status
+        reserva = coordenador.reservar(cnpj, ignorar_base=status == "Atualizar")
+        if reserva == RESERVADO:
+            return status
+        return "Aguardar" if reserva == OCUPADO else "JaConsultado"
+
+    def registro_da_base(cnpj):
+        """A linha de um CNPJ já consultado, com os dados da consulta anterior."""
+        anterior = anteriores.pop(cnpj, None) or base.obter(cnpj) or {}
+        return criar_registro(
+            cnpj,
+            anterior.get("nome", ""),
+            anterior.get("telefone", ""),
+            anterior.get("email", ""),
+            "JaConsultado",
+        )
+
+    def com_status(itens, status=status_previo_consulta):
+        """
+        Completa o status prévio dos itens que dependem da base (os que chegam com
+        _BUSCAR_NA_BASE), com uma única busca na base a cada TAMANHO_LOTE_LEITURA
+        CNPJs. O status de cada item (e, com coordenação, a sua reserva) só é definido
+        quando o item é pedido, para não reservar CNPJs muito antes de consultá-los.
+        """
+        itens = iter(itens)
+        while lote := list(islice(itens, TAMANHO_LOTE_LEITURA)):
+            # Medida à parte da validação: depende da base (e, com coordenação, das
+            # reservas), não da leitura do arquivo.
+            with metricas.medir("consulta_base"):
+                registros = base.obter_varios(
+                    [item[2] for item in lote if item[3] is _BUSCAR_NA_BASE]
                 )
-            else:
-                data = consulta_cnpj(cnpj)
-                categoria, registro_raw = classificar_empresa(data)
-
-                # Valida se os dados essenciais (CNPJ e um contato) foram encontrados.
-                if (
-                    registro_raw
-                    and registro_raw.get("cnpj")
-                    and (registro_raw.get("telefone") or registro_raw.get("email"))
-                ):
-                    status_atual = categoria
-                    registro_raw["status"] = status_atual
-                    todos_os_resultados.append(registro_raw)
+            for i, cnpj_original, cnpj, status_previo in lote:
+                if status_previo is _BUSCAR_NA_BASE:
+                    registro = registros.get(cnpj)
+                    with metricas.medir("consulta_base"):
+                        status_previo = status(cnpj, registro)
+                    if status_previo == "JaConsultado" and registro is not None:
+                        anteriores[cnpj] = registro
+                yield i, cnpj_original, cnpj, status_previo
+
+    def ler_itens():
+        """
+        Lê e normaliza os CNPJs sob demanda, em lotes de TAMANHO_LOTE_LEITURA linhas,
+        marcando os inválidos e os repetidos no arquivo. Os demais dependem da base.
+        """
+        nonlocal linhas_lidas
+        linhas = (
+            (i, linha.strip()) for i, linha in enumerate(f_in) if i > ultima_linha
+        )
+        while lote := list(islice(linhas, TAMANHO_LOTE_LEITURA)):
+            with metricas.medir("validacao"):
+                normalizados = []
+                for i, cnpj_original in lote:
+                    if not cnpj_original:
+                        continue
+                    linhas_lidas += 1
+                    cnpj, valido = normalizar_cnpj(cnpj_original)
+                    if cnpj:
+                        normalizados.append((i, cnpj_original, cnpj, valido))
+                novos = vistos.marcar_varios([item[2] for item in normalizados])
+            for (i, cnpj_original, cnpj, valido), novo in zip(normalizados, novos):
+                if not novo:
+                    status_previo = "Duplicado"
+                elif not valido:
+                    status_previo = "Invalido"
                 else:
-                    status_atual = "NaoEncontrado"
-                    todos_os_resultados.append(
-                        {
-                            "cnpj": cnpj,
-                            "nome": "",
-                            "telefone": "",
-                            "email": "",
-                            "status": status_atual,
-                        }
+                    status_previo = _BUSCAR_NA_BASE
+                yield i, cnpj_original, cnpj, status_previo
+
+    def preparar_itens():
+        """
+        Os itens do arquivo, com o status prévio dos que não precisam de consulta
+        (inválidos, repetidos no arquivo ou já consultados antes e em dia).
+
+        Os reservados por outra instância ficam para o fim (Adiar), sem passar pelo
+        pool. Eles só vão para o diário quando processar_lote chega à sua linha: se
+        fossem gravados ao entrar na janela de consultas, uma queda deixaria no
+        diário uma linha à frente das anteriores ainda em consulta, e a retomada, que
+        continua da maior linha do diário, as pularia.
+        """
+        for i, cnpj_original, cnpj, status_previo in com_status(ler_itens()):
+            if status_previo == "Aguardar":
+                status_previo = "Adiar"
+            yield i, cnpj_original, cnpj, status_previo
+
+    def precisa_consultar(item):
+        """Só os CNPJs de STATUS_A_CONSULTAR passam pelo pool e consomem o limitador."""
+        return item[3] in STATUS_A_CONSULTAR
+
+    def consultar(item):
+        """Executada nas threads de trabalho: só a consulta à API, sem estado compartilhado."""
+        if item[3] == "Aguardar":
+            # Outra instância está consultando este CNPJ: espera por ela em vez de
+            # gastar a cota. Se ela desistir, a reserva passa a esta.
+            if coordenador.aguardar(item[2]) == CONSULTADO:
+                return _CONSULTADO_POR_OUTRA
+        if item[3] == "Atualizar":
+            # O cache guarda justamente a resposta desatualizada.
+            return cliente.consultar(item[2], ignorar_cache=True)
+        return cliente.consultar(item[2])
+
+    def ler_pendentes(status=status_previo_consulta, arquivo=pendentes):
+        """Esvazia o arquivo de pendentes, devolvendo os itens para uma nova rodada."""
+        arquivo.seek(0)
+        itens = arquivo.read().splitlines()
+        arquivo.seek(0)
+        arquivo.truncate()
+        yield from com_status(
+            (
+                (int(i), cnpj, cnpj, _BUSCAR_NA_BASE)
+                for i, cnpj in (linha.split("\t") for linha in itens)
+            ),
+            status,
+        )
+
+    proxima_publicacao = time.monotonic() + intervalo_metricas
+
+    def publicar_metricas():
+        """Grava as métricas, com os contadores atuais, no arquivo_metricas."""
+        metricas.definir("linhas_lidas", linhas_lidas)
+        for status, quantidade in contadores.items():
+            metricas.definir("cnpjs", quantidade, status=status)
+        try:
+            metricas.gravar(arquivo_metricas)
+        except OSError as e:
+            logger.warning("Não foi possível gravar as métricas: %s", e)
+
+    def processar_lote(itens, mensagem):
+        """
+        Consome os resultados na ordem do arquivo. As consultas rodam em paralelo,
+        mas só esta thread mexe nos resultados e contadores.
+        """
+        nonlocal proxima_publicacao
+        # Fechado explicitamente para que, se o lote for interrompido por um erro, as
+        # consultas agendadas sejam canceladas antes de o cliente ser fechado.
+        with closing(
+            mapear_em_ordem(consultar, itens, max_simultaneas, filtro=precisa_consultar)
+        ) as resultados:
+            for item, futuro in resultados:
+                i, cnpj_original, cnpj, _ = item
+                # Envolve a lógica de cada CNPJ em um try/except para garantir que,
+                # se um der erro, o processo continue com os próximos.
+                try:
+                    # Reporta o progresso para a interface.
+                    if progress_callback:
+                        with metricas.medir("progresso"):
+                            progress_callback(
+                                i + 1, total_linhas, f"{mensagem} {cnpj}...", contadores
+                            )
+                    registrar_resultado(item, futuro)
+                except FalhaTransitoria as e:
+                    logger.warning("%s. O CNPJ será consultado novamente.", e)
+                    pendentes.write(f"{i}\t{cnpj}\n")
+                    diario.registrar_pendente(i, cnpj)
+                except AcessoNegado as e:
+                    # Todos os CNPJs seguintes teriam a mesma resposta: para, sem
+                    # marcar nenhum como não encontrado. O diário permite retomar.
+                    escritor.descartar()
+                    raise ErroProcessamento(
+                        "Acesso Negado pela API",
+                        f"{e}\n\nVerifique a chave de acesso ou a cota contratada e "
+                        "retome o processamento.",
+                    ) from e
+                except Exception as e:
+                    logger.exception(
+                        "Erro inesperado no CNPJ %s. Pulando para o próximo.",
+                        cnpj_original,
                     )
+                    contadores["NaoEncontrado"] += 1
+                    diario.registrar_erro(i, cnpj)
+
+                if coordenador is not None and item[3] in STATUS_A_CONSULTAR:
+                    # A base é confirmada antes de liberar a reserva, para que quem
+                    # espera por este CNPJ o encontre nela.
+                    base.confirmar()
+                    coordenador.liberar(cnpj)
 
-                # Salva o CNPJ na lista de já consultados e aguarda para não sobrecarregar a API.
-                ja_consultados.add(cnpj)
-                with open(JA_CONSULTADOS_FILE, "a", encoding="utf-8") as f_out:
-                    f_out.write(cnpj + "\n")
+                if arquivo_metricas and time.monotonic() >= proxima_publicacao:
+                    publicar_metricas()
+                    proxima_publicacao = time.monotonic() + intervalo_metricas
 
-                time.sleep(12)
+    def registrar_resultado(item, futuro):
+        """Classifica o resultado de um CNPJ e o grava no CSV."""
+        i, cnpj_original, cnpj, status_previo = item
+        if status_previo == "Adiar":
+            # Fica como pendente no diário, para não se perder ao retomar.
+            adiados.write(f"{i}\t{cnpj}\n")
+            diario.registrar_pendente(i, cnpj)
+            return
+        if status_previo == "Duplicado":
+            # A primeira ocorrência já gerou a linha do CNPJ.
+            diario.registrar_duplicado(i, cnpj)
+            contadores["Duplicado"] += 1
+            return
+        if status_previo == "Invalido":
+            # Mantém a linha como veio, para facilitar encontrá-la na entrada.
+            registro = registro_vazio(cnpj_original, "Invalido")
+        elif status_previo == "JaConsultado":
+            # Preenche a linha com os dados guardados da consulta anterior.
+            registro = registro_da_base(cnpj)
+        else:
+            with metricas.medir("aguardando_consulta"):
+                data = futuro.result()
+            if data is _CONSULTADO_POR_OUTRA:
+                registro = registro_da_base(cnpj)
+            else:
+                with metricas.medir("classificacao"):
+                    registro = montar_registro(cnpj, data, regras)
+                if status_previo == "Atualizar":
+                    mudancas.registrar(base.obter(cnpj), registro)
 
-            if status_atual:
-                contadores[status_atual] += 1
+                # Salva o CNPJ, com os dados extraídos, na base de já consultados.
+                with metricas.medir("gravacao_base"):
+                    base.registrar(dict(registro, cnpj=cnpj))
 
-        except Exception as e:
-            print(
-                f"ERRO INESPERADO no CNPJ {cnpj_original}. Pulando para o próximo. Erro: {e}"
-            )
+        with metricas.medir("gravacao_csv"):
+            escritor.escrever(registro)
+        with metricas.medir("diario"):
+            diario.registrar(i, cnpj, registro)
+        contadores[registro.status] += 1
+
+    try:
+        processar_lote(preparar_itens(), "Consultando")
+        if adiados.tell():
+            # A esta altura, a outra instância provavelmente já gravou estes CNPJs na
+            # base; os que ela ainda estiver consultando são esperados.
+            processar_lote(ler_pendentes(arquivo=adiados), "Aguardando")
+
+        # Repete as consultas que falharam por motivos passageiros (rede, 5xx, 429).
+        for _ in range(RODADAS_DE_REPETICAO):
+            if pendentes.tell() == 0:
+                break
+            processar_lote(ler_pendentes(), "Repetindo")
+
+        # Os que continuarem falhando saem como NaoEncontrado, mas não são marcados
+        # como consultados, para serem tentados de novo na próxima execução. Os que
+        # estavam sendo atualizados mantêm os dados da consulta anterior.
+        for i, _, cnpj, status_previo in ler_pendentes(status_na_base):
+            if status_previo == "Atualizar":
+                registro = registro_da_base(cnpj)
+                escritor.escrever(registro)
+                diario.registrar(i, cnpj, registro)
+                contadores["JaConsultado"] += 1
+                continue
+            escritor.escrever(registro_vazio(cnpj, "NaoEncontrado"))
+            diario.registrar_falha(i, cnpj)
             contadores["NaoEncontrado"] += 1
-            continue
-
-    # Ordena os resultados para o CSV final de acordo com a prioridade definida.
-    ordem_status = {
-        "NaoDesenvolvedor": 1,
-        "JaConsultado": 2,
-        "Desenvolvedor": 3,
-        "NaoEncontrado": 4,
-    }
-    todos_os_resultados.sort(key=lambda item: ordem_status.get(item["status"], 99))
-
-    if todos_os_resultados:
-        header = ["cnpj", "nome", "telefone", "email", "status"]
-        try:
-            with open(
-                "data/resultado_final.csv", "w", newline="", encoding="utf-8-sig"
-            ) as f:
-                writer = csv.DictWriter(f, fieldnames=header)
-                writer.writeheader()
-                writer.writerows(todos_os_resultados)
-        except Exception as e:
-            messagebox.showerror(
-                "Erro ao Salvar",
-                f"Não foi possível salvar o arquivo de resultados.\n\nErro: {e}",
-            )
-            return None
+    finally:
+        diario.fechar()
+        encerrar()
+        if arquivo_metricas:
+            publicar_metricas()
+        if resumo_metricas:
+            logger.info(metricas.resumo())
+
+    if coordenador is not None and coordenador.aguardados:
+        logger.info(
+            "%d CNPJs estavam sendo consultados por outra instância e foram esperados.",
+            coordenador.aguardados,
+        )
+
+    if mudancas is not None:
+        logger.info(
+            "Modo de atualização: %d CNPJs consultados de novo, %d com mudanças (%s).",
+            mudancas.atualizados,
+            mudancas.alterados,
+            mudancas.caminho,
+        )
+
+    evitadas = contadores["Invalido"] + contadores["Duplicado"]
+    if evitadas:
+        logger.info(
+            "A validação local evitou %d consultas à API (%d inválidos, %d duplicados).",
+            evitadas,
+            contadores["Invalido"],
+            contadores["Duplicado"],
+        )
+
+    if not linhas_lidas:
+        escritor.descartar()
+        diario.remover()
+        raise ErroProcessamento(
+            "Erro", "O arquivo selecionado está vazio ou não contém CNPJs válidos."
+        )
+
+    if not escritor.linhas:
+        escritor.descartar()
+        diario.remover()
+        return dict(contadores)
+
+    try:
+        escritor.finalizar()
+    except Exception as e:
+        raise ErroProcessamento(
+            "Erro ao Salvar",
+            f"Não foi possível salvar o arquivo de resultados.\n\nErro: {e}",
+        ) from e
+    # Só com o CSV final gravado o diário deixa de ser necessário.
+    diario.remover()
 
-    return contadores
+    return dict(contadores)
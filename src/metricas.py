@@ -0,0 +1,212 @@
+# src/metricas.py
+"""
+Módulo com a coleta de métricas do processamento: duração de cada etapa, respostas
+HTTP, novas tentativas e bytes recebidos, exportadas em JSON ou no formato texto do
+Prometheus.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+PREFIXO_PROMETHEUS = "consultor_cnpj"
+
+
+def _chave(nome: str, rotulos: dict):
+    return nome, tuple(sorted(rotulos.items()))
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos_prometheus(rotulos) -> str:
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos) + "}"
+
+
+class Metricas:
+    """
+    Coletor de métricas seguro para uso entre threads.
+
+    - medir(etapa): mede a duração de um trecho (contagem, total e máximo por etapa);
+    - incrementar(nome, valor, **rotulos): contadores, como respostas por status HTTP;
+    - definir(nome, valor, **rotulos): valores instantâneos, como CNPJs por status.
+
+    Quando a coleta não é desejada, use DESATIVADAS, que tem a mesma interface e não
+    faz nada.
+    """
+
+    ativas = True
+
+    def __init__(self):
+        self.inicio = time.time()
+        self._lock = threading.Lock()
+        self._etapas = {}
+        self._contadores = {}
+        self._valores = {}
+
+    @contextmanager
+    def medir(self, etapa: str):
+        """Mede a duração do bloco 'with' e a soma à etapa informada."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_duracao(etapa, time.perf_counter() - inicio)
+
+    def registrar_duracao(self, etapa: str, segundos: float):
+        """Soma uma duração, medida por fora, à etapa informada."""
+        with self._lock:
+            dados = self._etapas.get(etapa)
+            if dados is None:
+                self._etapas[etapa] = [1, segundos, segundos]
+            else:
+                dados[0] += 1
+                dados[1] += segundos
+                if segundos > dados[2]:
+                    dados[2] = segundos
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos):
+        """Soma 'valor' ao contador 'nome' com os rótulos informados."""
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def definir(self, nome: str, valor: float, **rotulos):
+        """Guarda o valor atual de 'nome' com os rótulos informados."""
+        with self._lock:
+            self._valores[_chave(nome, rotulos)] = valor
+
+    def instantaneo(self) -> dict:
+        """
+        Uma cópia das métricas coletadas até agora.
+
+        Returns:
+            dict: 'etapas' (contagem, total, média e máximo por etapa), 'contadores'
+                  e 'valores'. Métricas com rótulos viram dicionários indexados
+                  por "rotulo=valor".
+        """
+        with self._lock:
+            etapas = {nome: list(dados) for nome, dados in self._etapas.items()}
+            contadores = dict(self._contadores)
+            valores = dict(self._valores)
+
+        def agrupar(itens):
+            grupos = {}
+            for (nome, rotulos), valor in sorted(itens.items()):
+                if rotulos:
+                    rotulo = ",".join(f"{k}={v}" for k, v in rotulos)
+                    grupos.setdefault(nome, {})[rotulo] = valor
+                else:
+                    grupos[nome] = valor
+            return grupos
+
+        return {
+            "gerado_em": time.time(),
+            "segundos_decorridos": round(time.time() - self.inicio, 3),
+            "etapas": {
+                nome: {
+                    "contagem": contagem,
+                    "total_s": round(total, 6),
+                    "media_ms": round(total / contagem * 1000, 3),
+                    "max_ms": round(maximo * 1000, 3),
+                }
+                for nome, (contagem, total, maximo) in sorted(etapas.items())
+            },
+            "contadores": agrupar(contadores),
+            "valores": agrupar(valores),
+        }
+
+    def para_prometheus(self) -> str:
+        """As métricas no formato texto de exposição do Prometheus."""
+        with self._lock:
+            etapas = sorted(self._etapas.items())
+            contadores = sorted(self._contadores.items())
+            valores = sorted(self._valores.items())
+
+        p = PREFIXO_PROMETHEUS
+        linhas = []
+        if etapas:
+            linhas.append(f"# TYPE {p}_etapa_segundos summary")
+            for etapa, (contagem, total, _) in etapas:
+                rotulo = _rotulos_prometheus([("etapa", etapa)])
+                linhas.append(f"{p}_etapa_segundos_sum{rotulo} {total}")
+                linhas.append(f"{p}_etapa_segundos_count{rotulo} {contagem}")
+            linhas.append(f"# TYPE {p}_etapa_segundos_max gauge")
+            for etapa, (_, _, maximo) in etapas:
+                rotulo = _rotulos_prometheus([("etapa", etapa)])
+                linhas.append(f"{p}_etapa_segundos_max{rotulo} {maximo}")
+
+        for itens, tipo, sufixo in (
+            (contadores, "counter", "_total"),
+            (valores, "gauge", ""),
+        ):
+            declarados = set()
+            for (nome, rotulos), valor in itens:
+                metrica = f"{p}_{nome}{sufixo}"
+                if metrica not in declarados:
+                    linhas.append(f"# TYPE {metrica} {tipo}")
+                    declarados.add(metrica)
+                linhas.append(f"{metrica}{_rotulos_prometheus(rotulos)} {valor}")
+        return "\n".join(linhas) + "\n"
+
+    def gravar(self, caminho: str):
+        """
+        Grava um instantâneo das métricas, substituindo o arquivo de forma atômica.
+
+        Args:
+            caminho (str): O arquivo de destino. Com extensão .prom, usa o formato
+                           texto do Prometheus (para o textfile collector do
+                           node_exporter); com qualquer outra, JSON.
+        """
+        if caminho.endswith(".prom"):
+            conteudo = self.para_prometheus()
+        else:
+            conteudo = json.dumps(self.instantaneo(), ensure_ascii=False, indent=2)
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+
+    def resumo(self) -> str:
+        """Um resumo legível das etapas e contadores, para o fim da execução."""
+        dados = self.instantaneo()
+        linhas = [f"Métricas da execução ({dados['segundos_decorridos']:.1f} s):"]
+        for nome, etapa in sorted(
+            dados["etapas"].items(), key=lambda item: -item[1]["total_s"]
+        ):
+            linhas.append(
+                f"  {nome}: {etapa['total_s']:.2f} s em {etapa['contagem']} vezes "
+                f"(média {etapa['media_ms']:.2f} ms, máximo {etapa['max_ms']:.2f} ms)"
+            )
+        for nome, valor in dados["contadores"].items():
+            linhas.append(f"  {nome}: {valor}")
+        return "\n".join(linhas)
+
+
+class _MetricasDesativadas:
+    """Mesma interface de Metricas, sem coletar nada e com custo mínimo."""
+
+    ativas = False
+    _bloco_vazio = nullcontext()
+
+    def medir(self, etapa: str):
+        return self._bloco_vazio
+
+    def registrar_duracao(self, etapa: str, segundos: float):
+        pass
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos):
+        pass
+
+    def definir(self, nome: str, valor: float, **rotulos):
+        pass
+
+
+DESATIVADAS = _MetricasDesativadas()
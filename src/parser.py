@@ -2,18 +2,171 @@
 """
 Módulo para analisar e formatar os dados brutos retornados pela API.
 """
+import json
+import re
 
+from .registro import Registro
+from .validacao import somente_digitos
 
-def classificar_empresa(data: dict):
+# Regras usadas quando nenhum arquivo de regras é informado: a mesma classificação de
+# sempre, pela palavra "desenvolvimento", mais os CNAEs de desenvolvimento de software.
+REGRAS_PADRAO = {
+    "padrao": "NaoDesenvolvedor",
+    "categorias": [
+        {
+            "nome": "Desenvolvedor",
+            "cnaes": ["6201-5/01", "6202-3/00", "6203-1/00"],
+            "palavras": ["desenvolvimento"],
+        }
+    ],
+}
+
+
+# Dígitos de um código CNAE completo (subclasse): "6201-5/01".
+DIGITOS_CNAE = 7
+
+
+def _codigo_cnae(valor):
+    """Converte um código CNAE (número ou texto com pontuação) para inteiro."""
+    if type(valor) is int:
+        # O caso comum: a API já devolve o código como número.
+        return valor
+    digitos = somente_digitos(str(valor))
+    return int(digitos) if digitos else None
+
+
+class RegrasClassificacao:
+    """
+    Regras de classificação das empresas por CNAE, compiladas uma única vez.
+
+    Cada categoria tem um conjunto de códigos CNAE e uma lista de palavras-chave
+    procuradas no texto das atividades (sem diferenciar maiúsculas). Um código em
+    texto com menos de 7 dígitos (a divisão "62", o grupo "63.1", a classe "6311-9")
+    vale para todas as subclasses dentro dele. A ordem das categorias é a
+    prioridade: vence a primeira que casar com qualquer atividade, principal ou
+    secundária. Empresas sem nenhuma categoria ficam com a 'padrao'.
+
+    Os códigos viram um único dicionário (código -> prioridade), os prefixos, um
+    dicionário por tamanho, e as palavras de todas as categorias, uma única expressão
+    regular; o custo de classificar uma empresa não cresce com o número de regras.
+    """
+
+    def __init__(self, categorias: list, padrao: str = "NaoDesenvolvedor"):
+        """
+        Args:
+            categorias (list): Dicionários com 'nome' e, opcionalmente, 'cnaes' e
+                               'palavras', em ordem de prioridade.
+            padrao (str): A categoria das empresas que não casam com nenhuma regra.
+
+        Raises:
+            ValueError: Se uma categoria não tiver nome ou um CNAE for inválido.
+        """
+        self.padrao = padrao
+        self.categorias = []
+        self._por_cnae = {}
+        # Tamanho do prefixo -> {prefixo: prioridade}.
+        self._por_prefixo = {}
+        alternativas = []
+        for prioridade, categoria in enumerate(categorias):
+            nome = categoria.get("nome")
+            if not nome:
+                raise ValueError(f"A categoria {prioridade + 1} não tem 'nome'.")
+            self.categorias.append(nome)
+            for valor in categoria.get("cnaes", []):
+                codigo = _codigo_cnae(valor)
+                digitos = None if type(valor) is int else somente_digitos(str(valor))
+                if codigo is None or (digitos and len(digitos) > DIGITOS_CNAE):
+                    raise ValueError(f"CNAE inválido na categoria {nome}: {valor!r}")
+                # Um código em mais de uma categoria fica com a de maior prioridade.
+                if digitos is not None and len(digitos) < DIGITOS_CNAE:
+                    prefixos = self._por_prefixo.setdefault(len(digitos), {})
+                    prefixos.setdefault(digitos, prioridade)
+                else:
+                    self._por_cnae.setdefault(codigo, prioridade)
+            palavras = [re.escape(p) for p in categoria.get("palavras", []) if p]
+            if palavras:
+                alternativas.append(f"(?P<c{prioridade}>{'|'.join(palavras)})")
+        # O lookahead testa todas as posições do texto, então uma palavra de menor
+        # prioridade não "esconde" outra que comece dentro dela.
+        self._palavras = (
+            re.compile(f"(?=(?:{'|'.join(alternativas)}))", re.IGNORECASE)
+            if alternativas
+            else None
+        )
+
+    @classmethod
+    def de_dicionario(cls, regras: dict):
+        """Cria as regras a partir de um dicionário no formato de REGRAS_PADRAO."""
+        return cls(
+            regras.get("categorias", []), regras.get("padrao", "NaoDesenvolvedor")
+        )
+
+    @classmethod
+    def de_arquivo(cls, caminho: str):
+        """
+        Carrega as regras de um arquivo JSON no formato de REGRAS_PADRAO.
+
+        Raises:
+            OSError: Se o arquivo não puder ser lido.
+            ValueError: Se o arquivo não for um JSON de regras válido.
+        """
+        with open(caminho, "r", encoding="utf-8") as f:
+            return cls.de_dicionario(json.load(f))
+
+    def categoria(self, data: dict) -> str:
+        """
+        Escolhe a categoria de uma empresa pelas suas atividades.
+
+        Args:
+            data (dict): O dicionário JSON retornado pela API.
+
+        Returns:
+            str: O nome da categoria de maior prioridade que casou, ou a 'padrao'.
+        """
+        atividades = [data.get("mainActivity") or {}]
+        atividades += data.get("sideActivities") or []
+
+        melhor = len(self.categorias)
+        for atividade in atividades:
+            codigo = _codigo_cnae(atividade.get("id", ""))
+            prioridade = self._por_cnae.get(codigo)
+            if prioridade is not None and prioridade < melhor:
+                melhor = prioridade
+            if self._por_prefixo and codigo is not None:
+                texto = f"{codigo:0{DIGITOS_CNAE}d}"
+                for tamanho, prefixos in self._por_prefixo.items():
+                    prioridade = prefixos.get(texto[:tamanho])
+                    if prioridade is not None and prioridade < melhor:
+                        melhor = prioridade
+
+        if melhor and self._palavras is not None:
+            texto = "\n".join(str(a.get("text", "")) for a in atividades)
+            for encontrado in self._palavras.finditer(texto):
+                prioridade = int(encontrado.lastgroup[1:])
+                if prioridade < melhor:
+                    melhor = prioridade
+                    if not melhor:
+                        break
+
+        return self.categorias[melhor] if melhor < len(self.categorias) else self.padrao
+
+
+REGRAS = RegrasClassificacao.de_dicionario(REGRAS_PADRAO)
+
+
+def classificar_empresa(data: dict, regras: RegrasClassificacao = None):
     """
     Extrai informações relevantes do dicionário da API e classifica a empresa.
 
     Args:
         data (dict): O dicionário JSON retornado pela API.
+        regras (RegrasClassificacao, optional): As regras de classificação. Por
+                                                padrão, as de REGRAS_PADRAO.
 
     Returns:
-        tuple: Uma tupla contendo a categoria (str) e um dicionário com os dados formatados.
-               Retorna ("NaoEncontrado", None) se os dados de entrada forem inválidos.
+        tuple: Uma tupla contendo a categoria (str) e um Registro com os dados
+               formatados e o status da categoria. Retorna ("NaoEncontrado", None) se
+               os dados de entrada forem inválidos.
     """
     if not data:
         return "NaoEncontrado", None
@@ -22,35 +175,46 @@ def classificar_empresa(data: dict):
     cnpj = data.get("taxId", "")
     nome = data.get("alias") or data.get("company", {}).get("name", "")
 
-    # Concatena todos os telefones encontrados em uma única string.
-    telefones_encontrados = []
-    for tel in data.get("phones", []):
-        area, numero = tel.get("area", ""), tel.get("number", "")
-        if area and numero:
-            telefones_encontrados.append(f"({area}) {numero}")
-    telefone_final = " / ".join(telefones_encontrados)
+    # Concatena todos os telefones encontrados em uma única string. Com um só
+    # telefone ou e-mail (o caso comum), o join devolve a própria string.
+    telefones = data.get("phones")
+    telefone_final = (
+        " / ".join(
+            [
+                f"({tel['area']}) {tel['number']}"
+                for tel in telefones
+                if tel.get("area") and tel.get("number")
+            ]
+        )
+        if telefones
+        else ""
+    )
 
     # Concatena todos os e-mails encontrados em uma única string.
-    emails_encontrados = []
-    for email in data.get("emails", []):
-        endereco = email.get("address", "")
-        if endereco:
-            emails_encontrados.append(endereco)
-    email_final = " / ".join(emails_encontrados)
-
-    # Classifica como "Desenvolvedor" se a palavra "desenvolvimento" aparecer em qualquer atividade (CNAE).
-    cnae_principal = data.get("mainActivity", {}).get("text", "")
-    todas_atividades = [cnae_principal] + [
-        act.get("text", "") for act in data.get("sideActivities", [])
-    ]
-    is_dev = any("desenvolvimento" in str(c).lower() for c in todas_atividades)
-
-    registro = {
-        "cnpj": cnpj,
-        "nome": nome,
-        "telefone": telefone_final,
-        "email": email_final,
-    }
-
-    categoria = "Desenvolvedor" if is_dev else "NaoDesenvolvedor"
-    return categoria, registro
+    emails = data.get("emails")
+    email_final = (
+        " / ".join([email["address"] for email in emails if email.get("address")])
+        if emails
+        else ""
+    )
+
+    # Classifica pelas atividades (CNAE principal e secundários) da empresa.
+    categoria = (regras or REGRAS).categoria(data)
+    return categoria, Registro(cnpj, nome, telefone_final, email_final, categoria)
+
+
+def classificar_lote(dados, regras: RegrasClassificacao = None):
+    """
+    Classifica uma sequência de respostas da API, sob demanda.
+
+    Args:
+        dados (iterable): Os dicionários JSON retornados pela API.
+        regras (RegrasClassificacao, optional): As regras de classificação. Por
+                                                padrão, as de REGRAS_PADRAO.
+
+    Yields:
+        tuple: O mesmo retorno de classificar_empresa, na ordem da entrada.
+    """
+    regras = regras or REGRAS
+    for data in dados:
+        yield classificar_empresa(data, regras)
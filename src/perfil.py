@@ -0,0 +1,194 @@
+# src/perfil.py
+"""
+Módulo do perfil de inicialização: quanto tempo cada módulo leva para ser importado e
+quanto tempo a janela leva para aparecer, gravados num JSON para acompanhar a abertura
+do programa (inclusive do executável do PyInstaller, onde não há 'python -X importtime').
+"""
+import json
+import platform
+import sys
+import threading
+import time
+
+# Quantos módulos, dos mais lentos, são listados no JSON.
+LIMITE_MODULOS = 50
+
+
+class _CarregadorMedido:
+    """Repassa tudo ao carregador original, medindo a criação e a execução do módulo."""
+
+    def __init__(self, carregador, perfil: "PerfilInicializacao"):
+        self._carregador = carregador
+        self._perfil = perfil
+
+    def __getattr__(self, nome):
+        # get_code, get_source, is_package, get_resource_reader...
+        return getattr(self._carregador, nome)
+
+    def create_module(self, spec):
+        return self._perfil._medir(spec.name, self._carregador.create_module, spec)
+
+    def exec_module(self, modulo):
+        self._perfil._medir(modulo.__name__, self._carregador.exec_module, modulo)
+
+
+class _LocalizadorMedido:
+    """
+    Localizador colocado no início de sys.meta_path: pede a especificação aos demais
+    (inclusive ao do PyInstaller) e troca o carregador pelo que mede o tempo.
+    """
+
+    def __init__(self, perfil: "PerfilInicializacao"):
+        self._perfil = perfil
+        # As especificações com o carregador trocado, para desfazer a troca em
+        # restaurar().
+        self._trocados = []
+
+    def find_spec(self, nome, caminho, alvo=None):
+        for localizador in sys.meta_path:
+            if localizador is self:
+                continue
+            find_spec = getattr(localizador, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(nome, caminho, alvo)
+            if spec is None:
+                continue
+            # Carregadores antigos, só com load_module, ficam sem medição.
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _CarregadorMedido(spec.loader, self._perfil)
+                self._trocados.append(spec)
+            return spec
+        return None
+
+    def restaurar(self):
+        """Devolve o carregador original às especificações e módulos medidos."""
+        for spec in self._trocados:
+            medido = spec.loader
+            if not isinstance(medido, _CarregadorMedido):
+                continue
+            spec.loader = medido._carregador
+            modulo = sys.modules.get(spec.name)
+            if modulo is not None and getattr(modulo, "__loader__", None) is medido:
+                modulo.__loader__ = medido._carregador
+        self._trocados.clear()
+
+
+class PerfilInicializacao:
+    """
+    Mede a inicialização da interface gráfica.
+
+    Enquanto ativo, cada módulo importado pela primeira vez tem o seu tempo medido:
+    o total (com os módulos que ele importa) e o próprio (sem eles), como no
+    'python -X importtime'. Os marcos (interface importada, janela criada, janela
+    visível) são contados a partir do início do run.py. Quando a janela aparece, a
+    medição termina e tudo é gravado no arquivo.
+    """
+
+    def __init__(self, caminho: str, inicio: float = None, encerrar: bool = False):
+        """
+        Args:
+            caminho (str): O arquivo JSON do perfil.
+            inicio (float, optional): O time.perf_counter() do início do programa. Por
+                                      padrão, o momento da criação do perfil.
+            encerrar (bool): Fecha a janela logo que ela aparece e o perfil é gravado,
+                             para medir a inicialização em scripts.
+        """
+        self.caminho = caminho
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.encerrar = encerrar
+        self.marcos = {}
+        self.modulos = {}
+        # O horário (time.time()) em que a janela apareceu, para comparar com o
+        # horário em que o programa foi aberto por um script.
+        self.visivel_em = None
+        self._localizador = _LocalizadorMedido(self)
+        # Tempo dos módulos importados dentro do que está sendo medido, por nível; uma
+        # pilha por thread.
+        self._local = threading.local()
+
+    def iniciar(self):
+        """Passa a medir as importações."""
+        if self._localizador not in sys.meta_path:
+            sys.meta_path.insert(0, self._localizador)
+
+    def parar(self):
+        """
+        Deixa de medir as importações e devolve aos módulos medidos os carregadores
+        originais, para que nada do perfil continue no caminho depois dele.
+        """
+        if self._localizador in sys.meta_path:
+            sys.meta_path.remove(self._localizador)
+        self._localizador.restaurar()
+
+    def marcar(self, nome: str):
+        """Registra um marco, em segundos desde o início."""
+        self.marcos[nome] = time.perf_counter() - self.inicio
+
+    def _medir(self, nome: str, funcao, *args):
+        pilha = self._local.__dict__.setdefault("pilha", [])
+        pilha.append(0.0)
+        comeco = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            total = time.perf_counter() - comeco
+            internos = pilha.pop()
+            if pilha:
+                pilha[-1] += total
+            medido = self.modulos.setdefault(nome, [0.0, 0.0])
+            medido[0] += total
+            medido[1] += total - internos
+
+    def acompanhar_janela(self, janela):
+        """
+        Grava o perfil quando a janela aparecer na tela.
+
+        Args:
+            janela: A janela principal (Tk), já criada e antes do mainloop().
+        """
+        self.marcar("janela_criada")
+
+        def ao_mapear(evento):
+            # O <Map> da janela principal também chega pelos widgets filhos.
+            if evento.widget is not janela or "janela_visivel" in self.marcos:
+                return
+            self.marcar("janela_visivel")
+            self.visivel_em = time.time()
+            self.gravar()
+            if self.encerrar:
+                janela.after_idle(janela.destroy)
+
+        janela.bind("<Map>", ao_mapear, add="+")
+
+    def como_dict(self) -> dict:
+        """O perfil no formato gravado no JSON, com os tempos em milissegundos."""
+        modulos = sorted(self.modulos.items(), key=lambda item: -item[1][0])
+        return {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "executavel": bool(getattr(sys, "frozen", False)),
+            "janela_visivel_em": self.visivel_em,
+            "marcos_ms": {
+                nome: round(segundos * 1000, 1)
+                for nome, segundos in self.marcos.items()
+            },
+            "modulos_importados": len(self.modulos),
+            "importacoes_ms": round(
+                sum(proprio for _, proprio in self.modulos.values()) * 1000, 1
+            ),
+            "modulos": [
+                {
+                    "modulo": nome,
+                    "total_ms": round(total * 1000, 2),
+                    "proprio_ms": round(proprio * 1000, 2),
+                }
+                for nome, (total, proprio) in modulos[:LIMITE_MODULOS]
+            ],
+        }
+
+    def gravar(self):
+        """Para a medição e grava o perfil no arquivo."""
+        self.parar()
+        with open(self.caminho, "w", encoding="utf-8") as f:
+            json.dump(self.como_dict(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,478 @@
+# src/provedores.py
+"""
+Módulo com os provedores alternativos de dados de CNPJ (BrasilAPI, ReceitaWS) e o
+roteador que distribui as consultas entre vários provedores.
+"""
+import logging
+import math
+import random
+import re
+import threading
+import time
+
+from .api import AcessoNegado, ClienteCNPJa, FalhaTransitoria
+from .cache import AUSENTE
+from .limitador import LimitadorTaxa
+from .metricas import DESATIVADAS
+from .validacao import somente_digitos
+
+# Peso da última latência medida na média móvel exponencial de cada provedor.
+PESO_LATENCIA = 0.2
+
+# Falhas seguidas (rede, HTTP 5xx) que abrem o disjuntor de um provedor, e por
+# quantos segundos ele fica aberto antes de uma consulta de teste.
+LIMITE_FALHAS = 5
+TEMPO_ABERTO = 30.0
+
+# Suspensão de um provedor após um HTTP 429 sem Retry-After.
+ESPERA_PADRAO_429 = 60.0
+
+# Espera máxima do roteador entre duas verificações de provedores disponíveis.
+ESPERA_MAXIMA_ESCOLHA = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def _telefone(texto: str):
+    """Separa um telefone em DDD e número, como nos 'phones' da CNPJá."""
+    digitos = somente_digitos(texto or "")
+    if len(digitos) < 10:
+        return None
+    return {"area": digitos[:2], "number": digitos[2:]}
+
+
+class ClienteBrasilAPI(ClienteCNPJa):
+    """Cliente da BrasilAPI (api/cnpj/v1), com as respostas no formato da CNPJá."""
+
+    nome = "brasilapi"
+    caminho = "/api/cnpj/v1/{cnpj}"
+
+    def __init__(self, *args, url_base: str = "https://brasilapi.com.br", **kwargs):
+        super().__init__(*args, url_base=url_base, **kwargs)
+
+    def converter(self, dados: dict):
+        telefones = [
+            _telefone(dados.get(campo))
+            for campo in ("ddd_telefone_1", "ddd_telefone_2")
+        ]
+        email = dados.get("email")
+        return {
+            "taxId": dados.get("cnpj", ""),
+            "alias": dados.get("nome_fantasia") or None,
+            "company": {
+                "name": dados.get("razao_social", ""),
+                "simples": {"optant": bool(dados.get("opcao_pelo_simples"))},
+                "simei": {"optant": bool(dados.get("opcao_pelo_mei"))},
+            },
+            "status": {"text": dados.get("descricao_situacao_cadastral", "")},
+            "phones": [t for t in telefones if t],
+            "emails": [{"address": email.lower()}] if email else [],
+            "mainActivity": {
+                "id": dados.get("cnae_fiscal"),
+                "text": dados.get("cnae_fiscal_descricao", ""),
+            },
+            "sideActivities": [
+                {"id": a.get("codigo"), "text": a.get("descricao", "")}
+                for a in dados.get("cnaes_secundarios") or []
+                if a.get("codigo")
+            ],
+        }
+
+
+class ClienteReceitaWS(ClienteCNPJa):
+    """Cliente da ReceitaWS (v1/cnpj), com as respostas no formato da CNPJá."""
+
+    nome = "receitaws"
+    caminho = "/v1/cnpj/{cnpj}"
+
+    _telefones = re.compile(r"\(?(\d{2})\)?\s*([\d\s-]{8,})")
+
+    def __init__(self, *args, url_base: str = "https://receitaws.com.br", **kwargs):
+        super().__init__(*args, url_base=url_base, **kwargs)
+
+    def converter(self, dados: dict):
+        # A ReceitaWS responde HTTP 200 com status ERROR para CNPJs inexistentes.
+        if dados.get("status") == "ERROR":
+            return None
+        telefones = [
+            {"area": area, "number": somente_digitos(numero)}
+            for area, numero in self._telefones.findall(dados.get("telefone") or "")
+        ]
+        email = dados.get("email")
+
+        def atividade(a):
+            codigo = somente_digitos(a.get("code") or "")
+            return {"id": int(codigo) if codigo else None, "text": a.get("text", "")}
+
+        principais = dados.get("atividade_principal") or []
+        return {
+            "taxId": somente_digitos(dados.get("cnpj", "")),
+            "alias": dados.get("fantasia") or None,
+            "company": {"name": dados.get("nome", "")},
+            "status": {"text": dados.get("situacao", "")},
+            "phones": telefones,
+            "emails": [{"address": email.lower()}] if email else [],
+            "mainActivity": atividade(principais[0]) if principais else {},
+            "sideActivities": [
+                atividade(a) for a in dados.get("atividades_secundarias") or []
+            ],
+        }
+
+
+# Provedores disponíveis na linha de comando, e a cota padrão (consultas por minuto)
+# das chaves gratuitas de cada um.
+PROVEDORES = {
+    "cnpja": (ClienteCNPJa, 5),
+    "brasilapi": (ClienteBrasilAPI, 60),
+    "receitaws": (ClienteReceitaWS, 3),
+}
+
+
+class DisjuntorCircuito:
+    """
+    Disjuntor de um provedor: depois de 'limite_falhas' falhas seguidas, o provedor
+    fica fora por 'tempo_aberto' segundos. Passado esse tempo, uma única consulta de
+    teste é liberada; se der certo o provedor volta, se falhar fica fora de novo.
+
+    Não é seguro entre threads sozinho: o RoteadorProvedores o usa com o seu lock.
+    """
+
+    def __init__(self, limite_falhas: int = LIMITE_FALHAS, tempo_aberto=TEMPO_ABERTO):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._testando = False
+
+    @property
+    def aberto(self) -> bool:
+        return self.falhas >= self.limite_falhas
+
+    def permite(self, agora: float) -> bool:
+        """Indica se uma consulta pode ser feita agora."""
+        if not self.aberto:
+            return True
+        return agora >= self.aberto_ate and not self._testando
+
+    def iniciar(self):
+        """Registra o início de uma consulta (a de teste, se estiver aberto)."""
+        if self.aberto:
+            self._testando = True
+
+    def registrar_sucesso(self):
+        self.falhas = 0
+        self._testando = False
+
+    def registrar_falha(self, agora: float):
+        self.falhas += 1
+        self._testando = False
+        if self.aberto:
+            self.aberto_ate = agora + self.tempo_aberto
+
+
+class Provedor:
+    """Um cliente de provedor, com a sua cota, o seu disjuntor e a latência observada."""
+
+    def __init__(self, cliente, limitador=None, disjuntor: DisjuntorCircuito = None):
+        self.cliente = cliente
+        self.nome = cliente.nome
+        self.limitador = limitador
+        self.disjuntor = disjuntor or DisjuntorCircuito()
+        # Média móvel exponencial da duração das consultas, em segundos. Começa em
+        # zero, para que todo provedor novo seja experimentado.
+        self.latencia = 0.0
+        self.em_andamento = 0
+        # Até quando o provedor fica sem receber consultas depois de um HTTP 429.
+        self.suspenso_ate = 0.0
+        # Recusou a chave ou esgotou a cota (AcessoNegado): não recebe mais consultas.
+        self.desativado = False
+
+    def custo(self) -> float:
+        """Tempo esperado de uma nova consulta, considerando as que já estão em curso."""
+        return self.latencia * (1 + self.em_andamento)
+
+
+class RoteadorProvedores:
+    """
+    Distribui as consultas entre vários provedores, com a mesma interface do
+    ClienteCNPJa (pode ser passado como 'cliente' ao processar_arquivo).
+
+    A cada consulta, escolhe o provedor de menor custo esperado (latência média
+    vezes as consultas em andamento nele) entre os que têm cota disponível e o
+    disjuntor fechado. Assim, o mais rápido recebe as consultas enquanto tiver cota, e
+    o excedente vai para os demais: cada provedor acrescentado soma a sua cota à
+    vazão total. Uma falha passageira num provedor é tentada de novo em outro; um
+    HTTP 429 suspende só a cota do provedor que o enviou, e um provedor que recusar a
+    chave ou estiver sem cota (AcessoNegado) deixa de ser usado.
+
+    O cache, se houver, é consultado antes de qualquer provedor e guarda as respostas
+    já convertidas, seja qual for o provedor que as trouxe.
+
+    Uma mesma instância pode ser usada por várias threads ao mesmo tempo.
+    """
+
+    def __init__(
+        self,
+        provedores: list,
+        max_tentativas: int = 4,
+        espera_base: float = 1.0,
+        espera_maxima: float = 30.0,
+        cache=None,
+        metricas=None,
+        relogio=time.monotonic,
+    ):
+        """
+        Args:
+            provedores (list): Os Provedor a usar. Os clientes devem ter sido criados
+                               sem limitador, sem cache e com max_tentativas=1: as
+                               cotas, o cache e as novas tentativas ficam a cargo do
+                               roteador.
+            max_tentativas (int): Total de tentativas por CNPJ, somando todos os
+                                  provedores.
+            espera_base (float): Espera antes de repetir um CNPJ em que todos os
+                                 provedores já falharam. Dobra a cada repetição.
+            espera_maxima (float): Teto dessa espera.
+            cache (CacheRespostas, optional): Cache em disco consultado antes dos
+                                              provedores.
+            metricas (Metricas, optional): Recebe as consultas e falhas por provedor,
+                                           as aberturas de disjuntor e os CNPJs
+                                           que falharam em todas as tentativas.
+            relogio (function): Devolve o tempo atual em segundos, usado nas
+                                latências, nas suspensões e nos disjuntores. Por
+                                padrão, time.monotonic; os testes usam um relógio
+                                controlado.
+        """
+        if not provedores:
+            raise ValueError("Informe pelo menos um provedor.")
+        self.provedores = list(provedores)
+        self.max_tentativas = max(1, max_tentativas)
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.cache = cache
+        self.metricas = metricas or DESATIVADAS
+        self._relogio = relogio
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        """Encerra as conexões de todos os provedores."""
+        for provedor in self.provedores:
+            provedor.cliente.fechar()
+
+    def consultar(self, cnpj: str, limitador=None, ignorar_cache: bool = False):
+        """
+        Consulta um CNPJ no cache ou, se não estiver lá, no melhor provedor disponível.
+
+        Args:
+            cnpj (str): O número do CNPJ a ser consultado, apenas dígitos.
+            limitador: Ignorado; cada provedor tem a sua cota.
+            ignorar_cache (bool): Consulta um provedor mesmo com uma resposta válida
+                                  no cache, que é substituída pela nova.
+
+        Returns:
+            dict or None: Os dados da empresa no formato da CNPJá, ou None se o
+                          provedor que respondeu informar que o CNPJ não existe.
+
+        Raises:
+            FalhaTransitoria: Se todas as tentativas falharem por motivos passageiros.
+            AcessoNegado: Se todos os provedores tiverem recusado a chave ou estiverem
+                          sem cota.
+        """
+        if self.cache is not None and not ignorar_cache:
+            with self.metricas.medir("cache_leitura"):
+                dados = self.cache.obter(cnpj)
+            if dados is not AUSENTE:
+                self.metricas.incrementar("cache", resultado="acerto")
+                return dados
+            self.metricas.incrementar("cache", resultado="falta")
+
+        dados = self._consultar_provedores(cnpj)
+        if self.cache is not None:
+            with self.metricas.medir("cache_gravacao"):
+                self.cache.gravar(cnpj, dados)
+        return dados
+
+    def _consultar_provedores(self, cnpj: str):
+        falharam = set()
+        motivo = None
+        for tentativa in range(1, self.max_tentativas + 1):
+            ativos = {p for p in self.provedores if not p.desativado}
+            if ativos and ativos <= falharam:
+                # Todos já falharam neste CNPJ: espera antes de recomeçar a rodada.
+                teto = min(self.espera_maxima, self.espera_base * 2 ** (tentativa - 2))
+                time.sleep(random.uniform(0, teto))
+                falharam.clear()
+
+            with self.metricas.medir("espera_provedor"):
+                provedor = self._escolher(falharam)
+            inicio = self._relogio()
+            try:
+                dados = provedor.cliente.consultar(cnpj)
+            except FalhaTransitoria as e:
+                self._registrar_falha(provedor, e.status, e.retry_after)
+                falharam.add(provedor)
+                motivo = f"{provedor.nome}: {e}"
+                continue
+            except AcessoNegado as e:
+                self._desativar(provedor, e)
+                falharam.add(provedor)
+                motivo = f"{provedor.nome}: {e}"
+                continue
+            except Exception:
+                # Uma resposta que o adaptador não entende conta como falha do
+                # provedor, mas o erro segue para quem chamou.
+                self._registrar_falha(provedor)
+                raise
+            self._registrar_sucesso(provedor, self._relogio() - inicio)
+            return dados
+
+        self.metricas.incrementar("cnpjs_sem_resposta")
+        raise FalhaTransitoria(
+            f"Falha ao consultar o CNPJ {cnpj} em {self.max_tentativas} tentativas "
+            f"({motivo})"
+        )
+
+    def _escolher(self, excluir) -> Provedor:
+        """
+        Espera até um provedor ter cota e o disjuntor fechado, e o reserva.
+
+        Raises:
+            AcessoNegado: Se todos os provedores tiverem sido desativados.
+        """
+        while True:
+            espera = ESPERA_MAXIMA_ESCOLHA
+            with self._lock:
+                if all(p.desativado for p in self.provedores):
+                    raise AcessoNegado(
+                        "Todos os provedores recusaram a chave de acesso ou estão "
+                        "sem cota.",
+                        None,
+                    )
+                agora = self._relogio()
+                for provedor in sorted(self.provedores, key=Provedor.custo):
+                    if provedor in excluir or provedor.desativado:
+                        continue
+                    if provedor.suspenso_ate > agora:
+                        espera = min(espera, provedor.suspenso_ate - agora)
+                        continue
+                    if not provedor.disjuntor.permite(agora):
+                        if provedor.disjuntor.aberto_ate > agora:
+                            espera = min(espera, provedor.disjuntor.aberto_ate - agora)
+                        continue
+                    if provedor.limitador is not None:
+                        falta = provedor.limitador.tentar_adquirir()
+                        if falta:
+                            espera = min(espera, falta)
+                            continue
+                    provedor.disjuntor.iniciar()
+                    provedor.em_andamento += 1
+                    return provedor
+            time.sleep(espera)
+
+    def _registrar_sucesso(self, provedor: Provedor, segundos: float):
+        with self._lock:
+            provedor.em_andamento -= 1
+            provedor.disjuntor.registrar_sucesso()
+            if provedor.latencia:
+                provedor.latencia += PESO_LATENCIA * (segundos - provedor.latencia)
+            else:
+                provedor.latencia = segundos
+        if provedor.limitador is not None:
+            provedor.limitador.registrar_sucesso()
+        self.metricas.incrementar("consultas_provedor", provedor=provedor.nome)
+        self.metricas.registrar_duracao(f"provedor_{provedor.nome}", segundos)
+
+    def _desativar(self, provedor: Provedor, erro: AcessoNegado):
+        with self._lock:
+            provedor.em_andamento -= 1
+            ja_estava = provedor.desativado
+            provedor.desativado = True
+        if not ja_estava:
+            self.metricas.incrementar("provedor_desativado", provedor=provedor.nome)
+            logger.error("%s: %s O provedor deixa de ser usado.", provedor.nome, erro)
+
+    def _registrar_falha(
+        self, provedor: Provedor, status: int = None, retry_after: float = None
+    ):
+        self.metricas.incrementar("falhas_provedor", provedor=provedor.nome)
+        if status == 429:
+            # Limite de taxa não é defeito do provedor: ele só fica suspenso, e a
+            # sua cota é reduzida.
+            espera = ESPERA_PADRAO_429 if retry_after is None else retry_after
+            with self._lock:
+                provedor.em_andamento -= 1
+                provedor.disjuntor.registrar_sucesso()
+                provedor.suspenso_ate = max(
+                    provedor.suspenso_ate, self._relogio() + espera
+                )
+            if provedor.limitador is not None:
+                provedor.limitador.registrar_limite(retry_after)
+            logger.warning("%s: limite de consultas atingido.", provedor.nome)
+            return
+        with self._lock:
+            provedor.em_andamento -= 1
+            estava_aberto = provedor.disjuntor.aberto
+            provedor.disjuntor.registrar_falha(self._relogio())
+            abriu = provedor.disjuntor.aberto and not estava_aberto
+        if abriu:
+            self.metricas.incrementar("disjuntor_aberto", provedor=provedor.nome)
+            logger.warning(
+                "%s: %d falhas seguidas. O provedor fica fora por %.0f s.",
+                provedor.nome,
+                provedor.disjuntor.falhas,
+                provedor.disjuntor.tempo_aberto,
+            )
+
+
+def criar_roteador(
+    especificacoes: list,
+    tamanho_pool: int = 10,
+    cache=None,
+    metricas=None,
+    urls: dict = None,
+) -> RoteadorProvedores:
+    """
+    Monta um RoteadorProvedores a partir de especificações como "brasilapi:60".
+
+    Args:
+        especificacoes (list): Nomes de PROVEDORES, cada um opcionalmente seguido de
+                               ":" e da cota em consultas por minuto (0 para não
+                               limitar). Sem a cota, vale a padrão do provedor.
+        tamanho_pool (int): Conexões abertas com cada provedor.
+        cache (CacheRespostas, optional): Cache consultado antes dos provedores.
+        metricas (Metricas, optional): Coletor de métricas do roteador e dos clientes.
+        urls (dict, optional): Endereços a usar no lugar dos oficiais, por nome de
+                               provedor (por exemplo, servidores locais de teste).
+
+    Raises:
+        ValueError: Se um provedor for desconhecido ou uma cota for inválida.
+    """
+    provedores = []
+    for especificacao in especificacoes:
+        nome, _, cota = especificacao.partition(":")
+        nome = nome.strip().lower()
+        if nome not in PROVEDORES:
+            raise ValueError(
+                f"Provedor desconhecido: {nome!r}. Use {', '.join(PROVEDORES)}."
+            )
+        classe, cota_padrao = PROVEDORES[nome]
+        try:
+            por_minuto = float(cota) if cota else cota_padrao
+        except ValueError:
+            raise ValueError(f"Cota inválida para {nome}: {cota!r}") from None
+        if por_minuto < 0 or not math.isfinite(por_minuto):
+            raise ValueError(f"Cota inválida para {nome}: {cota!r}")
+        opcoes = {}
+        if urls and nome in urls:
+            opcoes["url_base"] = urls[nome]
+        cliente = classe(
+            tamanho_pool=tamanho_pool, max_tentativas=1, metricas=metricas, **opcoes
+        )
+        limitador = LimitadorTaxa(taxa=por_minuto / 60) if por_minuto else None
+        provedores.append(Provedor(cliente, limitador))
+    return RoteadorProvedores(provedores, cache=cache, metricas=metricas)
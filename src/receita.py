@@ -0,0 +1,280 @@
+# src/receita.py
+"""
+Módulo com a base local dos dados abertos do CNPJ (Receita Federal), para consultar e
+classificar CNPJs sem depender da API.
+"""
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import zipfile
+from itertools import islice
+
+CAMINHO_PADRAO = "data/receita.sqlite3"
+
+# Quantas linhas do arquivo da Receita gravar por transação na importação.
+TAMANHO_LOTE_IMPORTACAO = 50_000
+
+# Situação cadastral dos estabelecimentos, como no layout dos dados abertos.
+SITUACOES = {1: "Nula", 2: "Ativa", 3: "Suspensa", 4: "Inapta", 8: "Baixada"}
+
+logger = logging.getLogger(__name__)
+
+
+def _tipo_do_arquivo(nome: str):
+    """Identifica o conteúdo de um arquivo dos dados abertos pelo nome."""
+    nome = nome.upper()
+    for trecho, tipo in (
+        ("ESTABELE", "estabelecimentos"),
+        ("EMPRECSV", "empresas"),
+        ("SIMPLES", "simples"),
+        ("CNAECSV", "cnaes"),
+    ):
+        if trecho in nome:
+            return tipo
+    return None
+
+
+def _linhas_estabelecimentos(leitor):
+    for c in leitor:
+        yield (
+            c[0] + c[1] + c[2],  # cnpj_basico + ordem + dígitos verificadores
+            c[4],  # nome_fantasia
+            int(c[5] or 0),  # situacao_cadastral
+            int(c[11]) if c[11] else None,  # cnae_fiscal_principal
+            c[12],  # cnae_fiscal_secundaria, separados por vírgula
+            c[21],  # ddd_1
+            c[22],  # telefone_1
+            c[23],  # ddd_2
+            c[24],  # telefone_2
+            c[27],  # correio_eletronico
+        )
+
+
+def _linhas_empresas(leitor):
+    for c in leitor:
+        yield c[0], c[1]  # cnpj_basico, razao_social
+
+
+def _linhas_simples(leitor):
+    for c in leitor:
+        yield c[0], c[1] == "S", c[4] == "S"  # cnpj_basico, opcao_simples, opcao_mei
+
+
+def _linhas_cnaes(leitor):
+    for c in leitor:
+        yield int(c[0]), c[1]
+
+
+_IMPORTACOES = {
+    "estabelecimentos": (
+        _linhas_estabelecimentos,
+        "INSERT OR REPLACE INTO estabelecimentos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    ),
+    "empresas": (_linhas_empresas, "INSERT OR REPLACE INTO empresas VALUES (?, ?)"),
+    "simples": (_linhas_simples, "INSERT OR REPLACE INTO simples VALUES (?, ?, ?)"),
+    "cnaes": (_linhas_cnaes, "INSERT OR REPLACE INTO cnaes VALUES (?, ?)"),
+}
+
+
+class BaseReceita:
+    """
+    Base SQLite com os dados abertos do CNPJ, importados dos arquivos .zip publicados
+    pela Receita Federal (Empresas, Estabelecimentos, Simples e Cnaes).
+
+    Guarda só o necessário para a classificação: nome fantasia, razão social,
+    situação, telefones, e-mail e CNAEs. Pode substituir o ClienteCNPJa no
+    processar_arquivo: consultar() devolve um dicionário no mesmo formato do JSON da
+    CNPJá, sem limite de taxa.
+
+    Uma mesma instância pode ser usada por várias threads ao mesmo tempo.
+    """
+
+    # As consultas são locais e rápidas: o processar_arquivo as faz na própria
+    # thread, sem o pool de consultas simultâneas.
+    consulta_local = True
+
+    def __init__(self, caminho: str = CAMINHO_PADRAO):
+        """
+        Args:
+            caminho (str): O arquivo SQLite da base.
+        """
+        self.caminho = caminho
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._descricoes = None
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        with self._conexao:
+            self._conexao.execute(
+                """
+                CREATE TABLE IF NOT EXISTS estabelecimentos (
+                    cnpj TEXT PRIMARY KEY,
+                    nome_fantasia TEXT,
+                    situacao INTEGER,
+                    cnae_principal INTEGER,
+                    cnaes_secundarios TEXT,
+                    ddd_1 TEXT,
+                    telefone_1 TEXT,
+                    ddd_2 TEXT,
+                    telefone_2 TEXT,
+                    email TEXT
+                ) WITHOUT ROWID
+                """
+            )
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS empresas "
+                "(cnpj_basico TEXT PRIMARY KEY, razao_social TEXT) WITHOUT ROWID"
+            )
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS simples "
+                "(cnpj_basico TEXT PRIMARY KEY, simples INTEGER, mei INTEGER) "
+                "WITHOUT ROWID"
+            )
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS cnaes "
+                "(codigo INTEGER PRIMARY KEY, descricao TEXT)"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        """Fecha a conexão com a base."""
+        with self._lock:
+            self._conexao.close()
+
+    def importar(self, caminho_zip: str) -> dict:
+        """
+        Importa um arquivo .zip dos dados abertos, lendo-o em fluxo, sem extraí-lo.
+
+        O tipo de cada arquivo dentro do .zip é reconhecido pelo nome (ESTABELE,
+        EMPRECSV, SIMPLES, CNAECSV); os demais são ignorados. Os arquivos podem ser
+        importados em qualquer ordem, e reimportar atualiza os registros existentes.
+
+        Args:
+            caminho_zip (str): O caminho do .zip, por exemplo Estabelecimentos0.zip.
+
+        Returns:
+            dict: Quantas linhas foram importadas, por tipo de arquivo.
+
+        Raises:
+            ValueError: Se o .zip não tiver nenhum arquivo reconhecido.
+        """
+        importadas = {}
+        with zipfile.ZipFile(caminho_zip) as arquivo_zip:
+            for membro in arquivo_zip.infolist():
+                tipo = _tipo_do_arquivo(membro.filename)
+                if tipo is None:
+                    continue
+                with arquivo_zip.open(membro) as bruto:
+                    texto = io.TextIOWrapper(bruto, encoding="latin-1", newline="")
+                    leitor = csv.reader(texto, delimiter=";", quotechar='"')
+                    total = self._importar_linhas(tipo, leitor)
+                importadas[tipo] = importadas.get(tipo, 0) + total
+                logger.info("%s: %d linhas de %s importadas.", caminho_zip, total, tipo)
+        if not importadas:
+            raise ValueError(
+                f"{caminho_zip} não contém arquivos reconhecidos dos dados abertos."
+            )
+        if "cnaes" in importadas:
+            self._descricoes = None
+        return importadas
+
+    def _importar_linhas(self, tipo: str, leitor) -> int:
+        converter, sql = _IMPORTACOES[tipo]
+        linhas = converter(leitor)
+        total = 0
+        while lote := list(islice(linhas, TAMANHO_LOTE_IMPORTACAO)):
+            with self._lock, self._conexao:
+                self._conexao.executemany(sql, lote)
+            total += len(lote)
+        return total
+
+    def _descricao(self, codigo: int) -> str:
+        """A descrição de um CNAE. A tabela é pequena e fica toda na memória."""
+        if self._descricoes is None:
+            with self._lock:
+                self._descricoes = dict(
+                    self._conexao.execute("SELECT codigo, descricao FROM cnaes")
+                )
+        return self._descricoes.get(codigo, "")
+
+    def consultar(self, cnpj: str, limitador=None, ignorar_cache: bool = False):
+        """
+        Busca um CNPJ na base local.
+
+        Args:
+            cnpj (str): O CNPJ, apenas dígitos.
+            limitador, ignorar_cache: Ignorados; existem para manter a assinatura do
+                                      ClienteCNPJa.
+
+        Returns:
+            dict or None: Os dados da empresa no formato do JSON da CNPJá, ou None se
+                          o CNPJ não estiver na base.
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT e.nome_fantasia, e.situacao, e.cnae_principal,"
+                " e.cnaes_secundarios, e.ddd_1, e.telefone_1, e.ddd_2, e.telefone_2,"
+                " e.email, m.razao_social, s.simples, s.mei "
+                "FROM estabelecimentos e "
+                "LEFT JOIN empresas m ON m.cnpj_basico = substr(e.cnpj, 1, 8) "
+                "LEFT JOIN simples s ON s.cnpj_basico = substr(e.cnpj, 1, 8) "
+                "WHERE e.cnpj = ?",
+                (cnpj,),
+            ).fetchone()
+        if linha is None:
+            return None
+        (
+            nome_fantasia,
+            situacao,
+            cnae_principal,
+            cnaes_secundarios,
+            ddd_1,
+            telefone_1,
+            ddd_2,
+            telefone_2,
+            email,
+            razao_social,
+            simples,
+            mei,
+        ) = linha
+
+        telefones = [
+            {"area": ddd, "number": numero}
+            for ddd, numero in ((ddd_1, telefone_1), (ddd_2, telefone_2))
+            if ddd and numero
+        ]
+        secundarios = [
+            int(codigo) for codigo in (cnaes_secundarios or "").split(",") if codigo
+        ]
+        return {
+            "taxId": cnpj,
+            "alias": nome_fantasia or None,
+            "company": {
+                "name": razao_social or "",
+                "simples": {"optant": bool(simples)},
+                "simei": {"optant": bool(mei)},
+            },
+            "status": {"id": situacao, "text": SITUACOES.get(situacao, "")},
+            "phones": telefones,
+            "emails": [{"address": email.lower()}] if email else [],
+            "mainActivity": (
+                {"id": cnae_principal, "text": self._descricao(cnae_principal)}
+                if cnae_principal
+                else {}
+            ),
+            "sideActivities": [
+                {"id": codigo, "text": self._descricao(codigo)}
+                for codigo in secundarios
+            ],
+        }
@@ -0,0 +1,328 @@
+# src/reclassificacao.py
+"""
+Módulo que reclassifica as respostas guardadas no cache dos CNPJs de uma lista (ou da
+última execução), sem consultar a API, usando vários processos para aproveitar todos
+os núcleos da máquina.
+"""
+import csv
+import logging
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .armazenamento import BaseConsultados
+from .cache import CacheRespostas, decodificar_corpo
+from .main import (
+    PASTA_DADOS,
+    ErroProcessamento,
+    carregar_regras,
+    montar_registro,
+    registro_vazio,
+)
+from .registro import registro_de_dict
+from .saida import EscritorResultados
+from .validacao import FiltroDuplicados, normalizar_cnpj
+
+# Quantas respostas cada processo recebe de uma vez. Blocos grandes diluem o custo de
+# enviar os dados entre processos; pequenos demais, e esse custo domina.
+TAMANHO_BLOCO = 500
+
+# Registros acumulados antes de cada gravação na base de consultados.
+TAMANHO_LOTE_BASE = 5000
+
+logger = logging.getLogger(__name__)
+
+# As regras de cada processo de trabalho, recebidas uma única vez ao iniciá-lo.
+_regras_do_processo = None
+
+
+def _iniciar_processo(regras):
+    global _regras_do_processo
+    _regras_do_processo = regras
+
+
+def classificar_bloco(bloco: list, regras=None) -> list:
+    """
+    Decodifica e classifica um bloco de respostas do cache.
+
+    Roda nos processos de trabalho, onde 'regras' é omitido e as recebidas ao iniciar
+    o processo são usadas.
+
+    Args:
+        bloco (list): Tuplas (cnpj, corpo), com o JSON comprimido do cache ou None
+                      para "não encontrado".
+        regras (RegrasClassificacao, optional): As regras de classificação.
+
+    Returns:
+        list: As linhas de resultado, na ordem do bloco.
+    """
+    regras = regras or _regras_do_processo
+    return [
+        montar_registro(cnpj, decodificar_corpo(corpo) if corpo else None, regras)
+        for cnpj, corpo in bloco
+    ]
+
+
+def _classificar_em_ordem(blocos, regras, processos: int):
+    """Classifica os blocos em 'processos' processos, devolvendo-os na ordem de leitura."""
+    if processos <= 1:
+        for bloco in blocos:
+            yield classificar_bloco(bloco, regras)
+        return
+
+    # Como no mapear_em_ordem, só uma janela de blocos fica agendada, então o cache
+    # é lido sob demanda.
+    tamanho_janela = 2 * processos
+    janela = deque()
+    with ProcessPoolExecutor(
+        max_workers=processos, initializer=_iniciar_processo, initargs=(regras,)
+    ) as executor:
+        try:
+            for bloco in blocos:
+                janela.append(executor.submit(classificar_bloco, bloco))
+                if len(janela) >= tamanho_janela:
+                    yield janela.popleft().result()
+            while janela:
+                yield janela.popleft().result()
+        finally:
+            for futuro in janela:
+                futuro.cancel()
+
+
+def _itens_da_lista(f, vistos):
+    """
+    Os CNPJs de uma lista, normalizados e sem repetições, como (cnpj, linha): a linha
+    é None para os válidos e a linha Invalido, com o texto original, para os demais.
+    """
+    for texto in f:
+        original = texto.strip()
+        if not original:
+            continue
+        cnpj, valido = normalizar_cnpj(original)
+        if cnpj and vistos.marcar(cnpj):
+            yield cnpj, None if valido else registro_vazio(original, "Invalido")
+
+
+def _itens_do_resultado(f):
+    """Os CNPJs de um CSV de resultado, como (cnpj, linha), com a linha de cada um."""
+    for linha in csv.DictReader(f):
+        yield linha["cnpj"], registro_de_dict(linha)
+
+
+def reclassificar(
+    pasta_dados: str = PASTA_DADOS,
+    saida: str = None,
+    arquivo_regras: str = None,
+    processos: int = None,
+    tamanho_bloco: int = TAMANHO_BLOCO,
+    progress_callback=None,
+    entrada: str = None,
+) -> dict:
+    """
+    Reclassifica as respostas do cache com as regras atuais, sem usar a API.
+
+    Só os CNPJs da lista informada em 'entrada' ou, sem ela, os do resultado da última
+    execução (o próprio CSV de saída) são reclassificados, e o CSV é regenerado só com
+    eles. CNPJs sem resposta válida no cache (ausente ou expirada) mantêm a linha
+    anterior, do CSV ou da base de consultados, e são contados em 'desatualizados';
+    os que não estão em nenhum dos dois ficam de fora. A base de consultados é
+    atualizada, e cada nova categoria é comparada com a anterior, guardada na base.
+
+    Args:
+        pasta_dados (str): A pasta do cache, da base de consultados e dos resultados.
+        saida (str, optional): O caminho do CSV final. Por padrão,
+                               resultado_final.csv na pasta de dados.
+        arquivo_regras (str, optional): Um JSON com as regras de classificação. Por
+                                        padrão, regras_classificacao.json na pasta de
+                                        dados, se existir, ou as regras padrão.
+        processos (int, optional): Quantos processos classificam ao mesmo tempo. Por
+                                   padrão, um por núcleo; com 1, tudo roda no
+                                   processo atual.
+        tamanho_bloco (int): Quantas respostas enviar a cada processo de uma vez.
+        progress_callback (function, optional): Recebe o progresso, como no
+                                                processar_arquivo (sem total).
+        entrada (str, optional): Um arquivo de CNPJs, como o do processar_arquivo.
+
+    Returns:
+        dict: 'contadores' (CNPJs por nova categoria, fora os desatualizados),
+              'por_categoria' (antes, depois, entraram e saíram, por categoria),
+              'mudancas' (quantos CNPJs passaram de cada categoria para outra, com
+              chaves "anterior->nova"), 'sem_classificacao_anterior',
+              'desatualizados' e 'sem_resposta'.
+
+    Raises:
+        ErroProcessamento: Se o cache ou a lista de CNPJs não existirem, se nenhum
+                           CNPJ tiver resposta válida no cache ou se um erro impedir a
+                           reclassificação.
+    """
+    caminho_cache = os.path.join(pasta_dados, "cache_respostas.sqlite3")
+    if not os.path.exists(caminho_cache):
+        raise ErroProcessamento(
+            "Cache Ausente",
+            f"{caminho_cache} não existe. Não há respostas guardadas para reclassificar.",
+        )
+    saida = saida or os.path.join(pasta_dados, "resultado_final.csv")
+    origem = entrada or saida
+    try:
+        if entrada:
+            f_origem = open(entrada, "r", encoding="utf-8", errors="replace")
+        else:
+            f_origem = open(saida, "r", encoding="utf-8-sig", newline="")
+    except OSError as e:
+        raise ErroProcessamento(
+            "Lista Ausente",
+            f"Não foi possível ler {origem}. Informe a lista de CNPJs a reclassificar "
+            f"ou processe uma lista antes.\n\nErro: {e}",
+        ) from e
+    regras = carregar_regras(pasta_dados, arquivo_regras)
+    processos = processos or os.cpu_count() or 1
+
+    cache = CacheRespostas(caminho_cache)
+    base = BaseConsultados(
+        os.path.join(pasta_dados, "consultados.sqlite3"),
+        tamanho_lote=TAMANHO_LOTE_BASE,
+    )
+    vistos = FiltroDuplicados()
+    escritor = EscritorResultados(saida, os.path.join(pasta_dados, "parciais"))
+
+    contadores = Counter()
+    antes = Counter()
+    mudancas = Counter()
+    sem_anterior = 0
+    reclassificados = 0
+    desatualizados = 0
+    sem_resposta = 0
+
+    if entrada:
+        itens = _itens_da_lista(f_origem, vistos)
+    else:
+        itens = _itens_do_resultado(f_origem)
+    # Os itens de cada bloco, com as respostas válidas do cache, na ordem em que os
+    # blocos foram enviados para a classificação.
+    lidos = deque()
+
+    def blocos():
+        """Os blocos a classificar: (cnpj, corpo) dos itens com resposta válida."""
+        while bloco := list(islice(itens, tamanho_bloco)):
+            respostas = cache.obter_varios(
+                [
+                    cnpj
+                    for cnpj, linha in bloco
+                    if linha is None or linha.status != "Invalido"
+                ],
+                decodificar=False,
+            )
+            lidos.append((bloco, respostas))
+            yield [(cnpj, respostas[cnpj]) for cnpj, _ in bloco if cnpj in respostas]
+
+    atual = 0
+    try:
+        for registros in _classificar_em_ordem(blocos(), regras, processos):
+            bloco, respostas = lidos.popleft()
+            classificados = iter(registros)
+            anteriores = base.obter_varios(
+                [cnpj for cnpj, linha in bloco if linha is None or cnpj in respostas]
+            )
+            for cnpj, linha in bloco:
+                atual += 1
+                anterior = anteriores.get(cnpj)
+                if linha is not None and linha.status == "Invalido":
+                    escritor.escrever(linha)
+                    contadores["Invalido"] += 1
+                    continue
+                if cnpj not in respostas:
+                    # Sem resposta válida no cache: fica a linha anterior, sem
+                    # reclassificar, em vez de uma classificação vencida.
+                    if linha is None and anterior is not None:
+                        linha = registro_de_dict(anterior)
+                    if linha is None:
+                        sem_resposta += 1
+                    else:
+                        desatualizados += 1
+                        escritor.escrever(linha)
+                    continue
+                registro = next(classificados)
+                reclassificados += 1
+                nova = registro["status"]
+                if anterior is None or not anterior["status"]:
+                    # Nunca consultado pelo processamento, ou importado do
+                    # ja_consultados.txt antigo, que não guardava a categoria.
+                    sem_anterior += 1
+                    base.registrar(registro)
+                else:
+                    antes[anterior["status"]] += 1
+                    if anterior["status"] != nova:
+                        mudancas[anterior["status"], nova] += 1
+                    if any(anterior[campo] != registro[campo] for campo in registro):
+                        base.registrar(
+                            dict(registro, consultado_em=anterior["consultado_em"])
+                        )
+                escritor.escrever(registro)
+                contadores[nova] += 1
+            if progress_callback:
+                progress_callback(atual, None, "Reclassificando", contadores)
+    except Exception as e:
+        escritor.descartar()
+        raise ErroProcessamento(
+            "Erro na Reclassificação",
+            f"Não foi possível reclassificar as respostas guardadas.\n\nErro: {e}",
+        ) from e
+    finally:
+        f_origem.close()
+        vistos.fechar()
+        base.fechar()
+        cache.fechar()
+
+    if not reclassificados:
+        escritor.descartar()
+        raise ErroProcessamento(
+            "Cache Vazio",
+            f"Nenhum CNPJ de {origem} tem resposta válida no cache para reclassificar.",
+        )
+    try:
+        escritor.finalizar()
+    except Exception as e:
+        raise ErroProcessamento(
+            "Erro ao Salvar",
+            f"Não foi possível salvar o arquivo de resultados.\n\nErro: {e}",
+        ) from e
+
+    entraram = Counter()
+    sairam = Counter()
+    for (anterior, nova), quantidade in mudancas.items():
+        sairam[anterior] += quantidade
+        entraram[nova] += quantidade
+    logger.info(
+        "%d CNPJs lidos de %s; %d reclassificados, %d mudaram de categoria.",
+        atual,
+        origem,
+        reclassificados,
+        sum(mudancas.values()),
+    )
+    if desatualizados or sem_resposta:
+        logger.warning(
+            "%d CNPJs sem resposta válida no cache mantiveram a classificação "
+            "anterior e %d, sem classificação anterior, ficaram fora do resultado.",
+            desatualizados,
+            sem_resposta,
+        )
+    return {
+        "contadores": dict(contadores),
+        "por_categoria": {
+            categoria: {
+                "antes": antes[categoria],
+                "depois": contadores[categoria],
+                "entraram": entraram[categoria],
+                "sairam": sairam[categoria],
+            }
+            for categoria in sorted(set(antes) | set(contadores))
+        },
+        "mudancas": {
+            f"{anterior}->{nova}": quantidade
+            for (anterior, nova), quantidade in mudancas.most_common()
+        },
+        "sem_classificacao_anterior": sem_anterior,
+        "desatualizados": desatualizados,
+        "sem_resposta": sem_resposta,
+    }
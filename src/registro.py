@@ -0,0 +1,133 @@
+# src/registro.py
+"""
+Módulo com a linha de resultado de um CNPJ, no formato compacto usado da classificação
+até a gravação do CSV.
+"""
+import threading
+
+CAMPOS = ("cnpj", "nome", "telefone", "email", "status")
+
+# Os status conhecidos; o código de cada um é a sua posição na lista. As categorias
+# das regras de classificação entram no fim, na primeira vez que aparecem.
+STATUS = [
+    "Desenvolvedor",
+    "NaoDesenvolvedor",
+    "JaConsultado",
+    "NaoEncontrado",
+    "Invalido",
+]
+_CODIGOS = {status: codigo for codigo, status in enumerate(STATUS)}
+_lock_status = threading.Lock()
+
+
+def codigo_status(status: str) -> int:
+    """O código numérico de um status, registrando-o se for novo."""
+    codigo = _CODIGOS.get(status)
+    if codigo is None:
+        with _lock_status:
+            codigo = _CODIGOS.get(status)
+            if codigo is None:
+                codigo = _CODIGOS[status] = len(STATUS)
+                STATUS.append(status)
+    return codigo
+
+
+class _Linha:
+    """
+    Comportamento comum às linhas de resultado. Elas também podem ser lidas como um
+    dicionário somente leitura (registro["status"], registro.get("email"),
+    dict(registro)), o formato usado pela base de consultados e pelo diário.
+    """
+
+    __slots__ = ()
+
+    @property
+    def status(self) -> str:
+        return STATUS[self.codigo]
+
+    def como_tupla(self) -> tuple:
+        """Os valores na ordem de CAMPOS, o formato de uma linha do CSV."""
+        return self.cnpj, self.nome, self.telefone, self.email, STATUS[self.codigo]
+
+    def como_dict(self) -> dict:
+        return dict(zip(CAMPOS, self.como_tupla()))
+
+    def keys(self):
+        return CAMPOS
+
+    def __iter__(self):
+        return iter(CAMPOS)
+
+    def __len__(self):
+        return len(CAMPOS)
+
+    def __getitem__(self, campo: str):
+        if campo not in CAMPOS:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def get(self, campo: str, padrao=None):
+        return getattr(self, campo) if campo in CAMPOS else padrao
+
+    def __eq__(self, outro):
+        if isinstance(outro, _Linha):
+            return self.como_tupla() == outro.como_tupla()
+        if isinstance(outro, dict):
+            return self.como_dict() == outro
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self.como_tupla()!r}"
+
+    def __reduce__(self):
+        # O código do status só vale neste processo; entre processos vai o nome.
+        return criar_registro, self.como_tupla()
+
+
+class Registro(_Linha):
+    """Linha de resultado de um CNPJ consultado, com os dados de contato."""
+
+    __slots__ = ("cnpj", "nome", "telefone", "email", "codigo")
+
+    def __init__(self, cnpj: str, nome: str, telefone: str, email: str, status: str):
+        self.cnpj = cnpj
+        self.nome = nome
+        self.telefone = telefone
+        self.email = email
+        self.codigo = codigo_status(status)
+
+
+class RegistroVazio(_Linha):
+    """
+    Linha de resultado sem dados de contato (NaoEncontrado, Invalido). Os campos vazios
+    são da classe, compartilhados por todas as linhas; cada uma guarda só o CNPJ e o
+    código do status.
+    """
+
+    __slots__ = ("cnpj", "codigo")
+
+    nome = telefone = email = ""
+
+    def __init__(self, cnpj: str, status: str):
+        self.cnpj = cnpj
+        self.codigo = codigo_status(status)
+
+
+def criar_registro(
+    cnpj: str, nome: str, telefone: str, email: str, status: str
+) -> _Linha:
+    """Cria a linha de resultado, na forma compartilhada se não houver contato."""
+    if nome or telefone or email:
+        return Registro(cnpj, nome, telefone, email, status)
+    return RegistroVazio(cnpj, status)
+
+
+def registro_de_dict(linha: dict) -> _Linha:
+    """Cria a linha de resultado a partir de um dicionário com os campos de CAMPOS."""
+    return criar_registro(
+        linha["cnpj"],
+        linha.get("nome") or "",
+        linha.get("telefone") or "",
+        linha.get("email") or "",
+        linha["status"],
+    )
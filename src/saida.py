@@ -0,0 +1,131 @@
+# src/saida.py
+"""
+Módulo responsável por gravar o resultado_final.csv à medida que os resultados chegam.
+"""
+import os
+
+from .exportadores import EXPORTADORES, ExportadorCSV
+
+# Ordem em que os status aparecem no CSV final.
+ORDEM_STATUS = [
+    "NaoDesenvolvedor",
+    "JaConsultado",
+    "Desenvolvedor",
+    "NaoEncontrado",
+    "Invalido",
+]
+
+# A cada quantas linhas os arquivos parciais são descarregados no disco.
+INTERVALO_DESCARGA = 100
+
+
+class EscritorResultados:
+    """
+    Grava as linhas do resultado uma a uma, sem mantê-las na memória.
+
+    Cada status tem o seu arquivo parcial (por exemplo, data/parciais/Desenvolvedor.csv),
+    completo com cabeçalho, que já pode ser aberto enquanto o processamento continua.
+    Ao finalizar, os parciais são concatenados na ordem de ORDEM_STATUS (status fora
+    da lista vêm no fim, na ordem em que apareceram) para formar o CSV final.
+
+    Os exportadores de outros formatos (ver src/exportadores.py) recebem as mesmas
+    linhas, nos seus próprios parciais, e geram os seus arquivos ao lado do CSV.
+    """
+
+    def __init__(
+        self, caminho: str, pasta_parciais: str = None, exportadores: list = ()
+    ):
+        """
+        Args:
+            caminho (str): O caminho do CSV final.
+            pasta_parciais (str, optional): Onde ficam os arquivos por status. Por
+                                            padrão, a pasta 'parciais' ao lado do CSV.
+            exportadores (list): Exportadores dos formatos gerados além do CSV (ver
+                                 criar_exportadores). Cada arquivo tem o nome do CSV
+                                 com a extensão do formato.
+        """
+        self.caminho = caminho
+        self.pasta_parciais = pasta_parciais or os.path.join(
+            os.path.dirname(caminho), "parciais"
+        )
+        self.exportadores = [ExportadorCSV(), *exportadores]
+        base, _ = os.path.splitext(caminho)
+        # O arquivo final de cada formato; o do CSV é o próprio 'caminho'.
+        self.caminhos = {"csv": caminho}
+        for exportador in exportadores:
+            self.caminhos[exportador.nome] = base + exportador.extensao
+        self.linhas = 0
+        self._parciais = {}
+        os.makedirs(self.pasta_parciais, exist_ok=True)
+        # Parciais que sobraram de uma execução interrompida não valem mais.
+        extensoes = tuple(e.extensao_parcial for e in EXPORTADORES.values())
+        for nome in os.listdir(self.pasta_parciais):
+            if nome.endswith(extensoes):
+                os.remove(os.path.join(self.pasta_parciais, nome))
+
+    def caminho_parcial(self, status: str, exportador=None) -> str:
+        """O caminho do arquivo parcial de um status (por padrão, o do CSV)."""
+        extensao = exportador.extensao_parcial if exportador else ".csv"
+        return os.path.join(self.pasta_parciais, f"{status}{extensao}")
+
+    def escrever(self, registro):
+        """
+        Acrescenta uma linha ao arquivo parcial do seu status.
+
+        Args:
+            registro (Registro or RegistroVazio): A linha de resultado (ver src/registro.py).
+        """
+        # Os parciais são indexados pelo código do status, sem comparar strings.
+        parcial = self._parciais.get(registro.codigo)
+        if parcial is None:
+            status = registro.status
+            parcial = self._parciais[registro.codigo] = (
+                status,
+                [
+                    e.abrir_parcial(self.caminho_parcial(status, e))
+                    for e in self.exportadores
+                ],
+            )
+        linha = registro.como_tupla()
+        for arquivo in parcial[1]:
+            arquivo.escrever(linha)
+
+        self.linhas += 1
+        if self.linhas % INTERVALO_DESCARGA == 0:
+            self.descarregar()
+
+    def descarregar(self):
+        """Grava no disco o que estiver em buffer nos arquivos parciais."""
+        for _, arquivos in self._parciais.values():
+            for arquivo in arquivos:
+                arquivo.descarregar()
+
+    def _fechar_parciais(self):
+        for _, arquivos in self._parciais.values():
+            for arquivo in arquivos:
+                arquivo.fechar()
+
+    def finalizar(self):
+        """Junta os parciais, na ordem dos status, em cada formato e os remove."""
+        self._fechar_parciais()
+        gerados = [status for status, _ in self._parciais.values()]
+        ordem = [s for s in ORDEM_STATUS if s in gerados]
+        ordem += [s for s in gerados if s not in ORDEM_STATUS]
+
+        for exportador in self.exportadores:
+            exportador.juntar(
+                [self.caminho_parcial(status, exportador) for status in ordem],
+                self.caminhos[exportador.nome],
+            )
+        self._remover_parciais()
+
+    def descartar(self):
+        """Fecha e apaga os parciais sem gerar os arquivos finais."""
+        self._fechar_parciais()
+        self._remover_parciais()
+
+    def _remover_parciais(self):
+        for status, _ in self._parciais.values():
+            for exportador in self.exportadores:
+                os.remove(self.caminho_parcial(status, exportador))
+        self._parciais.clear()
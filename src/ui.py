@@ -1,14 +1,41 @@
 # src/ui.py
 """
 Módulo responsável pela criação e gerenciamento da interface gráfica (GUI) da aplicação.
+
+Os módulos de consulta e processamento (requests, regras, base) só são importados
+quando o processamento começa, para que a janela apareça o quanto antes.
 """
+import logging
 import os
 import time
+from collections import deque
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from threading import Thread
-from tkinter import filedialog, messagebox
-from .main import processar_arquivo
+from tkinter import TclError, filedialog, messagebox
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre duas atualizações do progresso na tela (10 quadros por segundo).
+INTERVALO_ATUALIZACAO_MS = 100
+
+# Formatos oferecidos além do CSV, como aparecem na tela, e o nome de cada um.
+FORMATOS_EXPORTACAO = {
+    "Somente CSV": None,
+    "NDJSON": "ndjson",
+    "Excel (XLSX)": "xlsx",
+    "Parquet": "parquet",
+}
+
+# Janela, em segundos, usada para calcular a vazão e o tempo restante.
+JANELA_VAZAO = 10.0
+
+
+def formatar_duracao(segundos: float) -> str:
+    """Formata uma duração em segundos como HH:MM:SS."""
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
 
 
 class App(ttk.Window):
@@ -18,11 +45,22 @@ class App(ttk.Window):
         super().__init__(themename="superhero")
 
         self.title("Consulta e Classificação de CNPJs")
-        self.geometry("700x550")
+        self.geometry("700x760")
         self.resizable(False, False)
 
         self.arquivo_path = ""
         self.start_time = 0
+        self.consultas_minuto = 5
+        self.simultaneas = 1
+        self.retomar = False
+        self.formato = None
+        self.coordenar = False
+
+        # Progresso mais recente informado pela thread de trabalho, e o estado usado
+        # para desenhá-lo (ver _atualizar_periodicamente).
+        self._progresso = None
+        self._processando = False
+        self._amostras = deque()
 
         self.create_widgets()
 
@@ -62,13 +100,15 @@ class App(ttk.Window):
         contadores_frame = ttk.Frame(main_frame)
         contadores_frame.pack(fill=BOTH, expand=YES)
         contadores_frame.columnconfigure((0, 1), weight=1)
-        contadores_frame.rowconfigure((0, 1), weight=1)
+        contadores_frame.rowconfigure((0, 1, 2), weight=1)
 
         self.vars = {
             "Desenvolvedor": ttk.StringVar(value="0"),
             "NaoDesenvolvedor": ttk.StringVar(value="0"),
             "JaConsultado": ttk.StringVar(value="0"),
             "NaoEncontrado": ttk.StringVar(value="0"),
+            "Invalido": ttk.StringVar(value="0"),
+            "Duplicado": ttk.StringVar(value="0"),
         }
         self.criar_card(
             contadores_frame, "Desenvolvedores", self.vars["Desenvolvedor"], "success"
@@ -85,6 +125,50 @@ class App(ttk.Window):
         self.criar_card(
             contadores_frame, "Não Encontrados", self.vars["NaoEncontrado"], "secondary"
         ).grid(row=1, column=1, padx=10, pady=10, sticky="nsew")
+        self.criar_card(
+            contadores_frame, "Inválidos", self.vars["Invalido"], "danger"
+        ).grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
+        self.criar_card(
+            contadores_frame, "Duplicados", self.vars["Duplicado"], "light"
+        ).grid(row=2, column=1, padx=10, pady=10, sticky="nsew")
+
+        opcoes_frame = ttk.Frame(main_frame)
+        opcoes_frame.pack(fill=X, pady=(10, 0))
+        self.consultas_minuto_var = ttk.IntVar(value=5)
+        ttk.Label(opcoes_frame, text="Consultas por minuto:").pack(side=LEFT)
+        ttk.Spinbox(
+            opcoes_frame,
+            from_=1,
+            to=1000,
+            width=6,
+            textvariable=self.consultas_minuto_var,
+        ).pack(side=LEFT, padx=(5, 20))
+        self.simultaneas_var = ttk.IntVar(value=1)
+        ttk.Label(opcoes_frame, text="Consultas simultâneas:").pack(side=LEFT)
+        ttk.Spinbox(
+            opcoes_frame, from_=1, to=32, width=4, textvariable=self.simultaneas_var
+        ).pack(side=LEFT, padx=5)
+
+        formato_frame = ttk.Frame(main_frame)
+        formato_frame.pack(fill=X, pady=(10, 0))
+        self.formato_var = ttk.StringVar(value="Somente CSV")
+        ttk.Label(formato_frame, text="Exportar também:").pack(side=LEFT)
+        ttk.Combobox(
+            formato_frame,
+            values=list(FORMATOS_EXPORTACAO),
+            textvariable=self.formato_var,
+            state="readonly",
+            width=14,
+        ).pack(side=LEFT, padx=5)
+
+        # Desligado por padrão: o resultado fica em data/resultado_final.csv.
+        self.coordenar_var = ttk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            main_frame,
+            text="Pasta de dados compartilhada com outras pessoas (coordenar consultas)",
+            variable=self.coordenar_var,
+            bootstyle="round-toggle",
+        ).pack(pady=(10, 0))
 
         self.progress = ttk.Progressbar(
             main_frame,
@@ -143,6 +227,38 @@ class App(ttk.Window):
         if not self.arquivo_path:
             messagebox.showwarning("Aviso", "Nenhum arquivo foi selecionado.")
             return
+        try:
+            # As variáveis do Tk só podem ser lidas na thread principal.
+            self.consultas_minuto = max(1, self.consultas_minuto_var.get())
+            self.simultaneas = max(1, self.simultaneas_var.get())
+            self.formato = FORMATOS_EXPORTACAO.get(self.formato_var.get())
+            self.coordenar = self.coordenar_var.get()
+        except TclError:
+            messagebox.showwarning("Aviso", "Informe valores numéricos nas opções.")
+            return
+
+        from .coordenacao import arquivos_execucao, arquivos_padrao, id_execucao_padrao
+        from .diario import Diario
+        from .main import PASTA_DADOS
+
+        if self.coordenar:
+            # Várias pessoas usam a mesma pasta de dados ao mesmo tempo: cada execução
+            # tem os seus arquivos e espera pelos CNPJs que outra já está consultando.
+            self.arquivos = arquivos_execucao(
+                PASTA_DADOS, id_execucao_padrao(self.arquivo_path)
+            )
+        else:
+            self.arquivos = arquivos_padrao(PASTA_DADOS)
+        self.retomar = False
+        if Diario(self.arquivos["diario"]).existe_para(self.arquivo_path):
+            resposta = messagebox.askyesnocancel(
+                "Execução Interrompida",
+                "O processamento anterior deste arquivo não foi concluído.\n\n"
+                "Deseja retomar de onde parou? Escolha 'Não' para começar do zero.",
+            )
+            if resposta is None:
+                return
+            self.retomar = resposta
 
         # Reseta a interface para um novo processamento
         self.btn_selecionar.config(state="disabled")
@@ -152,36 +268,109 @@ class App(ttk.Window):
             var.set("0")
         self.status_label.config(text="Iniciando...")
         self.start_time = time.time()
+        self._progresso = None
+        self._amostras.clear()
+        self._processando = True
+        self.after(INTERVALO_ATUALIZACAO_MS, self._atualizar_periodicamente)
 
         # Cria e inicia a thread de trabalho
         thread = Thread(target=self.rodar_processamento, daemon=True)
         thread.start()
 
     def rodar_processamento(self):
-        """Função executada pela thread de trabalho. Chama a lógica principal."""
-        resultados_finais = processar_arquivo(
-            self.arquivo_path, self.atualizar_progresso
-        )
-        # Agenda a função de finalização para ser executada na thread principal
-        self.after(0, self.finalizar_processamento, resultados_finais)
+        """
+        Função executada pela thread de trabalho. Chama a lógica principal.
+
+        Qualquer erro, esperado ou não, é mostrado numa mensagem, e a finalização é
+        sempre agendada, para que a janela não fique presa no estado "processando".
+        """
+        resultados_finais = None
+        try:
+            from .limitador import LimitadorTaxa
+            from .main import processar_arquivo
+
+            limitador = LimitadorTaxa(
+                taxa=self.consultas_minuto / 60, rajada=self.simultaneas
+            )
+            resultados_finais = processar_arquivo(
+                self.arquivo_path,
+                self.atualizar_progresso,
+                limitador=limitador,
+                max_simultaneas=self.simultaneas,
+                retomar=self.retomar,
+                coordenar=self.coordenar,
+                formatos=(self.formato,) if self.formato else (),
+            )
+        except Exception as e:
+            # Os ErroProcessamento trazem o título e a mensagem para o usuário. Os
+            # demais (inclusive uma falha ao importar os módulos acima) são inesperados.
+            titulo, mensagem = getattr(e, "titulo", None), str(e)
+            if titulo is None:
+                logger.exception("Erro inesperado no processamento.")
+                titulo = "Erro Inesperado"
+                mensagem = (
+                    "O processamento foi interrompido por um erro inesperado."
+                    f"\n\nErro: {e}"
+                )
+            self.after(0, messagebox.showerror, titulo, mensagem)
+        finally:
+            # Agenda a função de finalização para ser executada na thread principal
+            self.after(0, self.finalizar_processamento, resultados_finais)
 
     def atualizar_progresso(self, atual, total, status_msg, totais_parciais):
-        """Callback que a lógica principal chama. Agenda a atualização da UI."""
-        self.after(0, self._safe_update_ui, atual, total, status_msg, totais_parciais)
+        """
+        Callback que a lógica principal chama, na thread de trabalho, a cada CNPJ.
+
+        Só guarda o estado mais recente, sem agendar nada no Tk: com consultas
+        rápidas (cache, base local) são dezenas de milhares de chamadas por segundo,
+        que encheriam a fila de eventos e travariam a janela.
+        """
+        # Uma única atribuição, lida inteira pela thread principal. Os contadores
+        # são copiados porque a thread de trabalho continua a alterá-los.
+        self._progresso = (atual, total, dict(totais_parciais))
+
+    def _atualizar_periodicamente(self):
+        """Desenha o progresso mais recente, no máximo a cada INTERVALO_ATUALIZACAO_MS."""
+        if not self._processando:
+            return
+        self._safe_update_ui()
+        self.after(INTERVALO_ATUALIZACAO_MS, self._atualizar_periodicamente)
 
-    def _safe_update_ui(self, atual, total, status_msg, totais_parciais):
-        """Atualiza de forma segura os widgets da interface com o progresso atual."""
-        if total > 0:
+    def _safe_update_ui(self):
+        """Atualiza os widgets com o último progresso, a vazão e o tempo restante."""
+        progresso = self._progresso
+        if progresso is None:
+            return
+        atual, total, totais_parciais = progresso
+
+        if total:
             self.progress["value"] = (atual / total) * 100
         for key, var in self.vars.items():
-            var.set(str(totais_parciais.get(key, 0)))
-
-        # Monta a string de status simplificada
-        status_final = f"Processando: {atual} de {total}"
+            texto = str(totais_parciais.get(key, 0))
+            if var.get() != texto:
+                var.set(texto)
+
+        # Vazão dos últimos JANELA_VAZAO segundos, que acompanha as mudanças de ritmo
+        # (cache, 429) melhor do que a média desde o início.
+        agora = time.monotonic()
+        self._amostras.append((agora, atual))
+        while agora - self._amostras[0][0] > JANELA_VAZAO:
+            self._amostras.popleft()
+        inicio, atual_inicio = self._amostras[0]
+        vazao = (atual - atual_inicio) / (agora - inicio) if agora > inicio else 0
+
+        status_final = f"Processando: {atual} de {total or 'total desconhecido'}"
+        if vazao > 0:
+            status_final += f" | {vazao:.1f} CNPJs/s"
+            if total:
+                status_final += (
+                    f" | Restante: {formatar_duracao((total - atual) / vazao)}"
+                )
         self.status_label.config(text=status_final)
 
     def finalizar_processamento(self, resultados_finais):
         """Executa na thread principal quando o processo termina, atualizando a UI para o estado final."""
+        self._processando = False
         if resultados_finais is None:  # Ocorreu um erro no processamento
             self.btn_selecionar.config(state="normal")
             self.btn_iniciar.config(state="disabled")
@@ -195,20 +384,36 @@ class App(ttk.Window):
 
         self.btn_selecionar.config(state="normal")
         self.btn_iniciar.config(state="disabled")
-        texto_final = f"Processamento concluído! {sum(resultados_finais.values())} registros processados."
+        evitadas = resultados_finais.get("Invalido", 0) + resultados_finais.get(
+            "Duplicado", 0
+        )
+        texto_final = (
+            f"Processamento concluído! {sum(resultados_finais.values())} registros "
+            f"processados, {evitadas} consultas evitadas."
+        )
         self.status_label.config(text=texto_final)
         self.progress["value"] = 100
 
-        messagebox.showinfo(
-            "Sucesso",
-            "Processamento concluído!\nResultados salvos como 'resultado_final.csv' na pasta 'data'.",
+        mensagem = (
+            f"Processamento concluído!\nResultados salvos em '{self.arquivos['saida']}'"
         )
+        if self.formato:
+            mensagem += f" e no arquivo .{self.formato} de mesmo nome"
+        messagebox.showinfo("Sucesso", mensagem + ".")
 
         if self.fechar_var.get():
             self.destroy()
 
 
-def criar_interface():
-    """Função de ponto de entrada para iniciar a aplicação."""
+def criar_interface(perfil=None):
+    """
+    Função de ponto de entrada para iniciar a aplicação.
+
+    Args:
+        perfil (PerfilInicializacao, optional): Mede o tempo até a janela aparecer
+                                                (ver src/perfil.py).
+    """
     app = App()
+    if perfil is not None:
+        perfil.acompanhar_janela(app)
     app.mainloop()
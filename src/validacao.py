@@ -0,0 +1,218 @@
+# src/validacao.py
+"""
+Módulo de normalização e validação local de CNPJs (dígitos verificadores), feita antes
+de qualquer consulta à API.
+"""
+import re
+import sqlite3
+from operator import mul
+
+_NAO_DIGITOS = re.compile(r"[^0-9]")
+
+# Pesos do cálculo dos dois dígitos verificadores (módulo 11).
+_PESOS_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_DV2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Os dígitos chegam como bytes ASCII ('0' == 48); em vez de subtrair 48 de cada um,
+# desconta-se a soma dos pesos vezes 48 uma única vez.
+_AJUSTE_DV1 = 48 * sum(_PESOS_DV1)
+_AJUSTE_DV2 = 48 * sum(_PESOS_DV2)
+
+# Planilhas costumam remover os zeros à esquerda; entradas com esse tamanho são
+# completadas com zeros antes da validação.
+_TAMANHO_MINIMO_PARA_COMPLETAR = 12
+
+# CNPJs distintos guardados na memória (cerca de 100 bytes cada) antes de o filtro de
+# duplicados passar a usar um banco temporário, e o tamanho dos lotes gravados nele.
+LIMITE_DUPLICADOS_MEMORIA = 500_000
+TAMANHO_LOTE_DUPLICADOS = 10_000
+
+# Máximo de parâmetros numa consulta 'IN (...)' (o SQLite antigo aceita até 999). Vale
+# para todas as buscas em lote nos bancos SQLite (base de consultados, cache).
+PARAMETROS_POR_CONSULTA = 500
+
+
+def somente_digitos(texto: str) -> str:
+    """Remove tudo o que não for dígito de 0 a 9."""
+    return _NAO_DIGITOS.sub("", texto)
+
+
+def _digito_verificador(soma: int) -> int:
+    resto = soma % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def cnpj_valido(cnpj: str) -> bool:
+    """
+    Confere o tamanho e os dois dígitos verificadores de um CNPJ.
+
+    Args:
+        cnpj (str): O CNPJ com 14 dígitos, sem pontuação.
+
+    Returns:
+        bool: True se o CNPJ for válido.
+    """
+    if len(cnpj) != 14:
+        return False
+    b = cnpj.encode("ascii")
+    # Sequências de um único dígito passam no cálculo, mas não são CNPJs reais.
+    if b.count(b[0]) == 14:
+        return False
+    dv1 = _digito_verificador(sum(map(mul, _PESOS_DV1, b)) - _AJUSTE_DV1)
+    if b[12] - 48 != dv1:
+        return False
+    dv2 = _digito_verificador(sum(map(mul, _PESOS_DV2, b)) - _AJUSTE_DV2)
+    return b[13] - 48 == dv2
+
+
+def normalizar_cnpj(texto: str):
+    """
+    Normaliza uma linha de entrada para um CNPJ de 14 dígitos e o valida.
+
+    Args:
+        texto (str): A linha como veio do arquivo (com ou sem pontuação).
+
+    Returns:
+        tuple: (cnpj, valido). 'cnpj' tem só os dígitos, completado com zeros à
+               esquerda quando tiver 12 ou 13 dígitos, e é vazio se a linha não tiver
+               nenhum dígito. 'valido' indica se os dígitos verificadores conferem.
+    """
+    cnpj = somente_digitos(texto)
+    if _TAMANHO_MINIMO_PARA_COMPLETAR <= len(cnpj) < 14:
+        cnpj = cnpj.zfill(14)
+    return cnpj, cnpj_valido(cnpj)
+
+
+class FiltroDuplicados:
+    """
+    Conjunto dos CNPJs já vistos numa execução, para descartar as repetições do
+    arquivo de entrada antes de qualquer consulta.
+
+    Até 'limite_memoria' CNPJs, fica num set na memória. Acima disso, vai para um banco
+    SQLite temporário e privado, que vai para o disco se crescer, então a memória não
+    aumenta com o número de CNPJs distintos. Os novos CNPJs são gravados no banco em
+    lotes de 'tamanho_lote', com um único executemany. O banco é descartado ao fechar.
+    """
+
+    def __init__(
+        self,
+        limite_memoria: int = LIMITE_DUPLICADOS_MEMORIA,
+        tamanho_lote: int = TAMANHO_LOTE_DUPLICADOS,
+    ):
+        """
+        Args:
+            limite_memoria (int): Quantos CNPJs guardar no set antes de passar ao banco.
+            tamanho_lote (int): Quantos CNPJs novos acumular antes de gravá-los no banco.
+        """
+        self.limite_memoria = limite_memoria
+        self.tamanho_lote = tamanho_lote
+        # Os CNPJs ainda não gravados no banco (todos, enquanto não houver banco).
+        self._memoria = set()
+        self._conexao = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def __len__(self):
+        gravados = 0
+        if self._conexao is not None:
+            gravados = self._conexao.execute("SELECT COUNT(*) FROM vistos").fetchone()[
+                0
+            ]
+        return gravados + len(self._memoria)
+
+    def marcar(self, cnpj: str) -> bool:
+        """
+        Marca um CNPJ como visto.
+
+        Args:
+            cnpj (str): O CNPJ normalizado.
+
+        Returns:
+            bool: True na primeira vez que o CNPJ aparece; False nas repetições.
+        """
+        memoria = self._memoria
+        if cnpj in memoria:
+            return False
+        if self._conexao is not None:
+            if self._conexao.execute(
+                "SELECT 1 FROM vistos WHERE cnpj = ?", (cnpj,)
+            ).fetchone():
+                return False
+            memoria.add(cnpj)
+            if len(memoria) >= self.tamanho_lote:
+                self._gravar()
+            return True
+        memoria.add(cnpj)
+        if len(memoria) >= self.limite_memoria:
+            self._passar_ao_banco()
+        return True
+
+    def marcar_varios(self, cnpjs: list) -> list:
+        """
+        Marca vários CNPJs como vistos, na ordem, com uma única busca no banco (se
+        houver) para todo o lote.
+
+        Args:
+            cnpjs (list): Os CNPJs normalizados.
+
+        Returns:
+            list: Para cada CNPJ, o que marcar() devolveria: True na primeira vez que
+                  aparece (inclusive dentro do próprio lote), False nas repetições.
+        """
+        memoria = self._memoria
+        gravados = ()
+        if self._conexao is not None:
+            candidatos = list({cnpj for cnpj in cnpjs if cnpj not in memoria})
+            gravados = set()
+            for inicio in range(0, len(candidatos), PARAMETROS_POR_CONSULTA):
+                parte = candidatos[inicio : inicio + PARAMETROS_POR_CONSULTA]
+                gravados.update(
+                    cnpj
+                    for (cnpj,) in self._conexao.execute(
+                        "SELECT cnpj FROM vistos WHERE cnpj IN "
+                        f"({','.join('?' * len(parte))})",
+                        parte,
+                    )
+                )
+        resultado = []
+        for cnpj in cnpjs:
+            if cnpj in memoria or cnpj in gravados:
+                resultado.append(False)
+            else:
+                memoria.add(cnpj)
+                resultado.append(True)
+        if self._conexao is not None:
+            if len(memoria) >= self.tamanho_lote:
+                self._gravar()
+        elif len(memoria) >= self.limite_memoria:
+            self._passar_ao_banco()
+        return resultado
+
+    def _passar_ao_banco(self):
+        # Sem commits: o banco é temporário, e uma única transação aberta evita o
+        # custo de uma transação por lote.
+        self._conexao = sqlite3.connect("", isolation_level=None)
+        self._conexao.execute(
+            "CREATE TABLE vistos (cnpj TEXT PRIMARY KEY) WITHOUT ROWID"
+        )
+        self._conexao.execute("BEGIN")
+        self._gravar()
+
+    def _gravar(self):
+        # Em ordem, as inserções percorrem a árvore do índice uma única vez.
+        self._conexao.executemany(
+            "INSERT INTO vistos VALUES (?)",
+            ((cnpj,) for cnpj in sorted(self._memoria)),
+        )
+        self._memoria.clear()
+
+    def fechar(self):
+        """Descarta o conjunto."""
+        self._memoria.clear()
+        if self._conexao is not None:
+            self._conexao.close()
+            self._conexao = None
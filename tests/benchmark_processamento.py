@@ -0,0 +1,442 @@
+# tests/benchmark_processamento.py
+"""
+Benchmark reproduzível do processamento, contra a API CNPJá simulada
+(tests/servidor_cnpja_simulado.py).
+
+Mede o processar_arquivo de ponta a ponta (consulta, classificação, base, diário e
+CSV) e o consulta_cnpj isolado, e grava um JSON com vazão (CNPJs/s), latência das
+consultas (p50/p95/p99), pico de memória (RSS) e a conferência do resultado com o
+esperado, para comparar versões. Rodar a partir da raiz do projeto:
+
+    python -m tests.benchmark_processamento --cnpjs 5000 --simultaneas 8
+
+Também mede a memória ocupada por linha de resultado retida (o Registro compacto
+contra o dicionário de cinco chaves usado antes) e a vazão da validação local
+(normalização, dígitos verificadores e filtro de duplicados), sem consultas.
+
+Com --provedores, o processamento usa o RoteadorProvedores, com uma API simulada para
+cada provedor e a cota informada (por exemplo, cnpja:600,brasilapi:600).
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from src.api import ClienteCNPJa, FalhaTransitoria, configurar_cliente_padrao
+from src.api import consulta_cnpj
+from src.limitador import LimitadorTaxa
+from src.main import TAMANHO_LOTE_LEITURA, montar_registro, processar_arquivo
+from src.metricas import Metricas
+from src.provedores import RoteadorProvedores, criar_roteador
+from src.validacao import FiltroDuplicados, normalizar_cnpj
+from tests.servidor_cnpja_simulado import (
+    ServidorCNPJaSimulado,
+    gerar_empresa,
+    sorteio,
+    status_esperado,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PESOS_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+PESOS_DV2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def gerar_cnpjs(quantidade: int, semente: int) -> list:
+    """Gera CNPJs distintos com dígitos verificadores válidos."""
+    sorteador = random.Random(semente)
+    cnpjs = []
+    for raiz in sorteador.sample(range(1, 10**8), quantidade):
+        digitos = [int(c) for c in f"{raiz:08d}0001"]
+        for pesos in (PESOS_DV1, PESOS_DV2):
+            resto = sum(p * d for p, d in zip(pesos, digitos)) % 11
+            digitos.append(0 if resto < 2 else 11 - resto)
+        cnpjs.append("".join(map(str, digitos)))
+    return cnpjs
+
+
+class ConsultaMedida:
+    """Guarda a duração de cada consulta (com as novas tentativas) em 'latencias'."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencias = []
+
+    def consultar(self, cnpj, limitador=None, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().consultar(cnpj, limitador, **kwargs)
+        finally:
+            self.latencias.append(time.perf_counter() - inicio)
+
+
+class ClienteMedido(ConsultaMedida, ClienteCNPJa):
+    """ClienteCNPJa com a duração de cada consulta."""
+
+
+class RoteadorMedido(ConsultaMedida, RoteadorProvedores):
+    """RoteadorProvedores com a duração de cada consulta."""
+
+
+def percentis(valores: list) -> dict:
+    """p50, p95 e p99 de uma lista de durações, em milissegundos."""
+    if len(valores) < 2:
+        return {"p50": None, "p95": None, "p99": None}
+    cortes = statistics.quantiles(valores, n=100, method="inclusive")
+    return {
+        "p50": round(cortes[49] * 1000, 3),
+        "p95": round(cortes[94] * 1000, 3),
+        "p99": round(cortes[98] * 1000, 3),
+    }
+
+
+def pico_rss_mb():
+    """Maior memória residente do processo até agora, em MB."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(pico / divisor, 1)
+
+
+def versao_do_codigo():
+    """O commit atual, se o projeto estiver num repositório git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def criar_servidor(args, formato: str = "cnpja") -> ServidorCNPJaSimulado:
+    return ServidorCNPJaSimulado(
+        latencia=args.latencia,
+        taxa_erro=args.taxa_erro,
+        taxa_429=args.taxa_429,
+        retry_after=args.retry_after,
+        taxa_nao_encontrado=args.taxa_nao_encontrado,
+        tamanho_payload=args.tamanho_payload,
+        formato=formato,
+    )
+
+
+def criar_roteador_medido(args, servidores: dict, metricas=None) -> RoteadorMedido:
+    """Um roteador com os provedores de --provedores, apontados para os servidores."""
+    roteador = criar_roteador(
+        args.provedores.split(","),
+        tamanho_pool=args.simultaneas,
+        metricas=metricas,
+        urls={nome: servidor.url for nome, servidor in servidores.items()},
+    )
+    return RoteadorMedido(
+        roteador.provedores, espera_base=args.espera_base, metricas=metricas
+    )
+
+
+def criar_cliente(args, servidor, metricas=None) -> ClienteMedido:
+    # Sem limite de consultas por minuto, mede só o processamento; com limite, o
+    # intervalo entre as consultas entra na medição, como na API real.
+    limitador = None
+    if args.consultas_por_minuto:
+        limitador = LimitadorTaxa(
+            taxa=args.consultas_por_minuto / 60, rajada=args.simultaneas
+        )
+    return ClienteMedido(
+        limitador=limitador,
+        tamanho_pool=args.simultaneas,
+        espera_base=args.espera_base,
+        url_base=servidor.url,
+        metricas=metricas,
+    )
+
+
+def resumo_servidor(servidor) -> dict:
+    return {
+        "respostas_http": {str(k): v for k, v in sorted(servidor.respostas.items())},
+        "bytes_enviados": servidor.bytes_enviados,
+    }
+
+
+def nomes_provedores(args) -> list:
+    return [p.partition(":")[0].strip().lower() for p in args.provedores.split(",")]
+
+
+def medir_processar_arquivo(args, cnpjs: list) -> dict:
+    """Roda o processar_arquivo num arquivo com os CNPJs e confere o CSV gerado."""
+    with tempfile.TemporaryDirectory() as pasta, ExitStack() as pilha:
+        formatos = nomes_provedores(args) if args.provedores else ["cnpja"]
+        servidores = {
+            formato: pilha.enter_context(criar_servidor(args, formato))
+            for formato in formatos
+        }
+        entrada = os.path.join(pasta, "cnpjs.txt")
+        with open(entrada, "w", encoding="utf-8") as f:
+            f.write("\n".join(cnpjs) + "\n")
+        pasta_dados = os.path.join(pasta, "data")
+
+        metricas = Metricas()
+        if args.provedores:
+            cliente = criar_roteador_medido(args, servidores, metricas)
+        else:
+            cliente = criar_cliente(args, servidores["cnpja"], metricas)
+        inicio = time.perf_counter()
+        contadores = processar_arquivo(
+            entrada,
+            cliente=cliente,
+            max_simultaneas=args.simultaneas,
+            pasta_dados=pasta_dados,
+            metricas=metricas,
+        )
+        segundos = time.perf_counter() - inicio
+        cliente.fechar()
+
+        with open(
+            os.path.join(pasta_dados, "resultado_final.csv"), encoding="utf-8-sig"
+        ) as f:
+            obtidos = {linha["cnpj"]: linha["status"] for linha in csv.DictReader(f)}
+        divergentes = [
+            cnpj
+            for cnpj in cnpjs
+            if obtidos.get(cnpj) != status_esperado(cnpj, args.taxa_nao_encontrado)
+        ]
+        return {
+            "cnpjs": len(cnpjs),
+            "segundos": round(segundos, 3),
+            "cnpjs_por_segundo": round(len(cnpjs) / segundos, 2),
+            "latencia_consulta_ms": percentis(cliente.latencias),
+            "pico_rss_mb": pico_rss_mb(),
+            "contadores": contadores,
+            "etapas": metricas.instantaneo()["etapas"],
+            "conferencia": {
+                "linhas_no_csv": len(obtidos),
+                "corretos": len(cnpjs) - len(divergentes),
+                "divergentes": len(divergentes),
+                "exemplos_divergentes": divergentes[:10],
+            },
+            "servidor": (
+                {nome: resumo_servidor(s) for nome, s in servidores.items()}
+                if args.provedores
+                else resumo_servidor(servidores["cnpja"])
+            ),
+        }
+
+
+def medir_consulta_cnpj(args, cnpjs: list) -> dict:
+    """Chama o consulta_cnpj em sequência, com o cliente compartilhado apontado para o servidor."""
+    with criar_servidor(args) as servidor:
+        cliente = criar_cliente(args, servidor)
+        configurar_cliente_padrao(cliente)
+        falhas = 0
+        inicio = time.perf_counter()
+        try:
+            for cnpj in cnpjs:
+                try:
+                    consulta_cnpj(cnpj)
+                except FalhaTransitoria:
+                    falhas += 1
+        finally:
+            segundos = time.perf_counter() - inicio
+            configurar_cliente_padrao(None)
+        return {
+            "cnpjs": len(cnpjs),
+            "segundos": round(segundos, 3),
+            "cnpjs_por_segundo": round(len(cnpjs) / segundos, 2),
+            "latencia_consulta_ms": percentis(cliente.latencias),
+            "falhas_transitorias": falhas,
+            "pico_rss_mb": pico_rss_mb(),
+            "servidor": resumo_servidor(servidor),
+        }
+
+
+def medir_memoria_registros(args, cnpjs: list) -> dict:
+    """
+    Bytes por linha de resultado mantida na memória: só a estrutura (os textos são os
+    mesmos nos dois formatos) e, no Registro, o total alocado ao classificar, com os
+    textos novos (telefones formatados, e-mails concatenados).
+    """
+    respostas = [
+        None
+        if sorteio(c, "nao_encontrado") < args.taxa_nao_encontrado
+        else gerar_empresa(c)
+        for c in cnpjs
+    ]
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    registros = [montar_registro(c, dados) for c, dados in zip(cnpjs, respostas)]
+    total = tracemalloc.get_traced_memory()[0] - inicio
+    tracemalloc.stop()
+
+    estrutura = sum(sys.getsizeof(r) for r in registros)
+    estrutura_dict = sum(sys.getsizeof(r.como_dict()) for r in registros)
+    return {
+        "linhas": len(registros),
+        "bytes_por_linha_registro": round(estrutura / len(registros), 1),
+        "bytes_por_linha_dict": round(estrutura_dict / len(registros), 1),
+        "bytes_por_linha_alocados": round(total / len(registros), 1),
+        "reducao_percentual": round(100 * (1 - estrutura / estrutura_dict), 1),
+    }
+
+
+def medir_validacao(args) -> dict:
+    """
+    Linhas por segundo da validação local, em lotes de TAMANHO_LOTE_LEITURA como no
+    processar_arquivo: normalização e dígitos verificadores, e o filtro de duplicados
+    com o conjunto na memória e depois de passar ao banco temporário.
+    """
+    # Três quartos de CNPJs distintos, metade formatada como vem das planilhas, e um
+    # quarto de repetições, embaralhados.
+    distintos = gerar_cnpjs(max(1, args.linhas_validacao * 3 // 4), args.semente + 1)
+    linhas = [
+        f"{c[:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:]}" if i % 2 else c
+        for i, c in enumerate(distintos)
+    ]
+    sorteador = random.Random(args.semente)
+    linhas += sorteador.choices(linhas, k=args.linhas_validacao - len(linhas))
+    sorteador.shuffle(linhas)
+    normalizados = []
+    inicio = time.perf_counter()
+    for linha in linhas:
+        normalizados.append(normalizar_cnpj(linha)[0])
+    duracao_normalizacao = time.perf_counter() - inicio
+
+    def medir_filtro(limite_memoria):
+        with FiltroDuplicados(limite_memoria=limite_memoria) as vistos:
+            inicio = time.perf_counter()
+            for i in range(0, len(normalizados), TAMANHO_LOTE_LEITURA):
+                vistos.marcar_varios(normalizados[i : i + TAMANHO_LOTE_LEITURA])
+            return time.perf_counter() - inicio
+
+    duracao_memoria = medir_filtro(len(normalizados) + 1)
+    duracao_banco = medir_filtro(1)
+    return {
+        "linhas": len(linhas),
+        "cnpjs_distintos": len(set(normalizados)),
+        "normalizacao_por_segundo": round(len(linhas) / duracao_normalizacao),
+        "duplicados_memoria_por_segundo": round(len(linhas) / duracao_memoria),
+        "duplicados_banco_por_segundo": round(len(linhas) / duracao_banco),
+        "total_por_segundo": round(
+            len(linhas) / (duracao_normalizacao + duracao_memoria)
+        ),
+    }
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmark_processamento",
+        description="Benchmark do processamento contra a API CNPJá simulada.",
+    )
+    parser.add_argument("--cnpjs", type=int, default=2000)
+    parser.add_argument(
+        "--cnpjs-consulta",
+        type=int,
+        default=200,
+        help="CNPJs da medição do consulta_cnpj isolado (padrão: 200).",
+    )
+    parser.add_argument("--simultaneas", type=int, default=8)
+    parser.add_argument(
+        "--consultas-por-minuto",
+        type=float,
+        default=0,
+        help="Limite de consultas por minuto; 0 para não limitar (padrão).",
+    )
+    parser.add_argument("--latencia", type=float, default=0.02)
+    parser.add_argument("--taxa-erro", type=float, default=0.02)
+    parser.add_argument("--taxa-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--taxa-nao-encontrado", type=float, default=0.05)
+    parser.add_argument("--tamanho-payload", type=int, default=2000)
+    parser.add_argument(
+        "--espera-base",
+        type=float,
+        default=0.05,
+        help="Espera do cliente antes da segunda tentativa (padrão: 0.05 s).",
+    )
+    parser.add_argument(
+        "--provedores",
+        help="Provedores simulados e as suas cotas por minuto, separados por vírgula "
+        "(por exemplo, cnpja:600,brasilapi:600,receitaws:0). Por padrão, só a CNPJá, "
+        "sem o roteador.",
+    )
+    parser.add_argument(
+        "--linhas-validacao",
+        type=int,
+        default=1_000_000,
+        help="Linhas da medição da validação local (padrão: 1000000).",
+    )
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="benchmark_resultado.json")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = criar_parser().parse_args(argv)
+    # As novas tentativas são esperadas; só os erros interessam aqui.
+    logging.basicConfig(level=logging.ERROR)
+
+    cnpjs = gerar_cnpjs(args.cnpjs + args.cnpjs_consulta, args.semente)
+    resultado = {
+        "gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": versao_do_codigo(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "configuracao": vars(args),
+        "processar_arquivo": medir_processar_arquivo(args, cnpjs[: args.cnpjs]),
+        "consulta_cnpj": medir_consulta_cnpj(args, cnpjs[args.cnpjs :]),
+        "memoria_registros": medir_memoria_registros(args, cnpjs[: args.cnpjs]),
+        "validacao": medir_validacao(args),
+    }
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    for medicao in ("processar_arquivo", "consulta_cnpj"):
+        dados = resultado[medicao]
+        print(
+            f"{medicao}: {dados['cnpjs_por_segundo']} CNPJs/s, "
+            f"latência p50/p95/p99 (ms) = {dados['latencia_consulta_ms']['p50']}/"
+            f"{dados['latencia_consulta_ms']['p95']}/"
+            f"{dados['latencia_consulta_ms']['p99']}, "
+            f"pico RSS = {dados['pico_rss_mb']} MB"
+        )
+    memoria = resultado["memoria_registros"]
+    print(
+        f"Memória por linha: {memoria['bytes_por_linha_registro']} bytes no Registro, "
+        f"{memoria['bytes_por_linha_dict']} bytes no dicionário "
+        f"({memoria['reducao_percentual']}% a menos)"
+    )
+    validacao = resultado["validacao"]
+    print(
+        f"Validação local: {validacao['total_por_segundo']} linhas/s "
+        f"(normalização {validacao['normalizacao_por_segundo']}/s, duplicados "
+        f"{validacao['duplicados_memoria_por_segundo']}/s na memória e "
+        f"{validacao['duplicados_banco_por_segundo']}/s no banco)"
+    )
+    conferencia = resultado["processar_arquivo"]["conferencia"]
+    print(
+        f"Conferência: {conferencia['corretos']} corretos, "
+        f"{conferencia['divergentes']} divergentes. Resultado em {args.saida}."
+    )
+    return 0 if not conferencia["divergentes"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
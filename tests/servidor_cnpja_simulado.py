@@ -0,0 +1,301 @@
+# tests/servidor_cnpja_simulado.py
+"""
+Servidor HTTP local que imita a API CNPJá (GET /office/{cnpj}), para medir o
+processamento sem depender da rede nem gastar a cota da API. Também imita a BrasilAPI
+e a ReceitaWS (ver FORMATOS), para testar o roteamento entre provedores.
+
+As respostas são determinísticas: os dados de cada CNPJ e as falhas de cada tentativa
+dependem só do CNPJ e do número da tentativa, então duas execuções com a mesma
+configuração recebem as mesmas respostas.
+
+Também pode ser rodado sozinho, para testar a interface gráfica ou a linha de comando:
+
+    python -m tests.servidor_cnpja_simulado --porta 8080 --latencia 0.2
+"""
+import argparse
+import json
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sorteio(cnpj: str, chave: str) -> float:
+    """Número entre 0 e 1 determinístico para um CNPJ e uma chave."""
+    return zlib.crc32(f"{chave}:{cnpj}".encode("ascii")) / 2**32
+
+
+def gerar_empresa(cnpj: str, tamanho_payload: int = 0) -> dict:
+    """
+    Monta o JSON da CNPJá de uma empresa fictícia.
+
+    Cerca de 30% são de desenvolvimento de software, 80% têm telefone e 60% têm
+    e-mail. Com 'tamanho_payload', atividades secundárias são acrescentadas até a
+    resposta ter aproximadamente esse número de bytes.
+    """
+    desenvolvedor = sorteio(cnpj, "desenvolvedor") < 0.3
+    empresa = {
+        "taxId": cnpj,
+        "alias": f"Empresa {cnpj}",
+        "company": {"name": f"Empresa {cnpj} LTDA"},
+        "phones": (
+            [{"area": "11", "number": cnpj[-8:]}]
+            if sorteio(cnpj, "telefone") < 0.8
+            else []
+        ),
+        "emails": (
+            [{"address": f"contato{cnpj}@exemplo.com.br"}]
+            if sorteio(cnpj, "email") < 0.6
+            else []
+        ),
+        "mainActivity": (
+            {"id": 6201501, "text": "Desenvolvimento de programas de computador"}
+            if desenvolvedor
+            else {"id": 4751201, "text": "Comércio varejista de informática"}
+        ),
+        "sideActivities": [],
+    }
+    atividade = {
+        "id": 8219999,
+        "text": "Preparação de documentos e apoio administrativo",
+    }
+    tamanho_atividade = len(json.dumps(atividade)) + 1
+    faltam = tamanho_payload - len(json.dumps(empresa))
+    empresa["sideActivities"] = [atividade] * max(0, faltam // tamanho_atividade)
+    return empresa
+
+
+def para_brasilapi(empresa: dict) -> dict:
+    """Os dados de gerar_empresa no formato da BrasilAPI (api/cnpj/v1)."""
+    telefones = [t["area"] + t["number"] for t in empresa["phones"]]
+    return {
+        "cnpj": empresa["taxId"],
+        "razao_social": empresa["company"]["name"],
+        "nome_fantasia": empresa["alias"],
+        "ddd_telefone_1": telefones[0] if telefones else "",
+        "ddd_telefone_2": "",
+        "email": empresa["emails"][0]["address"] if empresa["emails"] else None,
+        "cnae_fiscal": empresa["mainActivity"]["id"],
+        "cnae_fiscal_descricao": empresa["mainActivity"]["text"],
+        "cnaes_secundarios": [
+            {"codigo": a["id"], "descricao": a["text"]}
+            for a in empresa["sideActivities"]
+        ],
+    }
+
+
+def para_receitaws(empresa: dict) -> dict:
+    """Os dados de gerar_empresa no formato da ReceitaWS (v1/cnpj)."""
+    c = empresa["taxId"]
+
+    def atividade(a):
+        codigo = str(a["id"])
+        return {
+            "code": f"{codigo[:2]}.{codigo[2:4]}-{codigo[4]}-{codigo[5:]}",
+            "text": a["text"],
+        }
+
+    return {
+        "status": "OK",
+        "cnpj": f"{c[:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:]}",
+        "nome": empresa["company"]["name"],
+        "fantasia": empresa["alias"],
+        "telefone": " / ".join(
+            f"({t['area']}) {t['number'][:4]}-{t['number'][4:]}"
+            for t in empresa["phones"]
+        ),
+        "email": empresa["emails"][0]["address"] if empresa["emails"] else "",
+        "atividade_principal": [atividade(empresa["mainActivity"])],
+        "atividades_secundarias": [atividade(a) for a in empresa["sideActivities"]],
+    }
+
+
+# Formatos de API imitados: o caminho da consulta e a conversão dos dados.
+FORMATOS = {
+    "cnpja": ("office", None),
+    "brasilapi": ("api/cnpj/v1", para_brasilapi),
+    "receitaws": ("v1/cnpj", para_receitaws),
+}
+
+
+def status_esperado(cnpj: str, taxa_nao_encontrado: float = 0.0) -> str:
+    """O status que o processamento deve dar a um CNPJ respondido por este servidor."""
+    if sorteio(cnpj, "nao_encontrado") < taxa_nao_encontrado:
+        return "NaoEncontrado"
+    empresa = gerar_empresa(cnpj)
+    if not (empresa["phones"] or empresa["emails"]):
+        return "NaoEncontrado"
+    if empresa["mainActivity"]["id"] == 6201501:
+        return "Desenvolvedor"
+    return "NaoDesenvolvedor"
+
+
+class ServidorCNPJaSimulado:
+    """
+    Servidor da API simulada, rodando numa thread própria.
+
+    Cada tentativa de consulta a um CNPJ pode falhar com HTTP 503 ('taxa_erro') ou
+    HTTP 429 ('taxa_429', com o Retry-After informado). Uma fração 'taxa_nao_encontrado'
+    dos CNPJs não existe (HTTP 404; na ReceitaWS, HTTP 200 com status ERROR).
+
+    Os dados de cada CNPJ são os mesmos em todos os formatos, então status_esperado
+    vale para qualquer um deles.
+    """
+
+    def __init__(
+        self,
+        latencia: float = 0.0,
+        taxa_erro: float = 0.0,
+        taxa_429: float = 0.0,
+        retry_after: float = 1.0,
+        taxa_nao_encontrado: float = 0.0,
+        tamanho_payload: int = 0,
+        porta: int = 0,
+        formato: str = "cnpja",
+    ):
+        """
+        Args:
+            latencia (float): Segundos de espera antes de cada resposta.
+            taxa_erro (float): Fração das tentativas que recebem HTTP 503.
+            taxa_429 (float): Fração das tentativas que recebem HTTP 429.
+            retry_after (float): Valor do Retry-After das respostas 429, em segundos.
+            taxa_nao_encontrado (float): Fração dos CNPJs que recebem HTTP 404.
+            tamanho_payload (int): Tamanho aproximado, em bytes, de cada resposta 200.
+            porta (int): Porta local. Com 0, uma porta livre é escolhida.
+            formato (str): A API imitada, uma das chaves de FORMATOS.
+        """
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.taxa_nao_encontrado = taxa_nao_encontrado
+        self.tamanho_payload = tamanho_payload
+        self.formato = formato
+        self.caminho, self._converter = FORMATOS[formato]
+
+        self.respostas = Counter()
+        self.bytes_enviados = 0
+        self._tentativas = Counter()
+        self._lock = threading.Lock()
+        self._http = ThreadingHTTPServer(("127.0.0.1", porta), self._criar_handler())
+        self._http.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """O endereço a usar como url_base do ClienteCNPJa."""
+        host, porta = self._http.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    def iniciar(self):
+        """Começa a atender as requisições em segundo plano."""
+        self._thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """Para o servidor e libera a porta."""
+        self._http.shutdown()
+        self._http.server_close()
+
+    def responder(self, cnpj: str):
+        """
+        Decide a resposta de uma tentativa de consulta.
+
+        Returns:
+            tuple: O status HTTP, os cabeçalhos extras e o corpo (bytes).
+        """
+        with self._lock:
+            self._tentativas[cnpj] += 1
+            tentativa = self._tentativas[cnpj]
+        falha = sorteio(cnpj, f"tentativa{tentativa}")
+        if falha < self.taxa_erro:
+            return 503, {}, b""
+        if falha < self.taxa_erro + self.taxa_429:
+            return 429, {"Retry-After": str(int(self.retry_after))}, b""
+        cabecalhos = {"Content-Type": "application/json"}
+        if sorteio(cnpj, "nao_encontrado") < self.taxa_nao_encontrado:
+            if self.formato == "receitaws":
+                return 200, cabecalhos, b'{"status":"ERROR","message":"CNPJ invalido"}'
+            return 404, cabecalhos, b'{"message":"Not Found"}'
+        empresa = gerar_empresa(cnpj, self.tamanho_payload)
+        if self._converter is not None:
+            empresa = self._converter(empresa)
+        corpo = json.dumps(empresa, ensure_ascii=False).encode("utf-8")
+        return 200, cabecalhos, corpo
+
+    def _criar_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Cabeçalho e corpo vão em escritas separadas; sem isto, o Nagle somado
+            # ao ACK atrasado do cliente acrescenta ~40 ms a cada resposta.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                caminho, _, cnpj = self.path.strip("/").rpartition("/")
+                if caminho != servidor.caminho or not cnpj:
+                    status, cabecalhos, corpo = 404, {}, b""
+                else:
+                    if servidor.latencia:
+                        time.sleep(servidor.latencia)
+                    status, cabecalhos, corpo = servidor.responder(cnpj)
+                self.send_response(status)
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+                with servidor._lock:
+                    servidor.respostas[status] += 1
+                    servidor.bytes_enviados += len(corpo)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API CNPJá simulada, para testes.")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--latencia", type=float, default=0.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--taxa-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--taxa-nao-encontrado", type=float, default=0.0)
+    parser.add_argument("--tamanho-payload", type=int, default=0)
+    parser.add_argument("--formato", choices=list(FORMATOS), default="cnpja")
+    args = parser.parse_args()
+
+    servidor = ServidorCNPJaSimulado(
+        latencia=args.latencia,
+        taxa_erro=args.taxa_erro,
+        taxa_429=args.taxa_429,
+        retry_after=args.retry_after,
+        taxa_nao_encontrado=args.taxa_nao_encontrado,
+        tamanho_payload=args.tamanho_payload,
+        porta=args.porta,
+        formato=args.formato,
+    )
+    print(
+        f"API simulada em {servidor.url}/{servidor.caminho}/{{cnpj}} (Ctrl+C para sair)"
+    )
+    with servidor:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
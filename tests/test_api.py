@@ -0,0 +1,88 @@
+# tests/test_api.py
+"""
+Testes do ClienteCNPJa contra um servidor HTTP local que responde cada CNPJ com um
+status fixo: o que é "não encontrado", o que é falha passageira e o que interrompe o
+processamento.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.api import AcessoNegado, ClienteCNPJa, FalhaTransitoria
+from src.cache import AUSENTE, CacheRespostas
+
+# O status respondido para cada CNPJ (o último dígito não importa).
+RESPOSTAS = {
+    "11111111000111": 200,
+    "22222222000122": 404,
+    "33333333000133": 400,
+    "44444444000144": 422,
+    "55555555000155": 401,
+    "66666666000166": 402,
+    "77777777000177": 403,
+    "88888888000188": 409,
+    "99999999000199": 503,
+}
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        cnpj = self.path.rsplit("/", 1)[-1]
+        status = RESPOSTAS.get(cnpj, 404)
+        corpo = json.dumps({"taxId": cnpj} if status == 200 else {"message": "x"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(corpo.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def url_base():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Manipulador)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def cliente(url_base, tmp_path):
+    cache = CacheRespostas(str(tmp_path / "cache.sqlite3"))
+    cliente = ClienteCNPJa(
+        url_base=url_base, max_tentativas=2, espera_base=0, cache=cache
+    )
+    yield cliente
+    cliente.fechar()
+    cache.fechar()
+
+
+def test_resposta_200_devolve_os_dados(cliente):
+    assert cliente.consultar("11111111000111") == {"taxId": "11111111000111"}
+
+
+@pytest.mark.parametrize("cnpj", ["22222222000122", "33333333000133", "44444444000144"])
+def test_nao_encontrado_fica_no_cache(cliente, cnpj):
+    assert cliente.consultar(cnpj) is None
+    assert cliente.cache.obter(cnpj) is None
+
+
+@pytest.mark.parametrize("cnpj", ["55555555000155", "66666666000166", "77777777000177"])
+def test_chave_ou_cota_interrompem_sem_gravar_no_cache(cliente, cnpj):
+    with pytest.raises(AcessoNegado) as erro:
+        cliente.consultar(cnpj)
+    assert erro.value.status == RESPOSTAS[cnpj]
+    assert cliente.cache.obter(cnpj) is AUSENTE
+
+
+@pytest.mark.parametrize("cnpj", ["88888888000188", "99999999000199"])
+def test_outras_respostas_sao_falhas_passageiras(cliente, cnpj):
+    with pytest.raises(FalhaTransitoria) as erro:
+        cliente.consultar(cnpj)
+    assert erro.value.status == RESPOSTAS[cnpj]
+    assert cliente.cache.obter(cnpj) is AUSENTE
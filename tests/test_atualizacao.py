@@ -0,0 +1,159 @@
+# tests/test_atualizacao.py
+"""
+Testes do modo de atualização: a escolha dos CNPJs desatualizados dentro do orçamento,
+com os Desenvolvedores primeiro, a consulta sem o cache e o arquivo mudancas.ndjson.
+"""
+import json
+import time
+
+import pytest
+
+from src.armazenamento import BaseConsultados
+from src.atualizacao import selecionar_para_atualizar
+from src.main import processar_arquivo
+from tests.benchmark_processamento import gerar_cnpjs
+
+DIA = 24 * 60 * 60
+
+(
+    DEV_ANTIGO,
+    DEV_RECENTE,
+    NAO_DEV_MAIS_ANTIGO,
+    NAO_DEV_ANTIGO,
+    EM_DIA,
+    NOVO,
+) = gerar_cnpjs(6, semente=11)
+
+# Status e idade, em dias, da consulta anterior de cada CNPJ da base.
+ANTERIORES = {
+    DEV_ANTIGO: ("Desenvolvedor", 90),
+    DEV_RECENTE: ("Desenvolvedor", 40),
+    NAO_DEV_MAIS_ANTIGO: ("NaoDesenvolvedor", 300),
+    NAO_DEV_ANTIGO: ("NaoDesenvolvedor", 60),
+    EM_DIA: ("Desenvolvedor", 5),
+}
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    """Uma pasta de dados com a base de consultas feitas há 5 a 300 dias."""
+    agora = time.time()
+    with BaseConsultados(str(tmp_path / "consultados.sqlite3")) as base:
+        for cnpj, (status, dias) in ANTERIORES.items():
+            base.registrar(
+                {
+                    "cnpj": cnpj,
+                    "status": status,
+                    "nome": f"EMPRESA {cnpj[:4]}",
+                    "telefone": "(11) 12345678",
+                    "email": "",
+                    "consultado_em": agora - dias * DIA,
+                }
+            )
+    return tmp_path
+
+
+@pytest.fixture
+def entrada(tmp_path):
+    caminho = tmp_path / "lista.txt"
+    linhas = [NAO_DEV_MAIS_ANTIGO, EM_DIA, DEV_RECENTE, "123", NOVO]
+    linhas += [NAO_DEV_ANTIGO, DEV_ANTIGO, DEV_ANTIGO]
+    caminho.write_text("\n".join(linhas) + "\n", "utf-8")
+    return str(caminho)
+
+
+@pytest.mark.parametrize(
+    "orcamento, esperado",
+    [
+        (0, set()),
+        # Os Desenvolvedores primeiro, do mais antigo para o mais recente.
+        (1, {DEV_ANTIGO}),
+        (2, {DEV_ANTIGO, DEV_RECENTE}),
+        # Depois, as demais categorias, também do mais antigo para o mais recente.
+        (3, {DEV_ANTIGO, DEV_RECENTE, NAO_DEV_MAIS_ANTIGO}),
+        # Os em dia e os que nunca foram consultados não entram.
+        (10, {DEV_ANTIGO, DEV_RECENTE, NAO_DEV_MAIS_ANTIGO, NAO_DEV_ANTIGO}),
+    ],
+)
+def test_orcamento_e_prioridade(pasta, entrada, orcamento, esperado):
+    with BaseConsultados(str(pasta / "consultados.sqlite3")) as base:
+        assert selecionar_para_atualizar(entrada, base, 30 * DIA, orcamento) == esperado
+
+
+def test_sem_prioridade_vem_os_mais_antigos(pasta, entrada):
+    with BaseConsultados(str(pasta / "consultados.sqlite3")) as base:
+        assert selecionar_para_atualizar(entrada, base, 30 * DIA, 2, prioridade=()) == {
+            NAO_DEV_MAIS_ANTIGO,
+            DEV_ANTIGO,
+        }
+
+
+class ClienteFalso:
+    """Responde com outro telefone e guarda cada consulta com o seu ignorar_cache."""
+
+    def __init__(self):
+        self.consultas = {}
+
+    def consultar(self, cnpj, limitador=None, ignorar_cache=False):
+        self.consultas[cnpj] = ignorar_cache
+        telefones = [{"area": "11", "number": "12345678"}]
+        if cnpj != DEV_RECENTE:
+            telefones = [{"area": "21", "number": "87654321"}]
+        return {
+            "taxId": cnpj,
+            "alias": f"EMPRESA {cnpj[:4]}",
+            "phones": telefones,
+            "mainActivity": {"id": 6201501, "text": "Desenvolvimento de programas"},
+        }
+
+
+def test_processar_com_orcamento(pasta, entrada):
+    cliente = ClienteFalso()
+    contadores = processar_arquivo(
+        entrada,
+        cliente=cliente,
+        pasta_dados=str(pasta),
+        idade_maxima=30 * DIA,
+        orcamento_atualizacao=3,
+    )
+    # Os atualizados passam por cima do cache; o inédito, não.
+    assert cliente.consultas == {
+        DEV_ANTIGO: True,
+        DEV_RECENTE: True,
+        NAO_DEV_MAIS_ANTIGO: True,
+        NOVO: False,
+    }
+    # Fora do orçamento, NAO_DEV_ANTIGO sai como JaConsultado, junto com o em dia.
+    assert contadores["JaConsultado"] == 2
+    assert contadores["Desenvolvedor"] == 4
+
+    mudancas = [
+        json.loads(linha)
+        for linha in (pasta / "mudancas.ndjson").read_text("utf-8").splitlines()
+    ]
+    # DEV_RECENTE foi consultado de novo, mas nada mudou.
+    assert [m["cnpj"] for m in mudancas] == [NAO_DEV_MAIS_ANTIGO, DEV_ANTIGO]
+    assert mudancas[0]["mudancas"] == {
+        "telefone": ["(11) 12345678", "(21) 87654321"],
+        "status": ["NaoDesenvolvedor", "Desenvolvedor"],
+    }
+    assert mudancas[1]["mudancas"] == {"telefone": ["(11) 12345678", "(21) 87654321"]}
+    assert mudancas[1]["consultado_antes"] == pytest.approx(
+        time.time() - 90 * DIA, abs=60
+    )
+    with BaseConsultados(str(pasta / "consultados.sqlite3")) as base:
+        assert base.obter(NAO_DEV_MAIS_ANTIGO)["status"] == "Desenvolvedor"
+        assert base.obter(NAO_DEV_ANTIGO)["status"] == "NaoDesenvolvedor"
+
+
+def test_processar_sem_orcamento_atualiza_todos(pasta, entrada):
+    cliente = ClienteFalso()
+    processar_arquivo(
+        entrada, cliente=cliente, pasta_dados=str(pasta), idade_maxima=30 * DIA
+    )
+    assert {c for c, ignorar in cliente.consultas.items() if ignorar} == {
+        DEV_ANTIGO,
+        DEV_RECENTE,
+        NAO_DEV_MAIS_ANTIGO,
+        NAO_DEV_ANTIGO,
+    }
@@ -0,0 +1,61 @@
+# tests/test_cli.py
+"""
+Testes da validação das opções numéricas da linha de comando, que devem ser recusadas
+com uma mensagem do argparse em vez de um erro no meio do processamento.
+"""
+import pytest
+
+from src.cli import criar_parser
+
+
+@pytest.mark.parametrize(
+    "opcoes",
+    [
+        ["--simultaneas", "0"],
+        ["--simultaneas", "-1"],
+        ["--simultaneas", "dois"],
+        ["--consultas-por-minuto", "0"],
+        ["--consultas-por-minuto", "-5"],
+        ["--consultas-por-minuto", "nan"],
+        ["--rajada", "0"],
+        ["--intervalo-progresso", "0"],
+        ["--intervalo-metricas", "-1"],
+        ["--orcamento-atualizacao", "0"],
+        ["--atualizar-apos", "-1"],
+    ],
+)
+def test_processar_recusa_valores_invalidos(opcoes, capsys):
+    with pytest.raises(SystemExit) as saida:
+        criar_parser().parse_args(["processar", "lista.txt", *opcoes])
+    assert saida.value.code == 2
+    assert opcoes[0] in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    "opcoes", [["--fragmentos", "0"], ["--fragmentos", "2", "--processos", "0"]]
+)
+def test_fragmentar_recusa_valores_invalidos(opcoes):
+    with pytest.raises(SystemExit):
+        criar_parser().parse_args(
+            ["fragmentar", "lista.txt", "--pasta-trabalho", "p", *opcoes]
+        )
+
+
+def test_processar_aceita_valores_validos():
+    args = criar_parser().parse_args(
+        [
+            "processar",
+            "lista.txt",
+            "--simultaneas",
+            "4",
+            "--consultas-por-minuto",
+            "0.5",
+            "--atualizar-apos",
+            "0",
+        ]
+    )
+    assert (args.simultaneas, args.consultas_por_minuto, args.atualizar_apos) == (
+        4,
+        0.5,
+        0.0,
+    )
@@ -0,0 +1,113 @@
+# tests/test_concorrencia.py
+"""
+Testes do mapear_em_ordem: os resultados saem na ordem da entrada, só uma janela de
+2 * max_simultaneas itens é lida à frente, e o erro de uma chamada chega ao
+consumidor no Future do seu item, sem interromper os demais.
+"""
+import threading
+import time
+
+import pytest
+
+from src.concorrencia import mapear_em_ordem
+
+
+class Entrada:
+    """Itens de 0 a 'total' - 1, contando quantos já foram lidos."""
+
+    def __init__(self, total):
+        self.total = total
+        self.lidos = 0
+
+    def __iter__(self):
+        for item in range(self.total):
+            self.lidos += 1
+            yield item
+
+
+@pytest.mark.parametrize("max_simultaneas", [0, 1, 4])
+def test_resultados_na_ordem_da_entrada(max_simultaneas):
+    def funcao(item):
+        # Os primeiros demoram mais, para terminarem depois dos seguintes.
+        time.sleep((20 - item) / 2000 if max_simultaneas else 0)
+        return item * 10
+
+    resultados = [
+        (item, futuro.result())
+        for item, futuro in mapear_em_ordem(funcao, range(20), max_simultaneas)
+    ]
+    assert resultados == [(item, item * 10) for item in range(20)]
+
+
+def test_janela_e_chamadas_em_andamento():
+    max_simultaneas = 3
+    entrada = Entrada(50)
+    lock = threading.Lock()
+    em_andamento = maximo = 0
+
+    def funcao(item):
+        nonlocal em_andamento, maximo
+        with lock:
+            em_andamento += 1
+            maximo = max(maximo, em_andamento)
+        time.sleep(0.002)
+        with lock:
+            em_andamento -= 1
+        return item
+
+    consumidos = 0
+    for item, futuro in mapear_em_ordem(funcao, entrada, max_simultaneas):
+        consumidos += 1
+        # Nunca mais do que a janela à frente do consumidor.
+        assert entrada.lidos <= consumidos - 1 + 2 * max_simultaneas
+        assert futuro.result() == item
+    assert consumidos == 50
+    assert maximo <= max_simultaneas
+
+
+@pytest.mark.parametrize("max_simultaneas", [0, 2])
+def test_erro_de_um_item_fica_no_seu_futuro(max_simultaneas):
+    def funcao(item):
+        if item == 3:
+            raise RuntimeError("falha no item 3")
+        return item
+
+    resultados = []
+    for item, futuro in mapear_em_ordem(funcao, range(6), max_simultaneas):
+        try:
+            resultados.append(futuro.result())
+        except RuntimeError as e:
+            resultados.append(str(e))
+    assert resultados == [0, 1, 2, "falha no item 3", 4, 5]
+
+
+def test_filtro_dispensa_a_chamada():
+    chamados = []
+
+    def funcao(item):
+        chamados.append(item)
+        return item
+
+    resultados = [
+        futuro.result()
+        for _, futuro in mapear_em_ordem(
+            funcao, range(6), 2, filtro=lambda item: item % 2 == 0
+        )
+    ]
+    assert resultados == [0, None, 2, None, 4, None]
+    assert sorted(chamados) == [0, 2, 4]
+
+
+def test_interromper_o_consumo_cancela_o_que_nao_comecou():
+    entrada = Entrada(1000)
+    chamados = []
+    resultados = mapear_em_ordem(chamados.append, entrada, 2)
+    next(resultados)
+    resultados.close()
+    assert entrada.lidos == 4
+    assert len(chamados) <= 4
+
+
+def test_max_simultaneas_negativo():
+    with pytest.raises(ValueError):
+        list(mapear_em_ordem(str, range(3), -1))
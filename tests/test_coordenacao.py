@@ -0,0 +1,65 @@
+# tests/test_coordenacao.py
+"""
+Testes da execução coordenada entre instâncias: um CNPJ reservado por outra instância
+fica para o fim sem que uma queda faça a retomada pular linhas.
+"""
+import pytest
+
+from src.armazenamento import BaseConsultados
+from src.coordenacao import RESERVADO, Coordenador
+from src.main import processar_arquivo
+from tests.benchmark_processamento import gerar_cnpjs
+from tests.servidor_cnpja_simulado import gerar_empresa
+
+
+class Queda(BaseException):
+    """Simula o processo sendo derrubado no meio da execução."""
+
+
+class ClienteQueCai:
+    """Cliente falso, sem rede, que derruba a execução ao consultar 'queda'."""
+
+    def __init__(self, queda=None):
+        self.queda = queda
+
+    def consultar(self, cnpj, limitador=None, ignorar_cache=False):
+        if cnpj == self.queda:
+            raise Queda()
+        return gerar_empresa(cnpj)
+
+
+def ler_resultado(pasta, nome) -> list:
+    return (pasta / nome).read_text("utf-8-sig").splitlines()
+
+
+def test_queda_com_cnpj_reservado_por_outra_instancia(tmp_path):
+    cnpjs = gerar_cnpjs(40, semente=3)
+    entrada = tmp_path / "lista.txt"
+    entrada.write_text("\n".join(cnpjs) + "\n", "utf-8")
+    pasta = tmp_path / "dados"
+    pasta.mkdir()
+    caminho_base = str(pasta / "consultados.sqlite3")
+    BaseConsultados(caminho_base).fechar()
+
+    # A linha 20 está sendo consultada por outra instância quando a linha 18 derruba
+    # esta: as linhas 17 a 19 ainda estavam na janela de consultas.
+    outra = Coordenador(caminho_base, "OUTRA")
+    assert outra.reservar(cnpjs[20]) == RESERVADO
+    opcoes = dict(pasta_dados=str(pasta), max_simultaneas=4, id_execucao="EU")
+    with pytest.raises(Queda):
+        processar_arquivo(
+            str(entrada), cliente=ClienteQueCai(cnpjs[18]), coordenar=True, **opcoes
+        )
+    # A outra instância foi encerrada sem consultar: a reserva volta a valer.
+    outra.fechar()
+
+    contadores = processar_arquivo(
+        str(entrada), cliente=ClienteQueCai(), coordenar=True, retomar=True, **opcoes
+    )
+    assert sum(contadores.values()) == 40
+
+    unica = tmp_path / "unica"
+    processar_arquivo(str(entrada), cliente=ClienteQueCai(), pasta_dados=str(unica))
+    assert ler_resultado(pasta, "resultado_EU.csv") == ler_resultado(
+        unica, "resultado_final.csv"
+    )
@@ -0,0 +1,152 @@
+# tests/test_diario.py
+"""
+Testes do diário de execução e do --retomar: a execução retomada dá o mesmo resultado
+de uma execução sem queda, não consulta de novo as linhas do diário e descarta a
+última linha do diário, se ela tiver ficado pela metade.
+"""
+import json
+
+import pytest
+
+from src.diario import Diario
+from src.main import processar_arquivo
+from tests.benchmark_processamento import gerar_cnpjs
+from tests.servidor_cnpja_simulado import gerar_empresa
+
+CNPJS = gerar_cnpjs(30, semente=5)
+
+# Com inválidos, repetidos e uma linha em branco, que também vão para o diário.
+LINHAS = CNPJS[:10] + ["123", CNPJS[2], ""] + CNPJS[10:]
+
+
+class Queda(BaseException):
+    """Simula o processo sendo derrubado no meio da execução."""
+
+
+class ClienteFalso:
+    """Cliente sem rede que guarda os CNPJs consultados e cai ao consultar 'queda'."""
+
+    def __init__(self, queda=None):
+        self.queda = queda
+        self.consultados = []
+
+    def consultar(self, cnpj, limitador=None, ignorar_cache=False):
+        if cnpj == self.queda:
+            raise Queda()
+        self.consultados.append(cnpj)
+        return gerar_empresa(cnpj)
+
+
+@pytest.fixture
+def entrada(tmp_path):
+    caminho = tmp_path / "lista.txt"
+    caminho.write_text("\n".join(LINHAS) + "\n", "utf-8")
+    return str(caminho)
+
+
+def processar(entrada, pasta, cliente, **opcoes):
+    return processar_arquivo(
+        entrada, cliente=cliente, pasta_dados=str(pasta), max_simultaneas=2, **opcoes
+    )
+
+
+def derrubar(entrada, pasta, queda):
+    with pytest.raises(Queda):
+        processar(entrada, pasta, ClienteFalso(queda))
+    return pasta / "diario_execucao.ndjson"
+
+
+def concluidos(diario) -> set:
+    linhas = diario.read_text("utf-8").splitlines()[1:]
+    return {e["cnpj"] for e in map(json.loads, linhas) if "registro" in e}
+
+
+def test_retomada_da_o_mesmo_resultado(entrada, tmp_path):
+    unica = tmp_path / "unica"
+    esperado = processar(entrada, unica, ClienteFalso())
+
+    pasta = tmp_path / "dados"
+    diario = derrubar(entrada, pasta, queda=CNPJS[20])
+    ja_no_diario = concluidos(diario)
+    assert CNPJS[0] in ja_no_diario and CNPJS[20] not in ja_no_diario
+
+    cliente = ClienteFalso()
+    assert processar(entrada, pasta, cliente, retomar=True) == esperado
+    assert (pasta / "resultado_final.csv").read_text("utf-8-sig") == (
+        unica / "resultado_final.csv"
+    ).read_text("utf-8-sig")
+    # As linhas do diário não são consultadas de novo.
+    assert not ja_no_diario & set(cliente.consultados)
+    assert CNPJS[20] in cliente.consultados
+    # Concluída, a execução apaga o diário.
+    assert not diario.exists()
+
+
+def test_retomada_com_a_ultima_linha_pela_metade(entrada, tmp_path):
+    unica = tmp_path / "unica"
+    esperado = processar(entrada, unica, ClienteFalso())
+
+    pasta = tmp_path / "dados"
+    diario = derrubar(entrada, pasta, queda=CNPJS[15])
+    linhas = diario.read_text("utf-8").splitlines(keepends=True)
+    # A queda interrompeu a gravação da última entrada, de um CNPJ já consultado.
+    perdida = json.loads(linhas[-1])
+    assert perdida["cnpj"] == CNPJS[14]
+    diario.write_text("".join(linhas[:-1]) + linhas[-1][:12], "utf-8")
+
+    cliente = ClienteFalso()
+    contadores = processar(entrada, pasta, cliente, retomar=True)
+    # A consulta já está na base: não é repetida, e o CNPJ sai como JaConsultado,
+    # com os mesmos dados.
+    assert CNPJS[14] not in cliente.consultados
+    status = perdida["registro"]["status"]
+    esperado[status] -= 1
+    esperado["JaConsultado"] += 1
+    assert contadores == esperado
+    linhas_unica = (unica / "resultado_final.csv").read_text("utf-8-sig").splitlines()
+    indice = next(
+        i for i, linha in enumerate(linhas_unica) if linha.startswith(CNPJS[14])
+    )
+    linhas_unica[indice] = linhas_unica[indice].rsplit(",", 1)[0] + ",JaConsultado"
+    assert sorted(
+        (pasta / "resultado_final.csv").read_text("utf-8-sig").splitlines()
+    ) == sorted(linhas_unica)
+
+
+def test_ler_para_na_linha_incompleta_e_continuar_a_descarta(entrada, tmp_path):
+    caminho = str(tmp_path / "diario.ndjson")
+    diario = Diario(caminho, tamanho_lote=1)
+    diario.iniciar(entrada)
+    diario.registrar_duplicado(1, CNPJS[1])
+    diario.registrar_pendente(2, CNPJS[2])
+    diario.fechar()
+    with open(caminho, "a", encoding="utf-8") as f:
+        f.write('{"linha": 3, "fal')
+
+    retomado = Diario(caminho)
+    assert list(retomado.ler(entrada)) == [
+        {"linha": 1, "duplicado": CNPJS[1]},
+        {"linha": 2, "pendente": CNPJS[2]},
+    ]
+    retomado.continuar()
+    retomado.registrar_falha(3, CNPJS[3])
+    retomado.fechar()
+    with open(caminho, encoding="utf-8") as f:
+        assert [json.loads(linha) for linha in f][1:] == [
+            {"linha": 1, "duplicado": CNPJS[1]},
+            {"linha": 2, "pendente": CNPJS[2]},
+            {"linha": 3, "falha": CNPJS[3]},
+        ]
+
+
+def test_diario_de_outro_arquivo(entrada, tmp_path):
+    caminho = str(tmp_path / "diario.ndjson")
+    diario = Diario(caminho)
+    diario.iniciar(entrada)
+    diario.fechar()
+    outra = tmp_path / "outra.txt"
+    outra.write_text(CNPJS[0] + "\n", "utf-8")
+    assert Diario(caminho).existe_para(entrada)
+    assert not Diario(caminho).existe_para(str(outra))
+    with pytest.raises(ValueError):
+        list(Diario(caminho).ler(str(outra)))
@@ -0,0 +1,71 @@
+# tests/test_exportadores.py
+"""
+Testes do formato Parquet: o pyarrow só é importado quando o formato é pedido, e a
+falta dele é um ValueError com a instrução de instalação, que o processamento mostra
+como um ErroProcessamento.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.exportadores import criar_exportadores
+from src.main import ErroProcessamento, processar_arquivo
+
+
+def test_importar_sem_carregar_o_pyarrow():
+    codigo = "import sys, src.main; sys.exit('pyarrow' in sys.modules)"
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, "-c", codigo], cwd=raiz).returncode == 0
+
+
+def test_parquet_sem_pyarrow(monkeypatch, tmp_path):
+    # Um None em sys.modules faz o import falhar com ImportError.
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    with pytest.raises(ValueError, match="pip install pyarrow"):
+        criar_exportadores(["ndjson", "parquet"])
+
+    entrada = tmp_path / "lista.txt"
+    entrada.write_text("11222333000181\n", "utf-8")
+    with pytest.raises(ErroProcessamento) as erro:
+        processar_arquivo(
+            str(entrada), pasta_dados=str(tmp_path / "dados"), formatos=["parquet"]
+        )
+    assert erro.value.titulo == "Formato Indisponível"
+    assert "pip install pyarrow" in str(erro.value)
+
+
+def test_parquet_com_pyarrow(tmp_path):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    (exportador,) = criar_exportadores(["parquet"])
+    parciais = []
+    for status, linhas in [
+        ("Desenvolvedor", [("11222333000181", "ACME", "(11) 1 / (11) 2", "", "D")]),
+        ("Invalido", [("123", "", "", "", "Invalido")]),
+    ]:
+        caminho = str(tmp_path / f"{status}.parquet")
+        parcial = exportador.abrir_parcial(caminho)
+        for linha in linhas:
+            parcial.escrever(linha)
+        parcial.fechar()
+        parciais.append(caminho)
+    destino = str(tmp_path / "resultado.parquet")
+    exportador.juntar(parciais, destino)
+    assert pyarrow_parquet.read_table(destino).to_pylist() == [
+        {
+            "cnpj": "11222333000181",
+            "nome": "ACME",
+            "telefones": ["(11) 1", "(11) 2"],
+            "emails": [],
+            "status": "D",
+        },
+        {
+            "cnpj": "123",
+            "nome": "",
+            "telefones": [],
+            "emails": [],
+            "status": "Invalido",
+        },
+    ]
@@ -0,0 +1,128 @@
+# tests/test_fragmentos.py
+"""
+Testes da divisão em fragmentos: dividir, processar cada fragmento com a base local da
+Receita e juntar dá o mesmo resultado de uma execução única com a lista inteira.
+"""
+import json
+import os
+import random
+import sys
+
+import pytest
+
+import run
+from src import fragmentos
+from src.main import processar_arquivo
+from src.receita import BaseReceita
+
+PASTA_DADOS_RECEITA = os.path.join(os.path.dirname(__file__), "dados_receita")
+
+LINHAS = [
+    "11.222.333/0001-81",
+    "11222333000262",
+    "33000167000101",
+    "60701190000104",
+    "000000000191",
+    "45678901000175",  # fora da base
+    "11222333000182",  # dígito verificador errado
+    "1122233300018",  # dígitos de menos
+    "11222333000181",  # repetido
+    "33.000.167/0001-01",  # repetido, com pontuação
+]
+
+
+def importar_base(caminho: str) -> str:
+    with BaseReceita(caminho) as base:
+        for nome in sorted(os.listdir(PASTA_DADOS_RECEITA)):
+            base.importar(os.path.join(PASTA_DADOS_RECEITA, nome))
+    return caminho
+
+
+@pytest.mark.parametrize(
+    "opcoes",
+    [
+        [],
+        # Com --coordenar, o CSV do fragmento teria o nome da execução.
+        ["--coordenar", "--exportar", "ndjson"],
+    ],
+)
+def test_dividir_processar_e_juntar_como_execucao_unica(tmp_path, opcoes):
+    receita = importar_base(str(tmp_path / "receita.sqlite3"))
+    linhas = LINHAS * 2
+    random.Random(7).shuffle(linhas)
+    entrada = tmp_path / "lista.txt"
+    entrada.write_text("\n".join(linhas) + "\n", "utf-8")
+
+    unica = tmp_path / "unica"
+    with BaseReceita(receita) as base:
+        esperado = processar_arquivo(str(entrada), cliente=base, pasta_dados=str(unica))
+
+    trabalho = str(tmp_path / "trabalho")
+    fragmentada = str(tmp_path / "fragmentada")
+    manifesto = fragmentos.dividir(str(entrada), trabalho, 3, pasta_dados=fragmentada)
+    # Com 3 fragmentos, mais de um recebe CNPJs.
+    assert sum(1 for n in manifesto["linhas"] if n) > 1
+    assert fragmentos.executar(trabalho, opcoes=["--receita", receita] + opcoes) == []
+    contadores = fragmentos.juntar(trabalho, pasta_dados=fragmentada)
+
+    assert contadores == esperado
+    assert (tmp_path / "fragmentada" / "resultado_final.csv").read_text(
+        "utf-8-sig"
+    ) == (unica / "resultado_final.csv").read_text("utf-8-sig")
+    ndjson = tmp_path / "fragmentada" / "resultado_final.ndjson"
+    if "ndjson" in opcoes:
+        # Gerado de novo a partir das linhas juntadas, na mesma ordem do CSV.
+        cnpjs = [
+            json.loads(linha)["cnpj"]
+            for linha in ndjson.read_text("utf-8").splitlines()
+        ]
+        csv_final = (unica / "resultado_final.csv").read_text("utf-8-sig").splitlines()
+        assert cnpjs == [linha.split(",")[0] for linha in csv_final[1:]]
+    else:
+        assert not ndjson.exists()
+
+
+def test_juntar_fragmentos_sem_linhas_originais(tmp_path):
+    """Uma divisão feita antes das linhas originais ainda é juntada, fragmento a fragmento."""
+    trabalho = str(tmp_path / "trabalho")
+    entrada = tmp_path / "lista.txt"
+    entrada.write_text("11222333000182\n1122233300018\n", "utf-8")
+    fragmentos.dividir(str(entrada), trabalho, 1, pasta_dados=str(tmp_path / "d"))
+    pasta = fragmentos.pasta_fragmento(trabalho, 0)
+    os.remove(os.path.join(pasta, fragmentos.LINHAS_ORIGINAIS))
+    with open(os.path.join(pasta, "resultado_final.csv"), "w", encoding="utf-8") as f:
+        f.write("cnpj,nome,telefone,email,status\n1122233300018,,,,Invalido\n")
+    fragmentos.gravar_json(os.path.join(pasta, fragmentos.MARCADOR), {"Invalido": 1})
+    assert fragmentos.juntar(trabalho, pasta_dados=str(tmp_path / "d")) == {
+        "Invalido": 1
+    }
+    assert (tmp_path / "d" / "resultado_final.csv").read_text(
+        "utf-8-sig"
+    ).splitlines() == ["cnpj,nome,telefone,email,status", "1122233300018,,,,Invalido"]
+
+
+def test_comando_fragmento_no_executavel(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "frozen", True, raising=False)
+    comando = fragmentos.comando_fragmento(str(tmp_path), 0)
+    assert comando[:2] == [sys.executable, "processar"]
+
+
+def test_comando_fragmento_no_interpretador(tmp_path):
+    comando = fragmentos.comando_fragmento(str(tmp_path), 0)
+    assert comando[:4] == [sys.executable, "-m", "src", "processar"]
+
+
+def test_executavel_aceita_subcomandos(tmp_path):
+    codigo = run.main(
+        ["processar", str(tmp_path / "nao_existe.txt"), "--pasta-dados", str(tmp_path)]
+    )
+    assert codigo == 1
+
+
+def test_executavel_chama_freeze_support(tmp_path, monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(
+        run.multiprocessing, "freeze_support", lambda: chamadas.append(True)
+    )
+    run.main(["reclassificar", "--pasta-dados", str(tmp_path)])
+    assert chamadas == [True]
@@ -0,0 +1,119 @@
+# tests/test_limitador.py
+"""
+Testes do limitador de taxa (token bucket), com um relógio controlado pelo teste: a
+reposição dos tokens, a rajada, o recuo a cada HTTP 429 e a recuperação da taxa.
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import src.limitador
+from src.limitador import LimitadorTaxa, interpretar_retry_after
+
+
+class Relogio:
+    """Relógio que só anda quando o teste manda."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio():
+    return Relogio()
+
+
+def test_rajada_e_reposicao(relogio):
+    limitador = LimitadorTaxa(taxa=2, rajada=3, relogio=relogio)
+    assert [limitador.tentar_adquirir() for _ in range(3)] == [0, 0, 0]
+    # Sem tokens: meio segundo até o próximo, a 2 por segundo.
+    assert limitador.tentar_adquirir() == pytest.approx(0.5)
+    relogio.agora += 0.25
+    assert limitador.tentar_adquirir() == pytest.approx(0.25)
+    relogio.agora += 0.25
+    assert limitador.tentar_adquirir() == 0
+    # Parado por muito tempo, acumula só até a rajada.
+    relogio.agora += 60
+    assert [limitador.tentar_adquirir() for _ in range(3)] == [0, 0, 0]
+    assert limitador.tentar_adquirir() > 0
+
+
+def test_adquirir_espera_o_token(relogio, monkeypatch):
+    esperas = []
+
+    def dormir(segundos):
+        esperas.append(segundos)
+        relogio.agora += segundos
+
+    monkeypatch.setattr(src.limitador.time, "sleep", dormir)
+    limitador = LimitadorTaxa(taxa=0.5, rajada=1, relogio=relogio)
+    limitador.adquirir()
+    limitador.adquirir()
+    assert esperas == [pytest.approx(2.0)]
+
+
+def test_429_recua_e_suspende_pelo_retry_after(relogio):
+    limitador = LimitadorTaxa(taxa=1, rajada=2, relogio=relogio)
+    limitador.registrar_limite(retry_after=10)
+    assert limitador.taxa_atual == 0.5
+    assert limitador.tentar_adquirir() == pytest.approx(10)
+    relogio.agora += 9
+    assert limitador.tentar_adquirir() == pytest.approx(1)
+    # Passada a suspensão, os tokens voltam na taxa reduzida, sem rajada acumulada.
+    relogio.agora += 1
+    assert limitador.tentar_adquirir() == pytest.approx(2)
+    relogio.agora += 2
+    assert limitador.tentar_adquirir() == 0
+
+
+def test_429_sem_retry_after_e_piso_da_taxa(relogio):
+    limitador = LimitadorTaxa(
+        taxa=1, taxa_minima=0.3, espera_padrao_429=60, relogio=relogio
+    )
+    limitador.registrar_limite()
+    assert limitador.tentar_adquirir() == pytest.approx(60)
+    limitador.registrar_limite()
+    limitador.registrar_limite()
+    assert limitador.taxa_atual == 0.3
+    # Um 429 durante a suspensão não a encurta.
+    limitador.registrar_limite(retry_after=1)
+    assert limitador.tentar_adquirir() == pytest.approx(60)
+
+
+def test_recuperacao_gradual_ate_a_taxa_configurada(relogio):
+    limitador = LimitadorTaxa(
+        taxa=1, fator_recuo=0.5, fator_recuperacao=2, relogio=relogio
+    )
+    limitador.registrar_limite(retry_after=0)
+    limitador.registrar_limite(retry_after=0)
+    assert limitador.taxa_atual == 0.25
+    limitador.registrar_sucesso()
+    assert limitador.taxa_atual == 0.5
+    limitador.registrar_sucesso()
+    limitador.registrar_sucesso()
+    assert limitador.taxa_atual == 1
+
+
+@pytest.mark.parametrize(
+    "argumentos", [{"taxa": 0}, {"taxa": -1}, {"taxa": 1, "rajada": 0}]
+)
+def test_parametros_invalidos(argumentos):
+    with pytest.raises(ValueError):
+        LimitadorTaxa(**argumentos)
+
+
+def test_interpretar_retry_after():
+    assert interpretar_retry_after("30") == 30.0
+    assert interpretar_retry_after(" 5 ") == 5.0
+    daqui_a_pouco = datetime.now(timezone.utc) + timedelta(seconds=120)
+    assert interpretar_retry_after(
+        format_datetime(daqui_a_pouco, usegmt=True)
+    ) == pytest.approx(120, abs=2)
+    # Uma data que já passou não dá espera negativa.
+    assert interpretar_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    for valor in (None, "", "amanhã", "-3"):
+        assert interpretar_retry_after(valor) is None
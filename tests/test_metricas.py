@@ -0,0 +1,51 @@
+# tests/test_metricas.py
+"""
+Testes das métricas por etapa do processamento: a validação do arquivo e a busca na
+base de consultados são medidas separadamente.
+"""
+from src.main import processar_arquivo
+from src.metricas import Metricas
+
+CNPJS = ["11222333000181", "33000167000101", "60701190000104", "123"]
+
+
+class ClienteLocal:
+    """Cliente falso, sem rede, que conhece qualquer CNPJ."""
+
+    consulta_local = True
+
+    def consultar(self, cnpj, limitador=None, ignorar_cache=False):
+        return {
+            "taxId": cnpj,
+            "alias": f"EMPRESA {cnpj}",
+            "emails": [{"address": f"{cnpj}@exemplo.com.br"}],
+            "mainActivity": {"id": 6201501, "text": "Desenvolvimento de programas"},
+        }
+
+
+def processar(tmp_path) -> dict:
+    entrada = tmp_path / "lista.txt"
+    entrada.write_text("\n".join(CNPJS) + "\n", "utf-8")
+    metricas = Metricas()
+    processar_arquivo(
+        str(entrada),
+        cliente=ClienteLocal(),
+        pasta_dados=str(tmp_path / "dados"),
+        metricas=metricas,
+    )
+    return metricas.instantaneo()["etapas"]
+
+
+def test_validacao_e_consulta_base_sao_etapas_separadas(tmp_path):
+    etapas = processar(tmp_path)
+    assert etapas["validacao"]["contagem"] == 1
+    # Uma busca em lote e um status por CNPJ válido.
+    assert etapas["consulta_base"]["contagem"] == 1 + 3
+    assert etapas["classificacao"]["contagem"] == 3
+
+
+def test_consulta_base_dos_ja_consultados(tmp_path):
+    processar(tmp_path)
+    etapas = processar(tmp_path)
+    assert etapas["consulta_base"]["contagem"] == 1 + 3
+    assert "classificacao" not in etapas
@@ -0,0 +1,183 @@
+# tests/test_parser.py
+"""
+Testes do motor de regras de classificação: o RegrasClassificacao compilado e o
+classificar_lote devem dar o mesmo resultado que testar as regras uma a uma, como o
+parser fazia antes, numa tabela fixa de atividades.
+"""
+import pytest
+
+from src.parser import (
+    REGRAS_PADRAO,
+    RegrasClassificacao,
+    classificar_empresa,
+    classificar_lote,
+)
+from src.validacao import somente_digitos
+
+REGRAS = {
+    "padrao": "Outros",
+    "categorias": [
+        {
+            "nome": "Desenvolvedor",
+            "cnaes": ["6201-5/01", "6202-3/00", 6203100],
+            "palavras": ["desenvolvimento de programas", "software"],
+        },
+        {
+            "nome": "Consultoria",
+            "cnaes": ["6204-0/00", "70.2"],
+            "palavras": ["consultoria em gestão", "consultoria"],
+        },
+        {
+            "nome": "Hospedagem",
+            "cnaes": ["6311-9", "6201-5/01"],
+            "palavras": ["hospedagem na internet", "serviços de informação"],
+        },
+        {"nome": "Agro", "cnaes": ["01"], "palavras": ["cultivo"]},
+    ],
+}
+
+
+def _atividade(codigo, texto=""):
+    return {"id": codigo, "text": texto}
+
+
+def _empresa(principal=None, secundarias=None):
+    return {
+        "taxId": "11222333000181",
+        "mainActivity": principal,
+        "sideActivities": secundarias,
+    }
+
+
+# (descrição, dados da API, categoria esperada com REGRAS)
+TABELA = [
+    ("código exato", _empresa(_atividade(6201501, "Outra coisa")), "Desenvolvedor"),
+    (
+        "código exato em texto",
+        _empresa(_atividade("6204-0/00", "Outra coisa")),
+        "Consultoria",
+    ),
+    ("código exato inteiro na regra", _empresa(_atividade(6203100)), "Desenvolvedor"),
+    ("prefixo do grupo", _empresa(_atividade(7020400, "Sem texto")), "Consultoria"),
+    ("prefixo da classe", _empresa(_atividade("6311-9/00")), "Hospedagem"),
+    ("prefixo com zero à esquerda", _empresa(_atividade(111301)), "Agro"),
+    ("fora do prefixo", _empresa(_atividade(7119701, "Engenharia")), "Outros"),
+    (
+        "palavra acentuada",
+        _empresa(_atividade(0, "Atividades de CONSULTORIA EM GESTÃO empresarial")),
+        "Consultoria",
+    ),
+    (
+        "palavra acentuada nas secundárias",
+        _empresa(
+            _atividade(4751201, "Comércio varejista"),
+            [
+                _atividade(
+                    0, "Portais, provedores de conteúdo e outros SERVIÇOS DE INFORMAÇÃO"
+                )
+            ],
+        ),
+        "Hospedagem",
+    ),
+    (
+        "palavra de menor prioridade contém a de maior",
+        _empresa(_atividade(0, "Consultoria e licenciamento de software")),
+        "Desenvolvedor",
+    ),
+    (
+        "código mais prioritário nas secundárias",
+        _empresa(_atividade(6311900), [_atividade("6202-3/00")]),
+        "Desenvolvedor",
+    ),
+    (
+        "código repetido fica com a categoria mais prioritária",
+        _empresa(_atividade("6201-5/01")),
+        "Desenvolvedor",
+    ),
+    (
+        "palavra mais prioritária que o código",
+        _empresa(_atividade(6311900, "Desenvolvimento de programas sob encomenda")),
+        "Desenvolvedor",
+    ),
+    ("sem nenhuma regra", _empresa(_atividade(4751201, "Comércio")), "Outros"),
+    ("sem atividades", _empresa(), "Outros"),
+    ("atividade sem código", _empresa({"text": "Comércio"}), "Outros"),
+]
+
+
+def categoria_por_regra(regras: dict, data: dict) -> str:
+    """
+    A classificação de referência: testa as categorias uma a uma, em ordem, e cada
+    código ou palavra de cada uma contra cada atividade.
+    """
+    atividades = [data.get("mainActivity") or {}]
+    atividades += data.get("sideActivities") or []
+    codigos = []
+    for atividade in atividades:
+        digitos = somente_digitos(str(atividade.get("id", "")))
+        codigos.append(digitos.zfill(7) if digitos else None)
+    textos = [str(a.get("text", "")).lower() for a in atividades]
+    for categoria in regras["categorias"]:
+        for valor in categoria.get("cnaes", []):
+            regra = somente_digitos(str(valor))
+            if type(valor) is int:
+                regra = regra.zfill(7)
+            for codigo in codigos:
+                if codigo and (codigo == regra or codigo.startswith(regra)):
+                    return categoria["nome"]
+        for palavra in categoria.get("palavras", []):
+            if any(palavra.lower() in texto for texto in textos):
+                return categoria["nome"]
+    return regras["padrao"]
+
+
+@pytest.mark.parametrize(
+    "data, esperado", [caso[1:] for caso in TABELA], ids=[caso[0] for caso in TABELA]
+)
+def test_categoria_igual_a_das_regras_uma_a_uma(data, esperado):
+    regras = RegrasClassificacao.de_dicionario(REGRAS)
+    assert categoria_por_regra(REGRAS, data) == esperado
+    assert regras.categoria(data) == esperado
+
+
+def test_classificar_lote_igual_a_das_regras_uma_a_uma():
+    regras = RegrasClassificacao.de_dicionario(REGRAS)
+    dados = [caso[1] for caso in TABELA]
+    resultado = list(classificar_lote(dados, regras))
+    assert [categoria for categoria, _ in resultado] == [
+        categoria_por_regra(REGRAS, data) for data in dados
+    ]
+    assert all(registro.status == categoria for categoria, registro in resultado)
+
+
+def test_regras_padrao_mantem_a_classificacao_antiga():
+    # Antes do motor de regras, só a palavra "desenvolvimento" contava.
+    for _, data, _ in TABELA:
+        textos = [data.get("mainActivity") or {}] + (data.get("sideActivities") or [])
+        antiga = any(
+            "desenvolvimento" in str(a.get("text", "")).lower() for a in textos
+        )
+        categoria = categoria_por_regra(REGRAS_PADRAO, data)
+        assert categoria == classificar_empresa(data)[0]
+        if antiga:
+            assert categoria == "Desenvolvedor"
+
+
+def test_sem_dados_e_nao_encontrado():
+    assert list(classificar_lote([None, {}])) == [
+        ("NaoEncontrado", None),
+        ("NaoEncontrado", None),
+    ]
+
+
+@pytest.mark.parametrize(
+    "categorias",
+    [
+        [{"cnaes": ["6201-5/01"]}],
+        [{"nome": "X", "cnaes": ["sem código"]}],
+        [{"nome": "X", "cnaes": ["6201-5/01-9"]}],
+    ],
+)
+def test_regras_invalidas(categorias):
+    with pytest.raises(ValueError):
+        RegrasClassificacao(categorias)
@@ -0,0 +1,90 @@
+# tests/test_perfil.py
+"""
+Testes do perfil de inicialização: o JSON com os marcos e o tempo de importação de
+cada módulo, e a devolução dos carregadores originais quando a medição termina.
+"""
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from src.perfil import PerfilInicializacao, _CarregadorMedido
+
+
+@pytest.fixture
+def pacote(tmp_path, monkeypatch):
+    """Um pacote novo, ainda não importado, em que 'lento' importa 'interno'."""
+    pasta = tmp_path / "pacote_perfil"
+    pasta.mkdir()
+    (pasta / "__init__.py").write_text("", "utf-8")
+    (pasta / "interno.py").write_text("import time\ntime.sleep(0.02)\n", "utf-8")
+    (pasta / "lento.py").write_text(
+        "import time\nfrom . import interno\ntime.sleep(0.02)\n", "utf-8"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "pacote_perfil"
+    for nome in [n for n in sys.modules if n.startswith("pacote_perfil")]:
+        del sys.modules[nome]
+
+
+def test_grava_marcos_e_modulos(pacote, tmp_path):
+    caminho = tmp_path / "perfil.json"
+    perfil = PerfilInicializacao(str(caminho))
+    perfil.iniciar()
+    __import__(f"{pacote}.lento")
+    perfil.marcar("interface_importada")
+    perfil.gravar()
+
+    dados = json.loads(caminho.read_text("utf-8"))
+    assert list(dados["marcos_ms"]) == ["interface_importada"]
+    assert dados["executavel"] is False
+    assert dados["janela_visivel_em"] is None
+    modulos = {m["modulo"]: m for m in dados["modulos"]}
+    lento, interno = modulos[f"{pacote}.lento"], modulos[f"{pacote}.interno"]
+    assert interno["proprio_ms"] >= 20
+    # O total de 'lento' inclui o 'interno'; o próprio, não.
+    assert lento["total_ms"] >= lento["proprio_ms"] + interno["total_ms"] - 1
+    assert 20 <= lento["proprio_ms"] < lento["total_ms"]
+    assert dados["modulos_importados"] >= 3
+
+
+def test_parar_devolve_os_carregadores(pacote):
+    perfil = PerfilInicializacao("nao_gravado.json")
+    perfil.iniciar()
+    modulo = __import__(f"{pacote}.lento", fromlist=["lento"])
+    assert isinstance(modulo.__spec__.loader, _CarregadorMedido)
+    perfil.parar()
+    assert perfil._localizador not in sys.meta_path
+    for nome in (pacote, f"{pacote}.lento", f"{pacote}.interno"):
+        modulo = sys.modules[nome]
+        assert not isinstance(modulo.__spec__.loader, _CarregadorMedido)
+        assert modulo.__loader__ is modulo.__spec__.loader
+    # Depois de parar, as importações não são mais medidas.
+    medidos = dict(perfil.modulos)
+    __import__("json.tool")
+    assert perfil.modulos == medidos
+
+
+def test_grava_quando_a_janela_aparece(tmp_path):
+    chamadas = []
+    janela = SimpleNamespace(
+        bind=lambda evento, funcao, add: chamadas.append(("bind", evento, funcao)),
+        after_idle=lambda funcao: chamadas.append(("after_idle", funcao)),
+        destroy=lambda: None,
+    )
+    caminho = tmp_path / "perfil.json"
+    perfil = PerfilInicializacao(str(caminho), encerrar=True)
+    perfil.acompanhar_janela(janela)
+    ((_, evento, ao_mapear),) = chamadas
+    assert evento == "<Map>"
+
+    # O <Map> de um widget filho não conta.
+    ao_mapear(SimpleNamespace(widget=object()))
+    assert not caminho.exists()
+    ao_mapear(SimpleNamespace(widget=janela))
+    ao_mapear(SimpleNamespace(widget=janela))
+    dados = json.loads(caminho.read_text("utf-8"))
+    assert list(dados["marcos_ms"]) == ["janela_criada", "janela_visivel"]
+    assert dados["janela_visivel_em"] == perfil.visivel_em
+    assert chamadas[1:] == [("after_idle", janela.destroy)]
@@ -0,0 +1,217 @@
+# tests/test_provedores.py
+"""
+Testes do disjuntor de cada provedor e do roteador entre provedores, com clientes
+falsos e um relógio controlado pelo teste, sem rede e sem esperas.
+"""
+import pytest
+
+from src.api import AcessoNegado, FalhaTransitoria
+from src.provedores import (
+    DisjuntorCircuito,
+    Provedor,
+    RoteadorProvedores,
+    criar_roteador as criar_roteador_da_linha,
+)
+
+CNPJ = "11222333000181"
+
+
+class Relogio:
+    """Relógio que só anda quando o teste manda."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+class ClienteFalso:
+    """Responde com os próprios dados ou, se 'erro' estiver definido, o lança."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.erro = None
+        self.consultas = 0
+
+    def consultar(self, cnpj):
+        self.consultas += 1
+        if self.erro is not None:
+            raise self.erro
+        return {"taxId": cnpj, "provedor": self.nome}
+
+    def fechar(self):
+        pass
+
+
+def test_disjuntor_abre_depois_do_limite_de_falhas():
+    disjuntor = DisjuntorCircuito(limite_falhas=3, tempo_aberto=10)
+    disjuntor.registrar_falha(0)
+    disjuntor.registrar_falha(1)
+    assert not disjuntor.aberto
+    assert disjuntor.permite(1)
+    disjuntor.registrar_falha(2)
+    assert disjuntor.aberto
+    assert not disjuntor.permite(2)
+    assert not disjuntor.permite(11.9)
+
+
+def test_disjuntor_sucesso_zera_as_falhas():
+    disjuntor = DisjuntorCircuito(limite_falhas=3, tempo_aberto=10)
+    disjuntor.registrar_falha(0)
+    disjuntor.registrar_falha(0)
+    disjuntor.registrar_sucesso()
+    disjuntor.registrar_falha(0)
+    disjuntor.registrar_falha(0)
+    assert not disjuntor.aberto
+
+
+def test_disjuntor_meio_aberto_libera_uma_consulta_e_fecha_no_sucesso():
+    disjuntor = DisjuntorCircuito(limite_falhas=1, tempo_aberto=10)
+    disjuntor.registrar_falha(0)
+    # Passado o tempo aberto, uma única consulta de teste.
+    assert disjuntor.permite(10)
+    disjuntor.iniciar()
+    assert not disjuntor.permite(10)
+    disjuntor.registrar_sucesso()
+    assert not disjuntor.aberto
+    assert disjuntor.permite(10)
+    # Fechado, as consultas não são mais limitadas a uma.
+    disjuntor.iniciar()
+    assert disjuntor.permite(10)
+
+
+def test_disjuntor_meio_aberto_reabre_na_falha():
+    disjuntor = DisjuntorCircuito(limite_falhas=1, tempo_aberto=10)
+    disjuntor.registrar_falha(0)
+    disjuntor.iniciar()
+    disjuntor.registrar_falha(12)
+    assert disjuntor.aberto
+    assert not disjuntor.permite(21.9)
+    assert disjuntor.permite(22)
+
+
+def criar_roteador(*clientes, limite_falhas=2, tempo_aberto=30, relogio=None):
+    return RoteadorProvedores(
+        [
+            Provedor(cliente, disjuntor=DisjuntorCircuito(limite_falhas, tempo_aberto))
+            for cliente in clientes
+        ],
+        max_tentativas=4,
+        espera_base=0,
+        relogio=relogio or Relogio(),
+    )
+
+
+def test_falha_passageira_vai_para_outro_provedor():
+    a, b = ClienteFalso("a"), ClienteFalso("b")
+    a.erro = FalhaTransitoria("HTTP 503", 503)
+    roteador = criar_roteador(a, b)
+    assert roteador.consultar(CNPJ) == {"taxId": CNPJ, "provedor": "b"}
+    assert (a.consultas, b.consultas) == (1, 1)
+    assert roteador.provedores[0].disjuntor.falhas == 1
+
+
+def test_disjuntor_aberto_tira_o_provedor_ate_o_teste():
+    relogio = Relogio()
+    a, b = ClienteFalso("a"), ClienteFalso("b")
+    a.erro = FalhaTransitoria("HTTP 500", 500)
+    roteador = criar_roteador(a, b, relogio=relogio)
+    provedor_a = roteador.provedores[0]
+
+    # Duas falhas seguidas abrem o disjuntor de "a".
+    for _ in range(2):
+        assert roteador.consultar(CNPJ)["provedor"] == "b"
+    assert provedor_a.disjuntor.aberto
+    assert a.consultas == 2
+
+    # Aberto: "a" nem é tentado.
+    relogio.agora += 29
+    assert roteador.consultar(CNPJ)["provedor"] == "b"
+    assert a.consultas == 2
+
+    # Passado o tempo aberto, "a" (de volta) recebe a consulta de teste e fecha.
+    relogio.agora += 1
+    a.erro = None
+    assert roteador.consultar(CNPJ)["provedor"] == "a"
+    assert not provedor_a.disjuntor.aberto
+    assert roteador.consultar(CNPJ)["provedor"] == "a"
+
+
+def test_consulta_de_teste_falha_e_reabre():
+    relogio = Relogio()
+    a, b = ClienteFalso("a"), ClienteFalso("b")
+    a.erro = FalhaTransitoria("HTTP 500", 500)
+    roteador = criar_roteador(a, b, limite_falhas=1, relogio=relogio)
+    roteador.consultar(CNPJ)
+    relogio.agora += 30
+    assert roteador.consultar(CNPJ)["provedor"] == "b"
+    assert a.consultas == 2
+    # Reaberto por mais 30 segundos a partir da falha do teste.
+    relogio.agora += 29
+    roteador.consultar(CNPJ)
+    assert a.consultas == 2
+
+
+def test_limite_de_taxa_suspende_so_o_provedor():
+    relogio = Relogio()
+    a, b = ClienteFalso("a"), ClienteFalso("b")
+    a.erro = FalhaTransitoria("HTTP 429", 429, retry_after=5)
+    roteador = criar_roteador(a, b, relogio=relogio)
+    assert roteador.consultar(CNPJ)["provedor"] == "b"
+    # Um 429 não conta como falha do provedor.
+    assert roteador.provedores[0].disjuntor.falhas == 0
+    relogio.agora += 4
+    roteador.consultar(CNPJ)
+    assert a.consultas == 1
+    relogio.agora += 1
+    a.erro = None
+    assert roteador.consultar(CNPJ)["provedor"] == "a"
+
+
+def test_acesso_negado_desativa_o_provedor():
+    a, b = ClienteFalso("a"), ClienteFalso("b")
+    a.erro = AcessoNegado("HTTP 401", 401)
+    roteador = criar_roteador(a, b)
+    assert roteador.consultar(CNPJ)["provedor"] == "b"
+    a.erro = None
+    assert roteador.consultar(CNPJ)["provedor"] == "b"
+    assert a.consultas == 1
+    assert roteador.provedores[0].desativado
+
+    b.erro = AcessoNegado("HTTP 402", 402)
+    with pytest.raises(AcessoNegado):
+        roteador.consultar(CNPJ)
+
+
+def test_todos_falham():
+    a, b = ClienteFalso("a"), ClienteFalso("b")
+    a.erro = b.erro = FalhaTransitoria("HTTP 503", 503)
+    roteador = criar_roteador(a, b, limite_falhas=5)
+    with pytest.raises(FalhaTransitoria):
+        roteador.consultar(CNPJ)
+    # Quatro tentativas, alternando entre os dois.
+    assert (a.consultas, b.consultas) == (2, 2)
+
+
+def test_prefere_o_provedor_mais_rapido():
+    relogio = Relogio()
+
+    class ClienteLento(ClienteFalso):
+        def consultar(self, cnpj):
+            relogio.agora += 2
+            return super().consultar(cnpj)
+
+    lento, rapido = ClienteLento("lento"), ClienteFalso("rapido")
+    roteador = criar_roteador(lento, rapido, relogio=relogio)
+    # Os dois começam sem latência medida: o primeiro da lista é experimentado.
+    assert roteador.consultar(CNPJ)["provedor"] == "lento"
+    assert roteador.consultar(CNPJ)["provedor"] == "rapido"
+    assert roteador.consultar(CNPJ)["provedor"] == "rapido"
+    assert lento.consultas == 1
+
+
+@pytest.mark.parametrize("cota", ["-1", "dez", "nan", "inf", "-inf"])
+def test_cota_invalida(cota):
+    with pytest.raises(ValueError, match="Cota inválida"):
+        criar_roteador_da_linha([f"brasilapi:{cota}"])
@@ -0,0 +1,207 @@
+# tests/test_receita.py
+"""
+Testes da base local dos dados abertos da Receita, com arquivos .zip pequenos no
+formato dos publicados (latin-1, separados por ponto e vírgula) em tests/dados_receita.
+"""
+import os
+import sqlite3
+import zipfile
+
+import pytest
+
+from src.main import processar_arquivo
+from src.parser import classificar_empresa
+from src.receita import BaseReceita
+
+PASTA_DADOS_RECEITA = os.path.join(os.path.dirname(__file__), "dados_receita")
+
+ARQUIVOS = {
+    "Cnaes.zip": {"cnaes": 8},
+    "Empresas0.zip": {"empresas": 4},
+    "Estabelecimentos0.zip": {"estabelecimentos": 5},
+    "Simples.zip": {"simples": 2},
+}
+
+
+def importar_todos(base: BaseReceita) -> dict:
+    return {
+        nome: base.importar(os.path.join(PASTA_DADOS_RECEITA, nome))
+        for nome in ARQUIVOS
+    }
+
+
+def contar_linhas(caminho: str) -> dict:
+    with sqlite3.connect(caminho) as conexao:
+        return {
+            tabela: conexao.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+            for tabela in ("estabelecimentos", "empresas", "simples", "cnaes")
+        }
+
+
+@pytest.fixture
+def base(tmp_path):
+    with BaseReceita(str(tmp_path / "receita.sqlite3")) as base:
+        importar_todos(base)
+        yield base
+
+
+def test_importar_conta_as_linhas(tmp_path):
+    caminho = str(tmp_path / "receita.sqlite3")
+    with BaseReceita(caminho) as base:
+        assert importar_todos(base) == ARQUIVOS
+    assert contar_linhas(caminho) == {
+        "estabelecimentos": 5,
+        "empresas": 4,
+        "simples": 2,
+        "cnaes": 8,
+    }
+
+
+def test_importar_sem_arquivo_reconhecido(tmp_path):
+    caminho_zip = tmp_path / "Outros.zip"
+    with zipfile.ZipFile(caminho_zip, "w") as arquivo_zip:
+        arquivo_zip.writestr("LEIAME.txt", "nada")
+    with BaseReceita(str(tmp_path / "receita.sqlite3")) as base:
+        with pytest.raises(ValueError):
+            base.importar(str(caminho_zip))
+
+
+def test_consultar_devolve_o_formato_da_cnpja(base):
+    data = base.consultar("11222333000181")
+    assert data == {
+        "taxId": "11222333000181",
+        # Sem nome fantasia no estabelecimento.
+        "alias": None,
+        "company": {
+            "name": "ACME DESENVOLVIMENTO DE SISTEMAS LTDA",
+            "simples": {"optant": True},
+            "simei": {"optant": False},
+        },
+        "status": {"id": 2, "text": "Ativa"},
+        "phones": [
+            {"area": "11", "number": "33334444"},
+            {"area": "11", "number": "987654321"},
+        ],
+        "emails": [{"address": "contato@acme.com.br"}],
+        "mainActivity": {
+            "id": 6201501,
+            "text": "Desenvolvimento de programas de computador sob encomenda",
+        },
+        "sideActivities": [
+            {
+                "id": 6311900,
+                "text": "Tratamento de dados, provedores de serviços de aplicação e "
+                "serviços de hospedagem na internet",
+            },
+            {"id": 6204000, "text": "Consultoria em tecnologia da informação"},
+        ],
+    }
+    categoria, registro = classificar_empresa(data)
+    assert categoria == "Desenvolvedor"
+    # A razão social entra no lugar do nome fantasia.
+    assert registro.nome == "ACME DESENVOLVIMENTO DE SISTEMAS LTDA"
+    assert registro.telefone == "(11) 33334444 / (11) 987654321"
+    assert registro.email == "contato@acme.com.br"
+
+
+@pytest.mark.parametrize(
+    "cnpj, nome, telefone, email, categoria",
+    [
+        # Filial com nome fantasia acentuado, DDD sem número e e-mail já minúsculo.
+        (
+            "11222333000262",
+            "ACME FILIAL SÃO JOSÉ",
+            "",
+            "vendas@acme.com.br",
+            "NaoDesenvolvedor",
+        ),
+        # Só o segundo telefone preenchido.
+        ("33000167000101", "PETROBRAS", "(21) 32240000", "", "NaoDesenvolvedor"),
+        # Desenvolvedor só pelo CNAE secundário.
+        (
+            "00000000000191",
+            "BANCO DO BRASIL SA",
+            "(61) 34939002",
+            "atendimento@bb.com.br",
+            "Desenvolvedor",
+        ),
+    ],
+)
+def test_consultar_e_classificar(base, cnpj, nome, telefone, email, categoria):
+    registro = classificar_empresa(base.consultar(cnpj))[1]
+    assert (registro.cnpj, registro.nome, registro.telefone, registro.email) == (
+        cnpj,
+        nome,
+        telefone,
+        email,
+    )
+    assert registro.status == categoria
+
+
+def test_cnae_com_zero_a_esquerda(base):
+    data = base.consultar("33000167000101")
+    assert data["mainActivity"] == {
+        "id": 600001,
+        "text": "Extração de petróleo e gás natural",
+    }
+    assert data["sideActivities"] == []
+
+
+def test_consultar_cnpj_ausente(base):
+    assert base.consultar("45678901000175") is None
+
+
+def test_reimportar_nao_duplica(tmp_path):
+    caminho = str(tmp_path / "receita.sqlite3")
+    with BaseReceita(caminho) as base:
+        # Os estabelecimentos antes dos CNAEs: as descrições aparecem depois.
+        base.importar(os.path.join(PASTA_DADOS_RECEITA, "Estabelecimentos0.zip"))
+        assert base.consultar("60701190000104")["mainActivity"]["text"] == ""
+        importar_todos(base)
+        primeira = base.consultar("60701190000104")
+        assert importar_todos(base) == ARQUIVOS
+        assert base.consultar("60701190000104") == primeira
+    assert (
+        primeira["mainActivity"]["text"] == "Bancos múltiplos, com carteira comercial"
+    )
+    assert contar_linhas(caminho)["estabelecimentos"] == 5
+
+
+def test_processar_arquivo_com_a_base(base, tmp_path):
+    entrada = tmp_path / "lista.txt"
+    entrada.write_text(
+        "11.222.333/0001-81\n"
+        "11222333000262\n"
+        "33000167000101\n"
+        "60701190000104\n"  # sem telefone nem e-mail
+        "000000000191\n"
+        "45678901000175\n"  # fora da base
+        "11222333000182\n"
+        "11222333000181\n",
+        "utf-8",
+    )
+    pasta_dados = tmp_path / "dados"
+    contadores = processar_arquivo(
+        str(entrada), cliente=base, pasta_dados=str(pasta_dados)
+    )
+    assert contadores == {
+        "Desenvolvedor": 2,
+        "NaoDesenvolvedor": 2,
+        "JaConsultado": 0,
+        "NaoEncontrado": 2,
+        "Invalido": 1,
+        "Duplicado": 1,
+    }
+    linhas = (pasta_dados / "resultado_final.csv").read_text("utf-8-sig").splitlines()
+    assert linhas == [
+        "cnpj,nome,telefone,email,status",
+        "11222333000262,ACME FILIAL SÃO JOSÉ,,vendas@acme.com.br,NaoDesenvolvedor",
+        "33000167000101,PETROBRAS,(21) 32240000,,NaoDesenvolvedor",
+        "11222333000181,ACME DESENVOLVIMENTO DE SISTEMAS LTDA,"
+        "(11) 33334444 / (11) 987654321,contato@acme.com.br,Desenvolvedor",
+        "00000000000191,BANCO DO BRASIL SA,(61) 34939002,atendimento@bb.com.br,"
+        "Desenvolvedor",
+        "60701190000104,,,,NaoEncontrado",
+        "45678901000175,,,,NaoEncontrado",
+        "11222333000182,,,,Invalido",
+    ]
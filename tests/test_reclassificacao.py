@@ -0,0 +1,163 @@
+# tests/test_reclassificacao.py
+"""
+Testes da reclassificação das respostas guardadas: só os CNPJs da lista (ou da última
+execução) entram no resultado, e as respostas expiradas não são reclassificadas.
+"""
+import json
+import sqlite3
+import time
+
+import pytest
+
+from src.armazenamento import BaseConsultados
+from src.cache import DIA, CacheRespostas
+from src.main import ErroProcessamento, montar_registro
+from src.reclassificacao import reclassificar
+
+DESENVOLVEDOR = "11222333000181"
+VAREJO = "33000167000101"
+EXPIRADO = "60701190000104"
+FORA_DA_LISTA = "00000000000191"
+NAO_ENCONTRADO = "45678901000175"
+
+
+def empresa(cnpj, codigo, texto):
+    return {
+        "taxId": cnpj,
+        "alias": f"EMPRESA {cnpj[:4]}",
+        "phones": [{"area": "11", "number": cnpj[:8]}],
+        "mainActivity": {"id": codigo, "text": texto},
+    }
+
+
+RESPOSTAS = {
+    DESENVOLVEDOR: empresa(DESENVOLVEDOR, 6201501, "Desenvolvimento de programas"),
+    VAREJO: empresa(VAREJO, 4751201, "Comércio varejista de informática"),
+    EXPIRADO: empresa(EXPIRADO, 6201501, "Desenvolvimento de programas"),
+    FORA_DA_LISTA: empresa(FORA_DA_LISTA, 4751201, "Comércio varejista"),
+    NAO_ENCONTRADO: None,
+}
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    """Uma pasta de dados com o cache e a base de uma execução anterior."""
+    caminho_cache = str(tmp_path / "cache_respostas.sqlite3")
+    with CacheRespostas(caminho_cache) as cache:
+        for cnpj, dados in RESPOSTAS.items():
+            cache.gravar(cnpj, dados)
+    # A resposta de EXPIRADO passou da validade de 30 dias.
+    with sqlite3.connect(caminho_cache) as conexao:
+        conexao.execute(
+            "UPDATE respostas SET gravado_em = ? WHERE cnpj = ?",
+            (time.time() - 31 * DIA, EXPIRADO),
+        )
+    with BaseConsultados(str(tmp_path / "consultados.sqlite3")) as base:
+        for cnpj, dados in RESPOSTAS.items():
+            if dados is not None:
+                base.registrar(dict(montar_registro(cnpj, dados), cnpj=cnpj))
+    # Regras novas: o varejo de informática passa a ser uma categoria.
+    (tmp_path / "regras_classificacao.json").write_text(
+        json.dumps(
+            {
+                "padrao": "NaoDesenvolvedor",
+                "categorias": [
+                    {"nome": "Desenvolvedor", "palavras": ["desenvolvimento"]},
+                    {"nome": "Varejo", "cnaes": ["4751-2/01"]},
+                ],
+            }
+        ),
+        "utf-8",
+    )
+    return tmp_path
+
+
+def ler_resultado(pasta) -> list:
+    return (pasta / "resultado_final.csv").read_text("utf-8-sig").splitlines()[1:]
+
+
+@pytest.mark.parametrize("processos", [1, 2])
+def test_reclassifica_so_a_lista(pasta, monkeypatch, processos):
+    # As buscas na base são feitas em lote, nunca uma por CNPJ.
+    monkeypatch.setattr(BaseConsultados, "obter", None)
+    entrada = pasta / "lista.txt"
+    entrada.write_text(
+        "\n".join(
+            [VAREJO, DESENVOLVEDOR, "123", EXPIRADO, NAO_ENCONTRADO, VAREJO, "99"]
+        ),
+        "utf-8",
+    )
+    resultado = reclassificar(
+        str(pasta), processos=processos, tamanho_bloco=2, entrada=str(entrada)
+    )
+    # Na ordem dos status; os que não estão em ORDEM_STATUS vêm no fim.
+    assert ler_resultado(pasta) == [
+        f"{DESENVOLVEDOR},EMPRESA 1122,(11) 11222333,,Desenvolvedor",
+        # Expirado: a linha da base, sem reclassificar.
+        f"{EXPIRADO},EMPRESA 6070,(11) 60701190,,Desenvolvedor",
+        f"{NAO_ENCONTRADO},,,,NaoEncontrado",
+        "123,,,,Invalido",
+        "99,,,,Invalido",
+        f"{VAREJO},EMPRESA 3300,(11) 33000167,,Varejo",
+    ]
+    assert resultado["contadores"] == {
+        "Varejo": 1,
+        "Desenvolvedor": 1,
+        "NaoEncontrado": 1,
+        "Invalido": 2,
+    }
+    assert resultado["mudancas"] == {"NaoDesenvolvedor->Varejo": 1}
+    assert resultado["sem_classificacao_anterior"] == 1
+    assert resultado["desatualizados"] == 1
+    with BaseConsultados(str(pasta / "consultados.sqlite3")) as base:
+        assert base.obter_varios([VAREJO])[VAREJO]["status"] == "Varejo"
+        # Fora da lista: nem a base muda.
+        assert (
+            base.obter_varios([FORA_DA_LISTA])[FORA_DA_LISTA]["status"]
+            == "NaoDesenvolvedor"
+        )
+
+
+def test_reclassifica_a_ultima_execucao(pasta):
+    (pasta / "resultado_final.csv").write_text(
+        "cnpj,nome,telefone,email,status\n"
+        f"{VAREJO},EMPRESA 3300,(11) 33000167,,NaoDesenvolvedor\n"
+        f"{EXPIRADO},EMPRESA 6070,(11) 60701190,,JaConsultado\n"
+        f"{DESENVOLVEDOR},EMPRESA 1122,(11) 11222333,,Desenvolvedor\n"
+        "55555555000155,,,,NaoEncontrado\n"
+        "123,,,,Invalido\n",
+        "utf-8-sig",
+    )
+    resultado = reclassificar(str(pasta), processos=1)
+    assert ler_resultado(pasta) == [
+        f"{EXPIRADO},EMPRESA 6070,(11) 60701190,,JaConsultado",
+        f"{DESENVOLVEDOR},EMPRESA 1122,(11) 11222333,,Desenvolvedor",
+        "55555555000155,,,,NaoEncontrado",
+        "123,,,,Invalido",
+        f"{VAREJO},EMPRESA 3300,(11) 33000167,,Varejo",
+    ]
+    assert resultado["desatualizados"] == 2
+    assert resultado["mudancas"] == {"NaoDesenvolvedor->Varejo": 1}
+
+
+def test_sem_lista_nem_resultado(pasta):
+    with pytest.raises(ErroProcessamento) as erro:
+        reclassificar(str(pasta), processos=1)
+    assert erro.value.titulo == "Lista Ausente"
+
+
+def test_nenhuma_resposta_valida(pasta):
+    entrada = pasta / "lista.txt"
+    entrada.write_text(f"{EXPIRADO}\n123\n", "utf-8")
+    with pytest.raises(ErroProcessamento) as erro:
+        reclassificar(str(pasta), processos=1, entrada=str(entrada))
+    assert erro.value.titulo == "Cache Vazio"
+
+
+def test_obter_varios_do_cache_ignora_expirados(pasta):
+    with CacheRespostas(str(pasta / "cache_respostas.sqlite3")) as cache:
+        respostas = cache.obter_varios([DESENVOLVEDOR, EXPIRADO, NAO_ENCONTRADO, "1"])
+    assert respostas == {
+        DESENVOLVEDOR: RESPOSTAS[DESENVOLVEDOR],
+        NAO_ENCONTRADO: None,
+    }
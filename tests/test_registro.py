@@ -0,0 +1,89 @@
+# tests/test_registro.py
+"""
+Testes da linha de resultado compacta: a leitura como tupla e como dicionário, a ida e
+volta pelo CSV e o espaço ocupado por Registro e RegistroVazio.
+"""
+import csv
+import io
+import pickle
+import sys
+
+import pytest
+
+from src.registro import (
+    CAMPOS,
+    STATUS,
+    Registro,
+    RegistroVazio,
+    codigo_status,
+    criar_registro,
+    registro_de_dict,
+)
+
+COMPLETO = ("11222333000181", "ACME", "(11) 33334444", "a@acme.com.br", "Desenvolvedor")
+
+
+def test_criar_registro_escolhe_a_forma():
+    assert type(criar_registro(*COMPLETO)) is Registro
+    vazio = criar_registro("123", "", "", "", "Invalido")
+    assert type(vazio) is RegistroVazio
+    # Os campos vazios são da classe, não de cada linha.
+    assert "nome" not in RegistroVazio.__slots__
+    assert (vazio.nome, vazio.telefone, vazio.email) == ("", "", "")
+
+
+@pytest.mark.parametrize(
+    "valores", [COMPLETO, ("45678901000175", "", "", "", "NaoEncontrado")]
+)
+def test_tupla_e_dicionario(valores):
+    registro = criar_registro(*valores)
+    assert registro.como_tupla() == valores
+    assert dict(registro) == dict(zip(CAMPOS, valores))
+    assert registro == dict(zip(CAMPOS, valores))
+    assert registro == criar_registro(*valores)
+    assert list(registro) == list(CAMPOS) and len(registro) == len(CAMPOS)
+    assert registro["status"] == registro.status == valores[-1]
+    assert registro.get("email") == valores[3]
+    assert registro.get("consultado_em", 0) == 0
+    with pytest.raises(KeyError):
+        registro["consultado_em"]
+    # Campos a mais entram pelo dict(), como a base faz com o cnpj.
+    assert dict(registro, cnpj="1")["cnpj"] == "1"
+
+
+def test_ida_e_volta_pelo_csv():
+    registros = [
+        criar_registro(*COMPLETO),
+        criar_registro("33000167000101", 'PETRO "BR", SA', "", "", "Varejo"),
+        criar_registro("123", "", "", "", "Invalido"),
+    ]
+    arquivo = io.StringIO()
+    escritor = csv.writer(arquivo)
+    escritor.writerow(CAMPOS)
+    escritor.writerows(r.como_tupla() for r in registros)
+    arquivo.seek(0)
+    lidos = [registro_de_dict(linha) for linha in csv.DictReader(arquivo)]
+    assert lidos == registros
+    assert [type(r) for r in lidos] == [Registro, Registro, RegistroVazio]
+
+
+def test_status_novo_ganha_codigo_e_atravessa_processos():
+    codigo = codigo_status("CategoriaDeTeste")
+    assert STATUS[codigo] == "CategoriaDeTeste"
+    assert codigo_status("CategoriaDeTeste") == codigo
+    registro = criar_registro("11222333000181", "ACME", "", "", "CategoriaDeTeste")
+    # No pickle vai o nome do status, não o código deste processo.
+    assert b"CategoriaDeTeste" in pickle.dumps(registro)
+    assert pickle.loads(pickle.dumps(registro)) == registro
+
+
+def test_linhas_sem_dicionario_de_atributos():
+    registro = criar_registro(*COMPLETO)
+    vazio = criar_registro("123", "", "", "", "Invalido")
+    for linha in (registro, vazio):
+        assert not hasattr(linha, "__dict__")
+        with pytest.raises(AttributeError):
+            linha.outro = 1
+    assert (
+        sys.getsizeof(vazio) < sys.getsizeof(registro) < sys.getsizeof(dict(registro))
+    )
@@ -0,0 +1,81 @@
+# tests/test_saida.py
+"""
+Testes do EscritorResultados: as linhas, gravadas nos parciais de cada status à medida
+que chegam, saem na ordem dos status e, dentro de cada um, na ordem de chegada, e os
+parciais são apagados ao final.
+"""
+import csv
+import json
+
+from src.exportadores import criar_exportadores
+from src.registro import criar_registro
+from src.saida import INTERVALO_DESCARGA, ORDEM_STATUS, EscritorResultados
+
+# Intercalados, com uma categoria fora de ORDEM_STATUS e mais linhas do que o
+# intervalo de descarga.
+STATUS = ["Desenvolvedor", "Varejo", "NaoDesenvolvedor", "Invalido", "JaConsultado"]
+REGISTROS = [
+    criar_registro(
+        f"{i:014d}",
+        f"EMPRESA {i}" if i % 3 else "",
+        "",
+        f"contato{i}@exemplo.com.br" if i % 2 else "",
+        STATUS[i * 7 % len(STATUS)],
+    )
+    for i in range(3 * INTERVALO_DESCARGA + 17)
+]
+
+
+def em_ordem(registros) -> list:
+    """As linhas esperadas: por status, e na ordem de chegada dentro de cada um."""
+    ordem = ORDEM_STATUS + ["Varejo"]
+    return sorted((r.como_tupla() for r in registros), key=lambda t: ordem.index(t[-1]))
+
+
+def test_ordem_dos_status_e_de_chegada(tmp_path):
+    parciais = tmp_path / "parciais"
+    escritor = EscritorResultados(
+        str(tmp_path / "resultado.csv"),
+        str(parciais),
+        criar_exportadores(["ndjson"]),
+    )
+    for registro in REGISTROS:
+        escritor.escrever(registro)
+    # Enquanto processa, cada status tem o seu parcial no disco.
+    assert {p.stem for p in parciais.glob("*.csv")} == set(STATUS)
+    escritor.finalizar()
+
+    with open(tmp_path / "resultado.csv", newline="", encoding="utf-8-sig") as f:
+        linhas = [tuple(linha) for linha in csv.reader(f)]
+    assert linhas[0] == ("cnpj", "nome", "telefone", "email", "status")
+    assert linhas[1:] == em_ordem(REGISTROS)
+    with open(tmp_path / "resultado.ndjson", encoding="utf-8") as f:
+        assert [json.loads(linha)["cnpj"] for linha in f] == [
+            t[0] for t in em_ordem(REGISTROS)
+        ]
+    assert escritor.linhas == len(REGISTROS)
+    assert list(parciais.iterdir()) == []
+
+
+def test_descartar_apaga_os_parciais(tmp_path):
+    parciais = tmp_path / "parciais"
+    escritor = EscritorResultados(str(tmp_path / "resultado.csv"), str(parciais))
+    for registro in REGISTROS[:10]:
+        escritor.escrever(registro)
+    escritor.descartar()
+    assert list(parciais.iterdir()) == []
+    assert not (tmp_path / "resultado.csv").exists()
+
+
+def test_parciais_de_execucao_interrompida_sao_apagados(tmp_path):
+    parciais = tmp_path / "parciais"
+    parciais.mkdir()
+    (parciais / "Desenvolvedor.csv").write_text("cnpj\n99\n", "utf-8")
+    (parciais / "anotacoes.txt").write_text("fica", "utf-8")
+    escritor = EscritorResultados(str(tmp_path / "resultado.csv"), str(parciais))
+    escritor.escrever(REGISTROS[0])
+    escritor.finalizar()
+    assert [p.name for p in parciais.iterdir()] == ["anotacoes.txt"]
+    assert (tmp_path / "resultado.csv").read_text("utf-8-sig").splitlines()[1:] == [
+        ",".join(REGISTROS[0].como_tupla())
+    ]
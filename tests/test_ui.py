@@ -0,0 +1,83 @@
+# tests/test_ui.py
+"""
+Testes da thread de trabalho da interface, sem abrir a janela: qualquer erro vira uma
+mensagem, e a finalização é sempre agendada.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import src.main
+from src.main import ErroProcessamento
+from src.ui import App, messagebox
+
+
+class JanelaFalsa(SimpleNamespace):
+    """Guarda as chamadas agendadas com after(), em vez de executá-las no Tk."""
+
+    def __init__(self):
+        super().__init__(
+            arquivo_path="lista.txt",
+            consultas_minuto=5,
+            simultaneas=1,
+            retomar=False,
+            formato=None,
+            coordenar=False,
+            agendadas=[],
+        )
+
+    def after(self, _, funcao, *args):
+        self.agendadas.append((funcao, args))
+
+    def atualizar_progresso(self, *args):
+        pass
+
+    def finalizar_processamento(self, resultados_finais):
+        pass
+
+
+@pytest.mark.parametrize(
+    "erro, titulo",
+    [
+        (ErroProcessamento("Erro de Leitura", "Arquivo ilegível."), "Erro de Leitura"),
+        (RuntimeError("falha inesperada"), "Erro Inesperado"),
+    ],
+)
+def test_erro_mostra_mensagem_e_finaliza(monkeypatch, erro, titulo):
+    def processar_arquivo(*args, **kwargs):
+        raise erro
+
+    monkeypatch.setattr(src.main, "processar_arquivo", processar_arquivo)
+    janela = JanelaFalsa()
+    App.rodar_processamento(janela)
+    (mostrar, (titulo_mostrado, mensagem)), (finalizar, args) = janela.agendadas
+    assert mostrar is messagebox.showerror
+    assert titulo_mostrado == titulo
+    assert str(erro) in mensagem
+    assert finalizar == janela.finalizar_processamento
+    assert args == (None,)
+
+
+def test_sucesso_finaliza_com_os_resultados(monkeypatch):
+    monkeypatch.setattr(
+        src.main, "processar_arquivo", lambda *args, **kwargs: {"Desenvolvedor": 1}
+    )
+    janela = JanelaFalsa()
+    App.rodar_processamento(janela)
+    assert janela.agendadas == [
+        (janela.finalizar_processamento, ({"Desenvolvedor": 1},))
+    ]
+
+
+@pytest.mark.parametrize("coordenar", [False, True])
+def test_coordenacao_so_quando_marcada(monkeypatch, coordenar):
+    chamadas = []
+    monkeypatch.setattr(
+        src.main,
+        "processar_arquivo",
+        lambda *args, **kwargs: chamadas.append(kwargs) or {},
+    )
+    janela = JanelaFalsa()
+    janela.coordenar = coordenar
+    App.rodar_processamento(janela)
+    assert chamadas[0]["coordenar"] is coordenar
@@ -0,0 +1,108 @@
+# tests/test_validacao.py
+"""
+Testes da validação local de CNPJs, do filtro de duplicados e da importação do
+ja_consultados.txt antigo, que passa pela mesma normalização.
+"""
+import pytest
+
+from src.armazenamento import BaseConsultados
+from src.validacao import FiltroDuplicados, cnpj_valido, normalizar_cnpj
+
+
+@pytest.mark.parametrize(
+    "cnpj", ["11222333000181", "00000000000191", "33000167000101", "60701190000104"]
+)
+def test_cnpj_valido(cnpj):
+    assert cnpj_valido(cnpj)
+
+
+@pytest.mark.parametrize(
+    "cnpj",
+    [
+        "11222333000182",  # segundo dígito errado
+        "11222333000191",  # primeiro dígito errado
+        "00000000000000",  # passa no cálculo, mas não é um CNPJ
+        "11111111111111",
+        "1122233300018",  # curto
+        "112223330001811",  # longo
+        "",
+    ],
+)
+def test_cnpj_invalido(cnpj):
+    assert not cnpj_valido(cnpj)
+
+
+@pytest.mark.parametrize(
+    "texto, esperado",
+    [
+        ("11.222.333/0001-81", ("11222333000181", True)),
+        (" 11222333000181\n", ("11222333000181", True)),
+        # Zeros à esquerda removidos pela planilha são recolocados.
+        ("191", ("191", False)),
+        ("000191", ("000191", False)),
+        ("0000000000191", ("00000000000191", True)),
+        ("000000000191", ("00000000000191", True)),
+        ("00.000.000/0001-91", ("00000000000191", True)),
+        ("11.222.333/0001-82", ("11222333000182", False)),
+        ("abc", ("", False)),
+    ],
+)
+def test_normalizar_cnpj(texto, esperado):
+    assert normalizar_cnpj(texto) == esperado
+
+
+@pytest.mark.parametrize("limite_memoria", [1_000_000, 3])
+def test_filtro_duplicados(limite_memoria):
+    # Com limite 3, o filtro passa ao banco temporário logo no início.
+    with FiltroDuplicados(limite_memoria=limite_memoria, tamanho_lote=2) as vistos:
+        assert vistos.marcar("a")
+        assert not vistos.marcar("a")
+        assert vistos.marcar_varios(["b", "c", "b", "a", "d"]) == [
+            True,
+            True,
+            False,
+            False,
+            True,
+        ]
+        assert vistos.marcar_varios(["e", "d", "c", "f", "e"]) == [
+            True,
+            False,
+            False,
+            True,
+            False,
+        ]
+        assert not vistos.marcar("f")
+        assert vistos.marcar("g")
+        assert len(vistos) == 7
+
+
+def test_filtro_duplicados_lote_vazio():
+    with FiltroDuplicados() as vistos:
+        assert vistos.marcar_varios([]) == []
+
+
+def test_importar_ja_consultados_normaliza(tmp_path):
+    antigo = tmp_path / "ja_consultados.txt"
+    # A planilha tirou zeros à esquerda dos dois primeiros (o mesmo CNPJ); o
+    # terceiro veio formatado.
+    antigo.write_text(
+        "000000000191\n0000000000191\n11.222.333/0001-81\n\n  \n", "utf-8"
+    )
+    with BaseConsultados(str(tmp_path / "consultados.sqlite3")) as base:
+        assert base.importar_ja_consultados(str(antigo)) == 2
+        assert base.contem("11222333000181")
+        assert base.contem("00000000000191")
+        assert base.obter("00000000000191")["status"] == ""
+        # Cada arquivo só é importado uma vez.
+        assert base.importar_ja_consultados(str(antigo)) == 0
+
+
+def test_obter_varios(tmp_path):
+    with BaseConsultados(str(tmp_path / "c.sqlite3"), tamanho_lote=2) as base:
+        for cnpj in ("1", "2", "3"):
+            base.registrar({"cnpj": cnpj, "status": "Desenvolvedor", "nome": cnpj})
+        # "1" e "2" já foram gravados no disco; "3" ainda está pendente.
+        registros = base.obter_varios(["1", "3", "4", "1"])
+        assert sorted(registros) == ["1", "3"]
+        assert registros["3"]["nome"] == "3"
+        assert registros["1"] == base.obter("1")